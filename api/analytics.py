@@ -0,0 +1,243 @@
+import os
+import threading
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from . import database
+from .cache import LRUCache
+from .metrics import Counter
+from .mood_rules import MOODS
+from .timestamps import PKT, now_epoch
+
+# Mood logs read per query while catching up, and how many per-user rolling
+# distributions are kept
+ANALYTICS_BATCH_SIZE = int(os.getenv("ANALYTICS_BATCH_SIZE", "20000"))
+ANALYTICS_CACHE_SIZE = int(os.getenv("ANALYTICS_CACHE_SIZE", "1024"))
+
+ANALYTICS_INGESTED = Counter("analytics_logs_ingested_total", "Mood logs folded into the analytics aggregates.")
+ANALYTICS_REBUILDS = Counter(
+    "analytics_user_rebuilds_total", "Users whose transitions were recounted because of a backdated log."
+)
+
+MOOD_INDEX = {mood: i for i, mood in enumerate(MOODS)}
+N_MOODS = len(MOODS)
+WEEKDAYS = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+
+_PKT_OFFSET = int(PKT.utcoffset(None).total_seconds())
+_DAY = 86400
+
+
+def _mood_codes(moods) -> np.ndarray:
+    """MOODS index of each mood, -1 for a mood outside MOODS (e.g. a stray model answer)."""
+    return np.fromiter((MOOD_INDEX.get(mood, -1) for mood in moods), dtype=np.int8, count=len(moods))
+
+
+def _pkt_days(created_at: np.ndarray) -> np.ndarray:
+    """PKT calendar day number (days since 1970-01-01) of each epoch."""
+    return (created_at + _PKT_OFFSET) // _DAY
+
+
+def _count_transitions(moods: np.ndarray) -> np.ndarray:
+    """
+    Flat N_MOODS * N_MOODS transition counts (from * N_MOODS + to) of one
+    user's chronological mood codes. Pairs with an unknown mood are skipped.
+    """
+    before, after = moods[:-1], moods[1:]
+    valid = (before >= 0) & (after >= 0)
+    return np.bincount(before[valid] * N_MOODS + after[valid], minlength=N_MOODS * N_MOODS)
+
+
+class MoodAnalytics:
+    """
+    Mood aggregates kept up to date from mood_logs.
+
+    refresh() reads the logs added since the last call in columnar batches and
+    folds them into NumPy arrays: per-user transition counts and population
+    counts by PKT weekday and hour. Logs are never updated or deleted, so the
+    highest id seen is all the state needed to catch up. A log backdated
+    before a user's latest one recounts that user's transitions from the
+    database. Per-user rolling distributions are computed on request from the
+    user's own logs and cached until that user has a new log.
+    """
+
+    def __init__(self, batch_size: int = ANALYTICS_BATCH_SIZE, cache_size: int = ANALYTICS_CACHE_SIZE):
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._last_id = 0
+        self._total = 0
+        # [weekday, hour, mood] log counts, PKT
+        self._by_time = np.zeros((7, 24, N_MOODS), dtype=np.int64)
+        # Per user, by row slot: flat transition counts, the latest log by
+        # time (mood, created_at, id) and the newest log id folded in
+        self._slots: Dict[int, int] = {}
+        self._transitions = np.zeros((0, N_MOODS * N_MOODS), dtype=np.int64)
+        self._last_mood = np.zeros(0, dtype=np.int8)
+        self._last_at = np.zeros(0, dtype=np.int64)
+        self._last_log = np.zeros(0, dtype=np.int64)
+        self._versions = np.zeros(0, dtype=np.int64)
+        self._rolling = LRUCache(cache_size)
+
+    def refresh(self) -> int:
+        """Fold in mood logs added since the last refresh. Returns how many were read."""
+        with self._lock:
+            read = 0
+            while True:
+                rows = database.get_mood_log_batch(self._last_id, self.batch_size, MOODS)
+                if not rows:
+                    return read
+                self._ingest(rows)
+                read += len(rows)
+                if len(rows) < self.batch_size:
+                    return read
+
+    def _slot_array(self, user_ids: np.ndarray) -> np.ndarray:
+        """Row slots of these (unique) users, adding rows for new ones."""
+        for user_id in user_ids.tolist():
+            if user_id not in self._slots:
+                self._slots[user_id] = len(self._slots)
+
+        grow = len(self._slots) - len(self._last_mood)
+        if grow > 0:
+            self._transitions = np.vstack([self._transitions, np.zeros((grow, N_MOODS * N_MOODS), dtype=np.int64)])
+            self._last_mood = np.concatenate([self._last_mood, np.full(grow, -1, dtype=np.int8)])
+            self._last_at = np.concatenate([self._last_at, np.full(grow, np.iinfo(np.int64).min)])
+            self._last_log = np.concatenate([self._last_log, np.zeros(grow, dtype=np.int64)])
+            self._versions = np.concatenate([self._versions, np.zeros(grow, dtype=np.int64)])
+        return np.array([self._slots[user_id] for user_id in user_ids.tolist()], dtype=np.int64)
+
+    def _ingest(self, rows: List[Tuple[int, int, int, int]]):
+        ids, user_ids, codes, created_at = np.array(rows, dtype=np.int64).T
+        codes = codes.astype(np.int8)
+        batch_last_id = int(ids[-1])
+
+        # Population counts do not depend on order
+        local = created_at + _PKT_OFFSET
+        known = codes >= 0
+        np.add.at(
+            self._by_time,
+            (((local // _DAY + 3) % 7)[known], ((local // 3600) % 24)[known], codes[known]),
+            1
+        )
+
+        # Per-user transitions: each user's logs in time order
+        order = np.lexsort((ids, created_at, user_ids))
+        ids, user_ids, codes, created_at = ids[order], user_ids[order], codes[order], created_at[order]
+        starts = np.flatnonzero(np.r_[True, user_ids[1:] != user_ids[:-1]])
+        ends = np.r_[starts[1:], len(user_ids)] - 1
+        slots = self._slot_array(user_ids[starts])
+        row_slots = np.repeat(slots, ends - starts + 1)
+
+        # A user's first log here is older than their latest already counted
+        backdated = (created_at[starts] < self._last_at[slots]) | (
+            (created_at[starts] == self._last_at[slots]) & (ids[starts] < self._last_log[slots])
+        )
+
+        # Transitions inside the batch, then from each user's previous latest log
+        same_user = user_ids[1:] == user_ids[:-1]
+        before, after = codes[:-1], codes[1:]
+        valid = same_user & (before >= 0) & (after >= 0)
+        np.add.at(self._transitions, (row_slots[1:][valid], (before * N_MOODS + after)[valid]), 1)
+
+        carry = ~backdated & (self._last_mood[slots] >= 0) & (codes[starts] >= 0)
+        np.add.at(
+            self._transitions,
+            (slots[carry], self._last_mood[slots][carry] * N_MOODS + codes[starts][carry]),
+            1
+        )
+
+        self._last_mood[slots] = codes[ends]
+        self._last_at[slots] = created_at[ends]
+        self._last_log[slots] = ids[ends]
+        self._versions[slots] = np.maximum.reduceat(ids, starts)
+
+        for slot, user_id in zip(slots[backdated].tolist(), user_ids[starts][backdated].tolist()):
+            self._recount_user(slot, user_id, batch_last_id)
+
+        self._last_id = batch_last_id
+        self._total += len(ids)
+        ANALYTICS_INGESTED.inc(len(ids))
+
+    def _recount_user(self, slot: int, user_id: int, max_id: int):
+        """Recount one user's transitions from the database, up to log `max_id`."""
+        series = database.get_user_mood_series(user_id, max_id=max_id)
+        ids, moods, created_at = zip(*series)
+        codes = _mood_codes(moods)
+        self._transitions[slot] = _count_transitions(codes)
+        self._last_mood[slot] = codes[-1]
+        self._last_at[slot] = created_at[-1]
+        self._last_log[slot] = ids[-1]
+        ANALYTICS_REBUILDS.inc()
+
+    def user_version(self, user_id: int) -> int:
+        """Id of the newest log folded in for a user (0 if none): changes whenever they log a mood."""
+        with self._lock:
+            slot = self._slots.get(user_id)
+            return int(self._versions[slot]) if slot is not None else 0
+
+    def user_transitions(self, user_id: int) -> np.ndarray:
+        """N_MOODS x N_MOODS counts of a user's consecutive moods (row: from, column: to)."""
+        with self._lock:
+            slot = self._slots.get(user_id)
+            if slot is None:
+                return np.zeros((N_MOODS, N_MOODS), dtype=np.int64)
+            return self._transitions[slot].reshape(N_MOODS, N_MOODS).copy()
+
+    def population(self) -> Dict:
+        """Totals, counts by weekday and hour (PKT) and transitions across all users."""
+        with self._lock:
+            return {
+                "total_logs": self._total,
+                "by_time": self._by_time.copy(),
+                "transitions": self._transitions.sum(axis=0).reshape(N_MOODS, N_MOODS)
+            }
+
+    def rolling_distribution(self, user_id: int, window: int, days: int) -> Dict:
+        """
+        Share of each mood among a user's logs in the trailing `window` days,
+        for each of the last `days` PKT days (oldest first).
+        """
+        today = int(_pkt_days(np.int64(now_epoch())))
+        key = (user_id, self.user_version(user_id), window, days, today)
+        cached = self._rolling.get(key)
+        if cached is not None:
+            return cached
+
+        first_day = today - days + 1
+        # Logs that fall in the first day's window onwards
+        since = (first_day - window + 1) * _DAY - _PKT_OFFSET
+        series = database.get_user_mood_series(user_id, start=since)
+
+        counts = np.zeros((days + window - 1, N_MOODS), dtype=np.int64)
+        if series:
+            _, moods, created_at = zip(*series)
+            codes = _mood_codes(moods)
+            offsets = _pkt_days(np.array(created_at, dtype=np.int64)) - (first_day - window + 1)
+            keep = (codes >= 0) & (offsets < len(counts))
+            np.add.at(counts, (offsets[keep], codes[keep]), 1)
+
+        # Trailing window sums from a running total
+        running = np.vstack([np.zeros((1, N_MOODS), dtype=np.int64), np.cumsum(counts, axis=0)])
+        windows = running[window:] - running[:-window]
+        totals = windows.sum(axis=1)
+        shares = np.divide(windows, totals[:, None], out=np.zeros(windows.shape), where=totals[:, None] > 0)
+
+        result = {
+            "first_day": first_day,
+            "totals": totals,
+            "shares": shares
+        }
+        self._rolling.set(key, result)
+        return result
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "last_log_id": self._last_id,
+                "logs": self._total,
+                "users": len(self._slots),
+                "rolling_cache": self._rolling.stats()
+            }
+
+
+analytics = MoodAnalytics()
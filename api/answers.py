@@ -0,0 +1,58 @@
+import json
+import re
+from typing import Dict, Optional
+
+# The questionnaire is a fixed set of 10 lettered MCQs (see prompt_for_mood_detection)
+QUESTION_IDS = tuple(f"q{i}" for i in range(1, 11))
+
+
+def _question_order(key: str):
+    match = re.fullmatch(r"q(\d+)", key)
+    return (0, int(match.group(1)), key) if match else (1, 0, key)
+
+
+def normalize_answers(answers: Dict[str, str]) -> Dict[str, str]:
+    """
+    Canonical form of an answer set: lower-case question ids in question order,
+    option letters upper-cased ("Q1": " d " -> "q1": "D").
+    """
+    normalized = {
+        str(key).strip().lower(): str(value).strip()[:1].upper()
+        for key, value in answers.items()
+    }
+    return {key: normalized[key] for key in sorted(normalized, key=_question_order)}
+
+
+def answers_key(answers: Dict[str, str]) -> str:
+    """Stable string key for an answer set (used for caching and deduplication)."""
+    return json.dumps(normalize_answers(answers), separators=(",", ":"))
+
+
+# Stored form of an answer set: one option letter per question in QUESTION_IDS
+# order, "-" for a question left unanswered (e.g. "BCAEABEADC")
+UNANSWERED = "-"
+
+
+def encode_answers(answers: Dict[str, str]) -> Optional[str]:
+    """
+    Fixed-width code for an answer set, or None if the set cannot be stored
+    that way without losing something (other question ids, options that are
+    not a single upper-case letter).
+    """
+    if not set(answers) <= set(QUESTION_IDS):
+        return None
+    code = []
+    for question in QUESTION_IDS:
+        option = answers.get(question)
+        if option is None:
+            code.append(UNANSWERED)
+        elif isinstance(option, str) and len(option) == 1 and "A" <= option <= "Z":
+            code.append(option)
+        else:
+            return None
+    return "".join(code)
+
+
+def decode_answers(code: str) -> Dict[str, str]:
+    """Answer set for a code made by encode_answers."""
+    return {question: option for question, option in zip(QUESTION_IDS, code) if option != UNANSWERED}
@@ -0,0 +1,92 @@
+import os
+from typing import Dict, List, Tuple
+from .database import get_session_info, save_session_summary
+from .message_journal import get_session_messages
+from .llm_logic_for_psychiatrist import summarize_conversation
+from .llm_scheduler import LLMOverloaded
+
+# Approximate token budget for the verbatim recent-message window
+CHAT_CONTEXT_TOKEN_BUDGET = int(os.getenv("CHAT_CONTEXT_TOKEN_BUDGET", "1200"))
+
+# Fold older turns into the summary once this many tokens have fallen out of the window,
+# so the summary (and the prompt prefix) changes in steps rather than on every turn
+CHAT_SUMMARY_BATCH_TOKENS = int(os.getenv("CHAT_SUMMARY_BATCH_TOKENS", "300"))
+
+# Sessions whose summary is currently being updated
+_summarizing = set()
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about 4 characters per token for English text)."""
+    return len(text) // 4 + 1
+
+
+def split_window(messages: List[Dict], budget: int = CHAT_CONTEXT_TOKEN_BUDGET) -> Tuple[List[Dict], List[Dict]]:
+    """
+    Split messages (oldest first) into (older, recent), where `recent` is the
+    longest suffix that fits in `budget` tokens. The newest message is always kept.
+    """
+    used = 0
+    start = len(messages)
+
+    while start > 0:
+        cost = estimate_tokens(messages[start - 1]["content"])
+        if used + cost > budget and start < len(messages):
+            break
+        used += cost
+        start -= 1
+
+    return messages[:start], messages[start:]
+
+
+def build_chat_context(messages: List[Dict]) -> Tuple[List[Dict], bool]:
+    """
+    Pick the conversation window for a turn from a session's unsummarized
+    messages (oldest first, ending with the new user message) and return
+    (window, needs_summary).
+
+    Until the overflow is folded into the summary, the window keeps starting at
+    the first unsummarized message rather than sliding every turn: the prompt
+    then only grows at the end, so Ollama can reuse the evaluated prefix.
+    """
+    older, recent = split_window(messages)
+
+    overflow = sum(estimate_tokens(msg["content"]) for msg in older)
+    needs_summary = overflow >= CHAT_SUMMARY_BATCH_TOKENS
+
+    # If summaries keep failing, fall back to the sliding window to bound the prompt
+    if overflow > CHAT_SUMMARY_BATCH_TOKENS * 3:
+        return recent, needs_summary
+    return messages, needs_summary
+
+
+async def update_session_summary(session_id: int):
+    """
+    Fold the messages that no longer fit in the recent window into the
+    session's rolling summary. Meant to run in the background after a reply.
+    """
+    if session_id in _summarizing:
+        return
+    _summarizing.add(session_id)
+
+    try:
+        session = get_session_info(session_id)
+        if session is None:
+            return
+
+        messages = get_session_messages(session_id, after_id=session["summary_upto_id"])
+        older, _ = split_window(messages)
+        if not older:
+            return
+
+        try:
+            summary = await summarize_conversation(session["summary"], older)
+        except LLMOverloaded:
+            # Try again after a later turn
+            return
+        if summary is None:
+            return
+
+        save_session_summary(session_id, summary, older[-1]["id"], session["summary_upto_id"])
+    finally:
+        _summarizing.discard(session_id)
@@ -1,15 +1,15 @@
+import html
+import json
+import re
 import sqlite3
-from datetime import datetime, timezone, timedelta
-from typing import Optional, List, Dict
+from collections import Counter
+from typing import Optional, List, Dict, Sequence, Tuple
 import os
-
-# Pakistan Standard Time (UTC+5)
-PKT = timezone(timedelta(hours=5))
-
-
-def get_pkt_now():
-    """Get current time in Pakistan Standard Time."""
-    return datetime.now(PKT).strftime("%Y-%m-%d %H:%M:%S")
+from .answers import QUESTION_IDS, UNANSWERED, decode_answers, encode_answers
+from .db_pool import ConnectionPool
+from .metrics import Gauge, db_timed, register_collector
+from .migrations import migrate
+from .timestamps import now_epoch
 
 
 # Use /tmp for serverless environments like Vercel, current directory for local dev
@@ -17,204 +17,367 @@ DB_PATH = os.getenv("DB_PATH", os.path.join(os.path.dirname(os.path.dirname(__fi
 
 
 def get_connection():
-    """Get a database connection."""
+    """Get a standalone (unpooled) database connection."""
     conn = sqlite3.connect(DB_PATH)
     conn.row_factory = sqlite3.Row
     return conn
 
 
-def init_db():
-    """Initialize the database with required tables."""
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    # Create users table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT UNIQUE NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-
-    # Create mood_logs table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS mood_logs (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            mood TEXT NOT NULL,
-            answers TEXT NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users (id)
-        )
-    """)
-
-    # Create chat_sessions table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS chat_sessions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            mood_log_id INTEGER NOT NULL,
-            started_at TIMESTAMP,
-            ended_at TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users (id),
-            FOREIGN KEY (mood_log_id) REFERENCES mood_logs (id)
-        )
-    """)
-
-    # Create chat_messages table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS chat_messages (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            session_id INTEGER NOT NULL,
-            role TEXT NOT NULL,
-            content TEXT NOT NULL,
-            created_at TIMESTAMP,
-            FOREIGN KEY (session_id) REFERENCES chat_sessions (id)
-        )
-    """)
+# Shared connection pool used by every function below
+_pool = ConnectionPool(DB_PATH)
 
-    conn.commit()
-    conn.close()
 
+def pooled_connection():
+    """Check out a pooled connection: `with pooled_connection() as conn:`."""
+    return _pool.connection()
 
-def create_user(username: str) -> Optional[int]:
-    """Create a new user. Returns user_id or None if username exists."""
-    conn = get_connection()
-    cursor = conn.cursor()
 
-    try:
-        cursor.execute(
-            "INSERT INTO users (username, created_at) VALUES (?, ?)",
-            (username, get_pkt_now())
-        )
-        conn.commit()
-        user_id = cursor.lastrowid
-        conn.close()
-        return user_id
-    except sqlite3.IntegrityError:
-        conn.close()
-        return None
+def get_pool_stats() -> Dict[str, int]:
+    """Return connection pool usage counters."""
+    return _pool.stats()
+
+
+DB_POOL = Gauge("db_pool_connections", "Connection pool state.", ["state"])
+DB_POOL_CHECKOUTS = Gauge("db_pool_checkouts", "Connections handed out since start.")
+DB_POOL_WAITS = Gauge("db_pool_waits", "Checkouts that had to wait for a free connection.")
 
 
+def _collect_pool_metrics():
+    stats = _pool.stats()
+    DB_POOL.set(stats["open"], state="open")
+    DB_POOL.set(stats["idle"], state="idle")
+    DB_POOL.set(stats["size"], state="max")
+    DB_POOL_CHECKOUTS.set(stats["checkouts"])
+    DB_POOL_WAITS.set(stats["waits"])
+
+
+register_collector(_collect_pool_metrics)
+
+
+def init_db():
+    """Initialize the database and apply any pending schema migrations."""
+    with pooled_connection() as conn:
+        migrate(conn)
+
+
+@db_timed
+def create_user(username: str, created_at: Optional[int] = None) -> Optional[int]:
+    """Create a new user. Returns user_id or None if username exists."""
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+
+        try:
+            cursor.execute(
+                "INSERT INTO users (username, created_at) VALUES (?, ?)",
+                (username, created_at or now_epoch())
+            )
+            conn.commit()
+            return cursor.lastrowid
+        except sqlite3.IntegrityError:
+            conn.rollback()
+            return None
+
+
+@db_timed
 def get_user(username: str) -> Optional[Dict]:
     """Get user by username."""
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    cursor.execute("SELECT * FROM users WHERE username = ?", (username,))
-    row = cursor.fetchone()
-    conn.close()
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT * FROM users WHERE username = ?", (username,))
+        row = cursor.fetchone()
 
     if row:
         return {"id": row["id"], "username": row["username"], "created_at": row["created_at"]}
     return None
 
 
+@db_timed
+def get_users(usernames: List[str]) -> Dict[str, Dict]:
+    """Get several users at once, keyed by username. Unknown usernames are omitted."""
+    users = {}
+    unique = list(dict.fromkeys(usernames))
+
+    with pooled_connection() as conn:
+        # Stay well under SQLite's bound-parameter limit
+        for start in range(0, len(unique), 500):
+            chunk = unique[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = conn.execute(
+                f"SELECT id, username, created_at FROM users WHERE username IN ({placeholders})",
+                chunk
+            ).fetchall()
+            for row in rows:
+                users[row["username"]] = {"id": row["id"], "username": row["username"], "created_at": row["created_at"]}
+
+    return users
+
+
 def user_exists(username: str) -> bool:
-    """Check if username exists."""
+    """Check if username exists. Not timed itself: get_user already is."""
     return get_user(username) is not None
 
 
-def save_mood_log(user_id: int, mood: str, answers: str) -> int:
+# user_stats upkeep, run in the same transaction as the write it accounts for.
+# A backdated log (older than the latest) is counted but does not replace the
+# latest mood or extend the streak. Streak days are PKT calendar days.
+_RECORD_MOOD_STATS = """
+    INSERT INTO user_stats (
+        user_id, latest_mood_log_id, latest_mood, latest_mood_at,
+        mood_counts, total_mood_logs, streak_days, streak_last_day
+    ) VALUES (?, ?, ?, ?, json_object(?3, 1), 1, 1, date(?4, 'unixepoch', '+5 hours'))
+    ON CONFLICT (user_id) DO UPDATE SET
+        latest_mood_log_id = CASE WHEN latest_mood_at IS NULL OR excluded.latest_mood_at >= latest_mood_at
+            THEN excluded.latest_mood_log_id ELSE latest_mood_log_id END,
+        latest_mood = CASE WHEN latest_mood_at IS NULL OR excluded.latest_mood_at >= latest_mood_at
+            THEN excluded.latest_mood ELSE latest_mood END,
+        latest_mood_at = CASE WHEN latest_mood_at IS NULL OR excluded.latest_mood_at >= latest_mood_at
+            THEN excluded.latest_mood_at ELSE latest_mood_at END,
+        mood_counts = json_set(
+            mood_counts, '$."' || excluded.latest_mood || '"',
+            COALESCE(json_extract(mood_counts, '$."' || excluded.latest_mood || '"'), 0) + 1
+        ),
+        total_mood_logs = total_mood_logs + 1,
+        streak_days = CASE
+            WHEN streak_last_day IS NULL THEN 1
+            WHEN excluded.streak_last_day <= streak_last_day THEN streak_days
+            WHEN excluded.streak_last_day = date(streak_last_day, '+1 day') THEN streak_days + 1
+            ELSE 1 END,
+        streak_last_day = MAX(COALESCE(streak_last_day, ''), excluded.streak_last_day)
+"""
+
+_RECORD_SESSION_START = """
+    INSERT INTO user_stats (user_id, last_session_id, last_session_started_at, session_count)
+    VALUES (?, ?, ?, 1)
+    ON CONFLICT (user_id) DO UPDATE SET
+        last_session_id = excluded.last_session_id,
+        last_session_started_at = excluded.last_session_started_at,
+        last_session_ended_at = NULL,
+        session_count = session_count + 1
+"""
+
+_RECORD_SESSION_END = """
+    UPDATE user_stats SET last_session_ended_at = ?1
+    WHERE user_id = (SELECT user_id FROM chat_sessions WHERE id = ?2) AND last_session_id = ?2
+"""
+
+
+def _answer_columns(answers: Dict[str, str]) -> Tuple[Optional[str], Optional[str]]:
+    """(answers_code, answers) column values: the compact code, or JSON if it does not fit."""
+    code = encode_answers(answers)
+    return (code, None) if code is not None else (None, json.dumps(answers))
+
+
+def _row_answers(row: sqlite3.Row) -> Dict[str, str]:
+    """Decode the answers of a mood_logs row (only done when they are asked for)."""
+    if row["answers_code"] is not None:
+        return decode_answers(row["answers_code"])
+    return json.loads(row["answers"])
+
+
+@db_timed
+def save_mood_log(user_id: int, mood: str, answers: Dict[str, str], created_at: Optional[int] = None) -> int:
     """Save a mood log entry. Returns the log id."""
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    cursor.execute(
-        "INSERT INTO mood_logs (user_id, mood, answers, created_at) VALUES (?, ?, ?, ?)",
-        (user_id, mood, answers, get_pkt_now())
-    )
-    conn.commit()
-    log_id = cursor.lastrowid
-    conn.close()
-    return log_id
-
-
-def get_user_mood_history(username: str) -> List[Dict]:
-    """Get all mood logs for a user."""
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    cursor.execute("""
-        SELECT ml.id, ml.mood, ml.answers, ml.created_at
+    created_at = created_at or now_epoch()
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "INSERT INTO mood_logs (user_id, mood, answers_code, answers, created_at) VALUES (?, ?, ?, ?, ?)",
+            (user_id, mood, *_answer_columns(answers), created_at)
+        )
+        log_id = cursor.lastrowid
+        cursor.execute(_RECORD_MOOD_STATS, (user_id, log_id, mood, created_at))
+        conn.commit()
+        return log_id
+
+
+@db_timed
+def save_mood_logs(entries: List[Tuple[int, str, Dict[str, str]]], created_at: Optional[int] = None) -> List[int]:
+    """
+    Save many (user_id, mood, answers) entries in one transaction.
+    Returns the new log ids in the same order.
+    """
+    if not entries:
+        return []
+
+    created_at = created_at or now_epoch()
+    with pooled_connection() as conn:
+        # Take the write lock up front so the new ids are consecutive
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT INTO mood_logs (user_id, mood, answers_code, answers, created_at) VALUES (?, ?, ?, ?, ?)",
+                [(user_id, mood, *_answer_columns(answers), created_at) for user_id, mood, answers in entries]
+            )
+            last_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+            first_id = last_id - len(entries) + 1
+            conn.executemany(_RECORD_MOOD_STATS, [
+                (user_id, log_id, mood, created_at)
+                for log_id, (user_id, mood, _) in enumerate(entries, start=first_id)
+            ])
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    return list(range(first_id, last_id + 1))
+
+
+@db_timed
+def get_user_mood_history(
+    username: str,
+    limit: Optional[int] = None,
+    before: Optional[int] = None,
+    with_answers: bool = False,
+    start: Optional[int] = None,
+    end: Optional[int] = None
+) -> List[Dict]:
+    """
+    Get mood logs for a user, newest first.
+    `before` is a keyset cursor: only logs older than that log id are returned.
+    `start`/`end` limit the logs to created_at in [start, end) (epochs), a
+    range scan of the (user_id, created_at) index.
+    Answers are only read and decoded with `with_answers`.
+    """
+    query = f"""
+        SELECT ml.id, ml.mood, ml.created_at{", ml.answers_code, ml.answers" if with_answers else ""}
         FROM mood_logs ml
         JOIN users u ON ml.user_id = u.id
         WHERE u.username = ?
-        ORDER BY ml.created_at DESC
-    """, (username,))
+    """
+    params = [username]
 
-    rows = cursor.fetchall()
-    conn.close()
+    if before is not None:
+        query += " AND (ml.created_at, ml.id) < (SELECT created_at, id FROM mood_logs WHERE id = ?)"
+        params.append(before)
 
-    return [
-        {
+    if start is not None:
+        query += " AND ml.created_at >= ?"
+        params.append(start)
+
+    if end is not None:
+        query += " AND ml.created_at < ?"
+        params.append(end)
+
+    query += " ORDER BY ml.created_at DESC, ml.id DESC LIMIT ?"
+    params.append(limit if limit is not None else -1)
+
+    with pooled_connection() as conn:
+        rows = conn.execute(query, params).fetchall()
+
+    history = [{"id": row["id"], "mood": row["mood"], "created_at": row["created_at"]} for row in rows]
+    if with_answers:
+        for entry, row in zip(history, rows):
+            entry["answers"] = _row_answers(row)
+    return history
+
+
+@db_timed
+def get_mood_log(log_id: int) -> Optional[Dict]:
+    """Get a single mood log by id."""
+    with pooled_connection() as conn:
+        row = conn.execute(
+            "SELECT id, user_id, mood, answers_code, answers, created_at FROM mood_logs WHERE id = ?",
+            (log_id,)
+        ).fetchone()
+
+    if row:
+        return {
             "id": row["id"],
+            "user_id": row["user_id"],
             "mood": row["mood"],
-            "answers": row["answers"],
+            "answers": _row_answers(row),
             "created_at": row["created_at"]
         }
-        for row in rows
-    ]
+    return None
 
 
-def create_chat_session(user_id: int, mood_log_id: int) -> int:
+@db_timed
+def create_chat_session(user_id: int, mood_log_id: int, started_at: Optional[int] = None) -> int:
     """Create a new chat session. Returns session id."""
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    cursor.execute(
-        "INSERT INTO chat_sessions (user_id, mood_log_id, started_at) VALUES (?, ?, ?)",
-        (user_id, mood_log_id, get_pkt_now())
-    )
-    conn.commit()
-    session_id = cursor.lastrowid
-    conn.close()
-    return session_id
+    started_at = started_at or now_epoch()
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        # Version stamp: one past the user's highest, computed inside the write
+        # so concurrent writers cannot hand out the same stamp
+        cursor.execute("""
+            INSERT INTO chat_sessions (user_id, mood_log_id, started_at, version)
+            VALUES (?, ?, ?, (SELECT COALESCE(MAX(version), 0) + 1 FROM chat_sessions WHERE user_id = ?))
+        """, (user_id, mood_log_id, started_at, user_id))
+        session_id = cursor.lastrowid
+        cursor.execute(_RECORD_SESSION_START, (user_id, session_id, started_at))
+        conn.commit()
+        return session_id
 
 
-def end_chat_session(session_id: int):
+@db_timed
+def end_chat_session(session_id: int, ended_at: Optional[int] = None):
     """Mark a chat session as ended."""
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    cursor.execute(
-        "UPDATE chat_sessions SET ended_at = ? WHERE id = ?",
-        (get_pkt_now(), session_id)
-    )
-    conn.commit()
-    conn.close()
+    ended_at = ended_at or now_epoch()
+    with pooled_connection() as conn:
+        conn.execute("""
+            UPDATE chat_sessions
+            SET ended_at = ?,
+                version = (SELECT MAX(s.version) + 1 FROM chat_sessions s WHERE s.user_id = chat_sessions.user_id)
+            WHERE id = ?
+        """, (ended_at, session_id))
+        conn.execute(_RECORD_SESSION_END, (ended_at, session_id))
+        conn.commit()
 
 
+@db_timed
 def save_chat_message(session_id: int, role: str, content: str) -> int:
     """Save a chat message. Returns message id."""
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    cursor.execute(
-        "INSERT INTO chat_messages (session_id, role, content, created_at) VALUES (?, ?, ?, ?)",
-        (session_id, role, content, get_pkt_now())
-    )
-    conn.commit()
-    message_id = cursor.lastrowid
-    conn.close()
-    return message_id
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "INSERT INTO chat_messages (session_id, role, content, created_at) VALUES (?, ?, ?, ?)",
+            (session_id, role, content, now_epoch())
+        )
+        conn.commit()
+        return cursor.lastrowid
+
+
+@db_timed
+def get_session_messages(
+    session_id: int,
+    after_id: int = 0,
+    limit: Optional[int] = None,
+    before: Optional[int] = None,
+    from_start: bool = False
+) -> List[Dict]:
+    """
+    Get messages for a chat session in order.
+
+    `after_id` returns only messages after that id. With `limit`, the newest
+    `limit` matching messages are returned (the oldest with `from_start`, for
+    catching up from `after_id`); `before` is a keyset cursor that pages back
+    to messages older than that id.
+    """
+    query = """
+        SELECT id, role, content, created_at
+        FROM chat_messages
+        WHERE session_id = ? AND id > ?
+    """
+    params = [session_id, after_id]
 
+    if before is not None:
+        query += " AND id < ?"
+        params.append(before)
 
-def get_session_messages(session_id: int) -> List[Dict]:
-    """Get all messages for a chat session."""
-    conn = get_connection()
-    cursor = conn.cursor()
+    if limit is None:
+        query += " ORDER BY id ASC"
+    elif from_start:
+        query += " ORDER BY id ASC LIMIT ?"
+        params.append(limit)
+    else:
+        query += " ORDER BY id DESC LIMIT ?"
+        params.append(limit)
 
-    cursor.execute("""
-        SELECT id, role, content, created_at
-        FROM chat_messages
-        WHERE session_id = ?
-        ORDER BY created_at ASC
-    """, (session_id,))
+    with pooled_connection() as conn:
+        rows = conn.execute(query, params).fetchall()
 
-    rows = cursor.fetchall()
-    conn.close()
+    if limit is not None and not from_start:
+        rows.reverse()
 
     return [
         {
@@ -227,22 +390,189 @@ def get_session_messages(session_id: int) -> List[Dict]:
     ]
 
 
-def get_user_chat_sessions(username: str) -> List[Dict]:
-    """Get all chat sessions for a user."""
-    conn = get_connection()
-    cursor = conn.cursor()
+@db_timed
+def get_session_info(session_id: int) -> Optional[Dict]:
+    """Get a chat session with its mood and owner's username."""
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT cs.user_id, cs.mood_log_id, cs.started_at, cs.ended_at, cs.summary, cs.summary_upto_id,
+                ml.mood, u.username
+            FROM chat_sessions cs
+            JOIN mood_logs ml ON cs.mood_log_id = ml.id
+            JOIN users u ON cs.user_id = u.id
+            WHERE cs.id = ?
+        """, (session_id,))
+        row = cursor.fetchone()
+
+    if row:
+        return {
+            "user_id": row["user_id"],
+            "mood_log_id": row["mood_log_id"],
+            "mood": row["mood"],
+            "username": row["username"],
+            "started_at": row["started_at"],
+            "ended_at": row["ended_at"],
+            "summary": row["summary"],
+            "summary_upto_id": row["summary_upto_id"]
+        }
+    return None
+
+
+@db_timed
+def get_chat_turn_context(session_id: int, mood_limit: int) -> Optional[Dict]:
+    """
+    Load the changing part of a chat turn's context in a single query: the
+    session's rolling summary, its unsummarized messages and the owner's latest
+    `mood_limit` mood logs (newest first). Session metadata (owner, mood) comes
+    from get_session_info, which never changes and is cached by entity_cache.
+    """
+    with pooled_connection() as conn:
+        row = conn.execute("""
+            SELECT cs.summary, cs.summary_upto_id,
+                (
+                    SELECT json_group_array(json_object(
+                        'id', m.id, 'role', m.role, 'content', m.content, 'created_at', m.created_at
+                    ))
+                    FROM (
+                        SELECT id, role, content, created_at
+                        FROM chat_messages
+                        WHERE session_id = cs.id AND id > cs.summary_upto_id
+                        ORDER BY id ASC
+                    ) m
+                ) AS messages,
+                (
+                    SELECT json_group_array(json_object(
+                        'id', h.id, 'mood', h.mood, 'created_at', h.created_at
+                    ))
+                    FROM (
+                        SELECT id, mood, created_at
+                        FROM mood_logs
+                        WHERE user_id = cs.user_id
+                        ORDER BY created_at DESC, id DESC
+                        LIMIT ?
+                    ) h
+                ) AS mood_history
+            FROM chat_sessions cs
+            WHERE cs.id = ?
+        """, (mood_limit, session_id)).fetchone()
+
+    if row is None:
+        return None
+
+    return {
+        "summary": row["summary"],
+        "summary_upto_id": row["summary_upto_id"],
+        "messages": json.loads(row["messages"]),
+        "mood_history": json.loads(row["mood_history"])
+    }
+
+
+@db_timed
+def save_chat_exchange(
+    session_id: int,
+    user_message: str,
+    assistant_message: str,
+    user_created_at: Optional[int] = None
+) -> Tuple[int, int]:
+    """
+    Save a user message and the assistant's reply with one INSERT.
+    Returns (user_message_id, assistant_message_id).
+    """
+    now = now_epoch()
+
+    with pooled_connection() as conn:
+        cursor = conn.execute(
+            "INSERT INTO chat_messages (session_id, role, content, created_at) VALUES (?, ?, ?, ?), (?, ?, ?, ?)",
+            (
+                session_id, "user", user_message, user_created_at or now,
+                session_id, "assistant", assistant_message, now
+            )
+        )
+        conn.commit()
+
+    # Rows of a single INSERT get consecutive ids
+    return cursor.lastrowid - 1, cursor.lastrowid
+
+
+@db_timed
+def get_last_chat_message_id() -> int:
+    """Highest chat message id ever handed out (including deleted rows)."""
+    with pooled_connection() as conn:
+        row = conn.execute("""
+            SELECT MAX(
+                COALESCE((SELECT MAX(id) FROM chat_messages), 0),
+                COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'chat_messages'), 0)
+            )
+        """).fetchone()
+    return row[0]
+
+
+@db_timed
+def insert_chat_messages(rows: List[Tuple[int, int, str, str, int]]):
+    """Insert (id, session_id, role, content, created_at) rows with preassigned ids in one transaction."""
+    with pooled_connection() as conn:
+        conn.executemany(
+            "INSERT INTO chat_messages (id, session_id, role, content, created_at) VALUES (?, ?, ?, ?, ?)",
+            rows
+        )
+        conn.commit()
+
 
-    cursor.execute("""
-        SELECT cs.id, cs.mood_log_id, cs.started_at, cs.ended_at, ml.mood
+@db_timed
+def save_session_summary(session_id: int, summary: str, upto_id: int, previous_upto_id: int) -> bool:
+    """
+    Store a new rolling summary for a session. Only applies if nobody else
+    advanced the summary since `previous_upto_id` was read.
+    """
+    with pooled_connection() as conn:
+        cursor = conn.execute(
+            "UPDATE chat_sessions SET summary = ?, summary_upto_id = ? WHERE id = ? AND summary_upto_id = ?",
+            (summary, upto_id, session_id, previous_upto_id)
+        )
+        conn.commit()
+        return cursor.rowcount == 1
+
+
+@db_timed
+def get_user_chat_sessions(
+    username: str,
+    limit: Optional[int] = None,
+    before: Optional[int] = None,
+    start: Optional[int] = None,
+    end: Optional[int] = None
+) -> List[Dict]:
+    """
+    Get chat sessions for a user, newest first.
+    `before` is a keyset cursor: only sessions older than that session id are returned.
+    `start`/`end` limit the sessions to started_at in [start, end) (epochs).
+    """
+    query = """
+        SELECT cs.id, cs.mood_log_id, cs.started_at, cs.ended_at, cs.version, ml.mood
         FROM chat_sessions cs
         JOIN users u ON cs.user_id = u.id
         JOIN mood_logs ml ON cs.mood_log_id = ml.id
         WHERE u.username = ?
-        ORDER BY cs.started_at DESC
-    """, (username,))
+    """
+    params = [username]
+
+    if before is not None:
+        query += " AND (cs.started_at, cs.id) < (SELECT started_at, id FROM chat_sessions WHERE id = ?)"
+        params.append(before)
 
-    rows = cursor.fetchall()
-    conn.close()
+    if start is not None:
+        query += " AND cs.started_at >= ?"
+        params.append(start)
+
+    if end is not None:
+        query += " AND cs.started_at < ?"
+        params.append(end)
+
+    query += " ORDER BY cs.started_at DESC, cs.id DESC LIMIT ?"
+    params.append(limit if limit is not None else -1)
+
+    with pooled_connection() as conn:
+        rows = conn.execute(query, params).fetchall()
 
     return [
         {
@@ -250,38 +580,269 @@ def get_user_chat_sessions(username: str) -> List[Dict]:
             "mood_log_id": row["mood_log_id"],
             "mood": row["mood"],
             "started_at": row["started_at"],
-            "ended_at": row["ended_at"]
+            "ended_at": row["ended_at"],
+            "version": row["version"]
         }
         for row in rows
     ]
 
 
-def get_latest_mood_log(username: str) -> Optional[Dict]:
-    """Get the most recent mood log for a user."""
-    conn = get_connection()
-    cursor = conn.cursor()
+@db_timed
+def get_chat_sessions_changed_since(user_id: int, version: int, limit: int) -> List[Dict]:
+    """A user's chat sessions created or changed after `version`, oldest change first."""
+    with pooled_connection() as conn:
+        rows = conn.execute("""
+            SELECT cs.id, cs.mood_log_id, cs.started_at, cs.ended_at, cs.version, ml.mood
+            FROM chat_sessions cs
+            JOIN mood_logs ml ON cs.mood_log_id = ml.id
+            WHERE cs.user_id = ? AND cs.version > ?
+            ORDER BY cs.version ASC
+            LIMIT ?
+        """, (user_id, version, limit)).fetchall()
 
-    cursor.execute("""
-        SELECT ml.id, ml.mood, ml.answers, ml.created_at
-        FROM mood_logs ml
-        JOIN users u ON ml.user_id = u.id
-        WHERE u.username = ?
-        ORDER BY ml.created_at DESC
-        LIMIT 1
-    """, (username,))
+    return [
+        {
+            "id": row["id"],
+            "mood_log_id": row["mood_log_id"],
+            "mood": row["mood"],
+            "started_at": row["started_at"],
+            "ended_at": row["ended_at"],
+            "version": row["version"]
+        }
+        for row in rows
+    ]
 
-    row = cursor.fetchone()
-    conn.close()
+
+@db_timed
+def get_chat_sessions_version(user_id: int) -> int:
+    """A user's current session version stamp (0 if they have no sessions)."""
+    with pooled_connection() as conn:
+        row = conn.execute(
+            "SELECT COALESCE(MAX(version), 0) FROM chat_sessions WHERE user_id = ?",
+            (user_id,)
+        ).fetchone()
+    return row[0]
+
+
+# Marks around matched terms in search snippets. The snippet is message text
+# the user wrote, so FTS5 brackets matches with private-use characters and the
+# text is HTML-escaped before those become the marks.
+SEARCH_HIGHLIGHT = ("<mark>", "</mark>")
+_SNIPPET_MARKS = ("\ue000", "\ue001")
+
+
+def _highlight(snippet: str) -> str:
+    """HTML-escaped snippet with the FTS5 match markers turned into SEARCH_HIGHLIGHT tags."""
+    escaped = html.escape(snippet)
+    for marker, tag in zip(_SNIPPET_MARKS, SEARCH_HIGHLIGHT):
+        escaped = escaped.replace(marker, tag)
+    return escaped
+
+
+def _search_expression(user_id: int, text: str) -> Optional[str]:
+    """
+    FTS5 query for the words in `text`, limited to one user's messages. Words are
+    quoted, so user input can never be read as query syntax. Returns None if
+    `text` has no searchable words.
+
+    No prefix matching: a prefix term has to merge every matching doclist in
+    full, while whole (stemmed) words are intersected with the much shorter
+    owner doclist.
+    """
+    words = re.findall(r"\w+", text)
+    if not words:
+        return None
+    terms = " ".join(f'"{word}"' for word in words)
+    return f'owner : "{user_id}" AND content : ({terms})'
+
+
+@db_timed
+def search_chat_messages(user_id: int, text: str, limit: int, offset: int = 0) -> List[Dict]:
+    """
+    Full-text search over one user's chat messages, best match first, with a
+    highlighted, HTML-escaped snippet of each. Messages written through the write-behind
+    journal show up once they are flushed.
+    """
+    expression = _search_expression(user_id, text)
+    if expression is None:
+        return []
+
+    with pooled_connection() as conn:
+        rows = conn.execute("""
+            SELECT m.id, m.session_id, m.role, m.created_at,
+                snippet(chat_message_search, 0, ?, ?, '…', 16) AS snippet
+            FROM chat_message_search s
+            JOIN chat_messages m ON m.id = s.rowid
+            WHERE chat_message_search MATCH ?
+            ORDER BY s.rank
+            LIMIT ? OFFSET ?
+        """, (*_SNIPPET_MARKS, expression, limit, offset)).fetchall()
+
+    return [
+        {
+            "id": row["id"],
+            "session_id": row["session_id"],
+            "role": row["role"],
+            "created_at": row["created_at"],
+            "snippet": _highlight(row["snippet"])
+        }
+        for row in rows
+    ]
+
+
+@db_timed
+def get_latest_mood_log(username: str) -> Optional[Dict]:
+    """Get the most recent mood log for a user."""
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT ml.id, ml.mood, ml.answers_code, ml.answers, ml.created_at
+            FROM mood_logs ml
+            JOIN users u ON ml.user_id = u.id
+            WHERE u.username = ?
+            ORDER BY ml.created_at DESC, ml.id DESC
+            LIMIT 1
+        """, (username,))
+        row = cursor.fetchone()
 
     if row:
         return {
             "id": row["id"],
             "mood": row["mood"],
-            "answers": row["answers"],
+            "answers": _row_answers(row),
             "created_at": row["created_at"]
         }
     return None
 
 
+@db_timed
+def get_answer_distribution(user_id: int) -> Dict[str, Dict[str, int]]:
+    """
+    How often each option was picked per question across a user's mood logs:
+    {"q1": {"A": 3, "C": 1}, ...}. Reads only the (user_id, answers_code) index.
+    """
+    with pooled_connection() as conn:
+        codes = [row[0] for row in conn.execute(
+            "SELECT answers_code FROM mood_logs WHERE user_id = ? AND answers_code IS NOT NULL",
+            (user_id,)
+        )]
+
+    distribution = {question: {} for question in QUESTION_IDS}
+    # zip(*codes) walks the codes one question (character position) at a time
+    for question, options in zip(QUESTION_IDS, zip(*codes)):
+        counts = Counter(options)
+        counts.pop(UNANSWERED, None)
+        distribution[question] = dict(sorted(counts.items()))
+    return distribution
+
+
+@db_timed
+def get_mood_log_batch(after_id: int, limit: int, moods: Sequence[str]) -> List[Tuple[int, int, int, int]]:
+    """
+    The next `limit` mood logs after `after_id`, in id order, as plain
+    (id, user_id, mood_index, created_at) integer tuples for the analytics
+    module. mood_index is the mood's position in `moods`, or -1.
+    """
+    mood_index = " ".join(f"WHEN ? THEN {i}" for i in range(len(moods)))
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        # Tuples, not sqlite3.Row: these are read in bulk and turned into arrays
+        cursor.row_factory = None
+        return cursor.execute(
+            f"""
+            SELECT id, user_id, CASE mood {mood_index} ELSE -1 END, created_at
+            FROM mood_logs WHERE id > ? ORDER BY id LIMIT ?
+            """,
+            (*moods, after_id, limit)
+        ).fetchall()
+
+
+@db_timed
+def get_user_mood_series(
+    user_id: int,
+    max_id: Optional[int] = None,
+    start: Optional[int] = None
+) -> List[Tuple[int, str, int]]:
+    """
+    A user's (id, mood, created_at) tuples, oldest first, optionally only up
+    to log id `max_id` and from created_at `start` (epoch) on.
+    """
+    query = "SELECT id, mood, created_at FROM mood_logs WHERE user_id = ?"
+    params = [user_id]
+
+    if start is not None:
+        query += " AND created_at >= ?"
+        params.append(start)
+
+    if max_id is not None:
+        query += " AND id <= ?"
+        params.append(max_id)
+
+    query += " ORDER BY created_at, id"
+
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        cursor.row_factory = None
+        return cursor.execute(query, params).fetchall()
+
+
+@db_timed
+def get_user_stats(user_id: int) -> Optional[Dict]:
+    """A user's dashboard numbers from user_stats, or None if they have no activity yet."""
+    with pooled_connection() as conn:
+        row = conn.execute("SELECT * FROM user_stats WHERE user_id = ?", (user_id,)).fetchone()
+
+    if row is None:
+        return None
+    return {
+        "latest_mood_log_id": row["latest_mood_log_id"],
+        "latest_mood": row["latest_mood"],
+        "latest_mood_at": row["latest_mood_at"],
+        "mood_counts": json.loads(row["mood_counts"]),
+        "total_mood_logs": row["total_mood_logs"],
+        "streak_days": row["streak_days"],
+        "streak_last_day": row["streak_last_day"],
+        "last_session_id": row["last_session_id"],
+        "last_session_started_at": row["last_session_started_at"],
+        "last_session_ended_at": row["last_session_ended_at"],
+        "session_count": row["session_count"]
+    }
+
+
+@db_timed
+def get_cached_mood_classification(answers_key: str, prompt_hash: str) -> Optional[str]:
+    """Get a previously classified mood for an answer set, or None."""
+    with pooled_connection() as conn:
+        row = conn.execute(
+            "SELECT mood FROM mood_classification_cache WHERE answers_key = ? AND prompt_hash = ?",
+            (answers_key, prompt_hash)
+        ).fetchone()
+
+    return row["mood"] if row else None
+
+
+@db_timed
+def save_mood_classification(answers_key: str, prompt_hash: str, mood: str):
+    """Store the classified mood for an answer set."""
+    with pooled_connection() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO mood_classification_cache (answers_key, prompt_hash, mood, created_at) VALUES (?, ?, ?, ?)",
+            (answers_key, prompt_hash, mood, now_epoch())
+        )
+        conn.commit()
+
+
+@db_timed
+def purge_mood_classifications(keep_prompt_hash: str) -> int:
+    """Delete cached classifications made with any other prompt/model. Returns rows removed."""
+    with pooled_connection() as conn:
+        cursor = conn.execute(
+            "DELETE FROM mood_classification_cache WHERE prompt_hash != ?",
+            (keep_prompt_hash,)
+        )
+        conn.commit()
+        return cursor.rowcount
+
+
 # Initialize database on import
 init_db()
@@ -0,0 +1,129 @@
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Dict
+
+# Maximum number of open connections and how long a caller waits for a free one
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+
+# Applied once when a connection is opened, not on every checkout
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA mmap_size=268435456",  # 256 MB
+    "PRAGMA cache_size=-16000",    # ~16 MB page cache
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA busy_timeout=5000",
+)
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection becomes free within the pool timeout."""
+
+
+class ConnectionPool:
+    """
+    Bounded pool of SQLite connections shared by all threads.
+
+    Connections are opened lazily, configured once with CONNECTION_PRAGMAS
+    and reused for the life of the process.
+    """
+
+    def __init__(self, path: str, size: int = DB_POOL_SIZE, timeout: float = DB_POOL_TIMEOUT):
+        self.path = path
+        self.size = size
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        """Start with an empty pool (also used after a fork)."""
+        self._pid = os.getpid()
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._created = 0
+        self._checkouts = 0
+        self._waits = 0
+
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=self.timeout, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        with self._lock:
+            self._created += 1
+        return conn
+
+    def _acquire(self) -> sqlite3.Connection:
+        if os.getpid() != self._pid:
+            # Connections must not be shared with a parent process
+            with self._lock:
+                if os.getpid() != self._pid:
+                    self._reset()
+
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._waits += 1
+            if not self._slots.acquire(timeout=self.timeout):
+                raise PoolTimeout(f"No database connection available after {self.timeout}s")
+
+        with self._lock:
+            self._checkouts += 1
+
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        try:
+            return self._open()
+        except Exception:
+            self._slots.release()
+            raise
+
+    def _release(self, conn: sqlite3.Connection):
+        try:
+            if conn.in_transaction:
+                # Never hand out a connection with someone else's open transaction
+                conn.rollback()
+            self._idle.put(conn)
+        except sqlite3.Error:
+            conn.close()
+            with self._lock:
+                self._created -= 1
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        """Check out a connection for the duration of a `with` block."""
+        conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            self._release(conn)
+
+    def close_all(self):
+        """Close every idle connection."""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._created -= 1
+
+    def stats(self) -> Dict[str, int]:
+        """Return pool usage counters."""
+        with self._lock:
+            return {
+                "size": self.size,
+                "open": self._created,
+                "idle": self._idle.qsize(),
+                "checkouts": self._checkouts,
+                "waits": self._waits,
+            }
@@ -0,0 +1,187 @@
+import os
+from typing import Dict, List, Optional, Tuple
+from . import database
+from .cache import LRUCache
+from .timestamps import now_epoch
+from .metrics import Gauge, register_collector
+
+# Entries per cache (users, sessions, latest mood logs)
+ENTITY_CACHE_SIZE = int(os.getenv("ENTITY_CACHE_SIZE", "10000"))
+
+# Seconds an entry is trusted. Writes through this module keep the cache current;
+# the TTL bounds staleness from writes made by other worker processes.
+ENTITY_CACHE_TTL = float(os.getenv("ENTITY_CACHE_TTL", "300"))
+
+# username -> user
+_users = LRUCache(ENTITY_CACHE_SIZE, ttl=ENTITY_CACHE_TTL)
+
+# session_id -> session metadata (owner, mood, start/end); the summary is not cached
+_sessions = LRUCache(ENTITY_CACHE_SIZE, ttl=ENTITY_CACHE_TTL)
+
+# user_id -> that user's latest mood log
+_latest_moods = LRUCache(ENTITY_CACHE_SIZE, ttl=ENTITY_CACHE_TTL)
+
+
+# --- Users ---
+
+def get_user(username: str) -> Optional[Dict]:
+    """Cached database.get_user. Unknown usernames are not cached."""
+    user = _users.get(username)
+    if user is None:
+        user = database.get_user(username)
+        if user is not None:
+            _users.set(username, user)
+    return user
+
+
+def get_users(usernames: List[str]) -> Dict[str, Dict]:
+    """Cached database.get_users: only the usernames missing from the cache are queried."""
+    users = {}
+    missing = []
+    for username in dict.fromkeys(usernames):
+        user = _users.get(username)
+        if user is None:
+            missing.append(username)
+        else:
+            users[username] = user
+
+    if missing:
+        for username, user in database.get_users(missing).items():
+            _users.set(username, user)
+            users[username] = user
+
+    return users
+
+
+def user_exists(username: str) -> bool:
+    return get_user(username) is not None
+
+
+def create_user(username: str) -> Optional[int]:
+    """Create a user and cache it. Returns user_id or None if username exists."""
+    created_at = now_epoch()
+    user_id = database.create_user(username, created_at=created_at)
+    if user_id is not None:
+        _users.set(username, {"id": user_id, "username": username, "created_at": created_at})
+    return user_id
+
+
+# --- Mood logs ---
+
+def get_latest_mood_log(user: Dict) -> Optional[Dict]:
+    """Cached database.get_latest_mood_log for `user`. Users with no mood logs are not cached."""
+    latest = _latest_moods.get(user["id"])
+    if latest is None:
+        latest = database.get_latest_mood_log(user["username"])
+        if latest is not None:
+            latest = {**latest, "user_id": user["id"]}
+            _latest_moods.set(user["id"], latest)
+    return latest
+
+
+def _cache_latest(user_id: int, log_id: int, mood: str, answers: Dict[str, str], created_at: int):
+    _latest_moods.set(user_id, {
+        "id": log_id,
+        "user_id": user_id,
+        "mood": mood,
+        "answers": answers,
+        "created_at": created_at
+    })
+
+
+def save_mood_log(user_id: int, mood: str, answers: Dict[str, str]) -> int:
+    """Save a mood log and cache it as the user's latest. Returns the log id."""
+    created_at = now_epoch()
+    log_id = database.save_mood_log(user_id, mood, answers, created_at=created_at)
+    _cache_latest(user_id, log_id, mood, answers, created_at)
+    return log_id
+
+
+def save_mood_logs(entries: List[Tuple[int, str, Dict[str, str]]]) -> List[int]:
+    """Save many (user_id, mood, answers) entries and cache each user's last one."""
+    created_at = now_epoch()
+    log_ids = database.save_mood_logs(entries, created_at=created_at)
+    for log_id, (user_id, mood, answers) in zip(log_ids, entries):
+        _cache_latest(user_id, log_id, mood, answers, created_at)
+    return log_ids
+
+
+def get_user_mood_log(log_id: int, user: Dict) -> Optional[Dict]:
+    """
+    Get one of `user`'s mood logs, served from the latest-log cache when it is
+    the one just recorded (the usual case when a chat is started).
+    """
+    latest = get_latest_mood_log(user)
+    if latest is not None and latest["id"] == log_id:
+        return latest
+
+    mood_log = database.get_mood_log(log_id)
+    if mood_log is None or mood_log["user_id"] != user["id"]:
+        return None
+    return mood_log
+
+
+# --- Chat sessions ---
+
+def get_session(session_id: int) -> Optional[Dict]:
+    """Session metadata: user_id, mood_log_id, mood, username, started_at, ended_at."""
+    session = _sessions.get(session_id)
+    if session is None:
+        info = database.get_session_info(session_id)
+        if info is None:
+            return None
+        session = {
+            key: info[key]
+            for key in ("user_id", "mood_log_id", "mood", "username", "started_at", "ended_at")
+        }
+        _sessions.set(session_id, session)
+    return session
+
+
+def create_chat_session(user: Dict, mood_log: Dict) -> int:
+    """Create a chat session for `user` about `mood_log` and cache it. Returns session id."""
+    started_at = now_epoch()
+    session_id = database.create_chat_session(user["id"], mood_log["id"], started_at=started_at)
+    _sessions.set(session_id, {
+        "user_id": user["id"],
+        "mood_log_id": mood_log["id"],
+        "mood": mood_log["mood"],
+        "username": user["username"],
+        "started_at": started_at,
+        "ended_at": None
+    })
+    return session_id
+
+
+def end_chat_session(session_id: int):
+    """Mark a chat session as ended, here and in the database."""
+    ended_at = now_epoch()
+    database.end_chat_session(session_id, ended_at=ended_at)
+    session = _sessions.pop(session_id)
+    if session is not None:
+        _sessions.set(session_id, {**session, "ended_at": ended_at})
+
+
+def stats() -> Dict:
+    """Size and hit-rate counters for each cache."""
+    return {
+        "users": _users.stats(),
+        "sessions": _sessions.stats(),
+        "latest_mood_logs": _latest_moods.stats(),
+        "ttl_seconds": ENTITY_CACHE_TTL
+    }
+
+
+ENTITY_CACHE_LOOKUPS = Gauge("entity_cache_lookups", "User/session/mood cache lookups by result.", ["cache", "result"])
+ENTITY_CACHE_ENTRIES = Gauge("entity_cache_entries", "Entries held per cache.", ["cache"])
+
+
+def _collect_cache_metrics():
+    for name, cache in (("users", _users), ("sessions", _sessions), ("latest_mood_logs", _latest_moods)):
+        cache_stats = cache.stats()
+        ENTITY_CACHE_LOOKUPS.set(cache_stats["hits"], cache=name, result="hit")
+        ENTITY_CACHE_LOOKUPS.set(cache_stats["misses"], cache=name, result="miss")
+        ENTITY_CACHE_ENTRIES.set(cache_stats["size"], cache=name)
+
+
+register_collector(_collect_cache_metrics)
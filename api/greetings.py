@@ -0,0 +1,83 @@
+import asyncio
+import os
+from typing import Dict, List, Optional
+from .cache import LRUCache
+from .database import get_user_mood_history
+from .llm_logic_for_psychiatrist import get_initial_greeting
+from .llm_scheduler import LLMOverloaded
+from .metrics import Counter
+
+# Generate the chat greeting as soon as a mood is detected, before the chat is started
+GREETING_PREFETCH = os.getenv("GREETING_PREFETCH", "1") != "0"
+
+# Seconds a pre-generated greeting stays usable
+GREETING_TTL = float(os.getenv("GREETING_TTL", "600"))
+GREETING_CACHE_SIZE = int(os.getenv("GREETING_CACHE_SIZE", "2048"))
+
+# Mood entries included in the greeting prompt (same as the chat routes)
+MOOD_CONTEXT_SIZE = 10
+
+GREETING_PREFETCH_RESULTS = Counter(
+    "greeting_prefetch_total", "Chat starts by what the greeting prefetch had ready.", ["result"]
+)
+
+# mood_log_id -> finished greeting
+_ready = LRUCache(GREETING_CACHE_SIZE, ttl=GREETING_TTL)
+
+# mood_log_id -> greeting still being generated
+_pending: Dict[int, asyncio.Task] = {}
+
+
+async def _generate(mood_log_id: int, username: str, mood: str) -> Optional[str]:
+    try:
+        mood_history = get_user_mood_history(username, limit=MOOD_CONTEXT_SIZE)
+        greeting = await get_initial_greeting(mood, mood_history)
+        if greeting is not None:
+            _ready.set(mood_log_id, greeting)
+        return greeting
+    except Exception as e:
+        print(f"Greeting prefetch failed: {e!r}")
+        return None
+    finally:
+        _pending.pop(mood_log_id, None)
+
+
+def prefetch_greeting(mood_log_id: int, username: str, mood: str):
+    """Start generating the greeting for a just-saved mood log in the background."""
+    if not GREETING_PREFETCH or mood_log_id in _pending:
+        return
+    _pending[mood_log_id] = asyncio.create_task(_generate(mood_log_id, username, mood))
+
+
+async def get_greeting(mood_log_id: int, mood: str, mood_history: List[Dict]) -> Optional[str]:
+    """
+    Greeting for a chat started from `mood_log_id`: the pre-generated one if it
+    is ready, the one still being generated if not, otherwise a live call.
+    """
+    greeting = _ready.get(mood_log_id)
+    if greeting is not None:
+        GREETING_PREFETCH_RESULTS.inc(result="ready")
+        return greeting
+
+    task = _pending.get(mood_log_id)
+    if task is not None and task.get_loop() is asyncio.get_running_loop():
+        # Shielded, so a client disconnect here does not cancel the shared task
+        greeting = await asyncio.shield(task)
+        if greeting is not None:
+            GREETING_PREFETCH_RESULTS.inc(result="pending")
+            return greeting
+
+    GREETING_PREFETCH_RESULTS.inc(result="miss")
+    try:
+        return await get_initial_greeting(mood, mood_history)
+    except LLMOverloaded:
+        # The caller falls back to a standard greeting
+        return None
+
+
+async def cancel_prefetches():
+    """Cancel greetings still being generated (on shutdown)."""
+    tasks = list(_pending.values())
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
@@ -1,10 +1,28 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from mangum import Mangum
 
-from .routes import auth, mood, chat
+from .routes import auth, mood, chat, dashboard, analytics
+from .ollama_client import backend_pool, close_client
+from .greetings import cancel_prefetches
+from .llm_scheduler import LLMOverloaded
+from . import entity_cache, message_journal
+from .metrics import RequestMetricsMiddleware, render_metrics
 
-app = FastAPI(title="Mental Health Analyzer API")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    await cancel_prefetches()
+    # Release pooled keep-alive connections to Ollama
+    await close_client()
+    # Write out chat messages still buffered by the write-behind journal
+    message_journal.close()
+
+
+app = FastAPI(title="Mental Health Analyzer API", lifespan=lifespan)
 
 # CORS middleware for frontend
 app.add_middleware(
@@ -15,16 +33,47 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-route request counts and latency histograms (see /api/metrics)
+app.add_middleware(RequestMetricsMiddleware)
+
+
+@app.exception_handler(LLMOverloaded)
+async def llm_overloaded_handler(request: Request, exc: LLMOverloaded):
+    """The model backends are saturated: fail fast and tell the client when to retry."""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "The assistant is busy right now. Please try again shortly."},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
 # Include routers
 app.include_router(auth.router, prefix="/api/auth", tags=["auth"])
 app.include_router(mood.router, prefix="/api/mood", tags=["mood"])
 app.include_router(chat.router, prefix="/api/chat", tags=["chat"])
+app.include_router(dashboard.router, prefix="/api/dashboard", tags=["dashboard"])
+app.include_router(analytics.router, prefix="/api/analytics", tags=["analytics"])
 
 
 @app.get("/api/health")
 async def health_check():
     """Health check endpoint."""
-    return {"status": "healthy", "message": "Mental Health Analyzer API is running"}
+    return {
+        "status": "healthy",
+        "message": "Mental Health Analyzer API is running",
+        "llm_backends": backend_pool.status()
+    }
+
+
+@app.get("/api/cache-stats")
+async def cache_stats():
+    """Size and hit rate of the user, session and latest-mood caches."""
+    return entity_cache.stats()
+
+
+@app.get("/api/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """API, database and LLM metrics in Prometheus text format."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
 
 
 # Vercel serverless handler
@@ -1,19 +1,53 @@
-import requests
+import asyncio
 import json
 import os
-from typing import Optional, Dict
-from dotenv import load_dotenv
+from typing import Optional, Dict, List
+from .answers import normalize_answers, answers_key
+from .mood_cache import MoodClassificationCache, prompt_fingerprint
+from .mood_rules import score_answers, MOOD_RULES_MIN_CONFIDENCE
+from .metrics import Gauge, register_collector
+from .ollama_client import chat
+from .llm_scheduler import LLMOverloaded
 from .prompt_for_mood_detection import system_prompt
 
-# Load environment variables from .env
-load_dotenv()
-
 MODEL = "gpt-oss:20b-cloud"
-OLLAMA_API_KEY = os.getenv("OLLAMA_API_KEY")
-OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434/api/chat")
 
+# Classification is deterministic (fixed seed, low temperature), so identical
+# answer sets are answered from the cache until the prompt or model changes
+mood_cache = MoodClassificationCache(prompt_fingerprint(MODEL, system_prompt))
+
+# A one-word classification should come back quickly
+MOOD_TIMEOUT = 30
+
+# Maximum number of model calls a single batch keeps in flight
+MOOD_BATCH_CONCURRENCY = int(os.getenv("MOOD_BATCH_CONCURRENCY", "8"))
+
+# How each classification was answered
+classifier_stats = {
+    "rules": 0,           # confident rule-based result, no model call
+    "cache": 0,           # low-confidence set answered from the cache
+    "model": 0,           # answered by the model
+    "rules_fallback": 0,  # model failed, low-confidence rule result used
+    "failed": 0           # no result at all
+}
+
+MOOD_CLASSIFICATIONS = Gauge("mood_classifications", "Mood classifications by source.", ["source"])
+MOOD_CACHE_LOOKUPS = Gauge("mood_cache_lookups", "Classification cache lookups by result.", ["result"])
+
+
+def _collect_classifier_metrics():
+    for source, count in classifier_stats.items():
+        MOOD_CLASSIFICATIONS.set(count, source=source)
+    stats = mood_cache.stats()
+    MOOD_CACHE_LOOKUPS.set(stats["memory_hits"], result="memory_hit")
+    MOOD_CACHE_LOOKUPS.set(stats["db_hits"], result="db_hit")
+    MOOD_CACHE_LOOKUPS.set(stats["misses"], result="miss")
+
+
+register_collector(_collect_classifier_metrics)
 
-def query_mood_model(answers: Dict[str, str], system_prompt: str) -> Optional[str]:
+
+async def query_mood_model(answers: Dict[str, str], system_prompt: str) -> Optional[str]:
     """
     Sends the 10-question answers to your Ollama model and returns ONE WORD (mood).
     """
@@ -24,54 +58,20 @@ def query_mood_model(answers: Dict[str, str], system_prompt: str) -> Optional[st
         {"role": "user", "content": json.dumps(answers)}
     ]
 
-    # Headers with API key
-    headers = {
-        "Content-Type": "application/json"
-    }
-    if OLLAMA_API_KEY:
-        headers["Authorization"] = f"Bearer {OLLAMA_API_KEY}"
-
-    try:
-        response = requests.post(
-            OLLAMA_URL,
-            headers=headers,
-            json={
-                "model": MODEL,
-                "messages": messages,
-                "options": {
-                    "seed": 42,
-                    "temperature": 0.1
-                }
-            },
-            stream=False
-        )
-    except Exception as e:
-        print(f"Error connecting to Ollama: {e}")
+    full_output = await chat(
+        MODEL,
+        messages,
+        options={
+            "seed": 42,
+            "temperature": 0.1
+        },
+        timeout=MOOD_TIMEOUT,
+        purpose="mood"
+    )
+
+    if full_output is None:
         return None
 
-    # Raw streaming-like output (Ollama returns JSON lines)
-    raw_lines = response.text.strip().split("\n")
-    full_output = ""
-
-    for line in raw_lines:
-        if not line.strip():
-            continue
-
-        try:
-            data = json.loads(line)
-            msg = data.get("message", {})
-            content = msg.get("content", "")
-
-            if content:
-                full_output += content.strip()
-
-            # When "done": true → stop
-            if data.get("done", False):
-                break
-
-        except json.JSONDecodeError:
-            continue
-
     full_output = full_output.strip()
 
     # Validate against allowed categories (5 mood system)
@@ -96,3 +96,73 @@ def query_mood_model(answers: Dict[str, str], system_prompt: str) -> Optional[st
         return None
 
     return mood
+
+
+async def classify_mood(answers: Dict[str, str]) -> Optional[str]:
+    """
+    Return the mood for an answer set.
+
+    Confident rule-based scores are returned directly; otherwise the
+    classification cache and then the model are consulted. If the model is
+    unavailable the rule-based mood is used anyway.
+    """
+    answers = normalize_answers(answers)
+
+    rules = score_answers(answers)
+    if rules.mood is not None and rules.confidence >= MOOD_RULES_MIN_CONFIDENCE:
+        classifier_stats["rules"] += 1
+        return rules.mood
+
+    key = answers_key(answers)
+    mood = mood_cache.get(key)
+    if mood is not None:
+        classifier_stats["cache"] += 1
+        return mood
+
+    try:
+        mood = await query_mood_model(answers, system_prompt)
+    except LLMOverloaded:
+        # Too busy for the model: an unconfident rule result beats a 503
+        if rules.mood is None:
+            raise
+        mood = None
+
+    if mood is not None:
+        classifier_stats["model"] += 1
+        mood_cache.set(key, mood)
+        return mood
+
+    if rules.mood is not None:
+        classifier_stats["rules_fallback"] += 1
+        return rules.mood
+
+    classifier_stats["failed"] += 1
+    return None
+
+
+async def classify_moods(
+    answer_sets: List[Dict[str, str]],
+    concurrency: int = MOOD_BATCH_CONCURRENCY
+) -> List[Optional[str]]:
+    """
+    Classify many answer sets. Identical sets are classified once, and at most
+    `concurrency` classifications run at the same time. Results keep input order.
+    """
+    keys = [answers_key(answers) for answers in answer_sets]
+    unique = {}
+    for key, answers in zip(keys, answer_sets):
+        unique.setdefault(key, answers)
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def classify_one(answers: Dict[str, str]) -> Optional[str]:
+        async with semaphore:
+            try:
+                return await classify_mood(answers)
+            except LLMOverloaded:
+                return None
+
+    moods = await asyncio.gather(*(classify_one(answers) for answers in unique.values()))
+    by_key = dict(zip(unique.keys(), moods))
+
+    return [by_key[key] for key in keys]
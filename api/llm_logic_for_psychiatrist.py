@@ -1,34 +1,44 @@
-import requests
-import json
-import os
-from typing import Optional, List, Dict
-from dotenv import load_dotenv
-from .prompt_for_psychiatrist import get_psychiatrist_prompt
-
-# Load environment variables from .env
-load_dotenv()
+from contextlib import aclosing
+from typing import AsyncIterator, Optional, List, Dict
+from .ollama_client import chat, stream_chat
+from .prompt_for_psychiatrist import get_cached_psychiatrist_prompt
 
 MODEL = "gpt-oss:20b-cloud"
-OLLAMA_API_KEY = os.getenv("OLLAMA_API_KEY")
-OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434/api/chat")
+
+CHAT_OPTIONS = {
+    "temperature": 0.5,
+    "num_predict": 150
+}
+CHAT_TIMEOUT = 60
+
+SUMMARY_OPTIONS = {
+    "temperature": 0.2,
+    "num_predict": 250
+}
 
 
-def chat_with_psychiatrist(
+def _build_chat_messages(
     user_message: str,
     current_mood: str,
     mood_history: List[Dict],
-    conversation_history: List[Dict]
-) -> Optional[str]:
-    """
-    Send a message to the psychiatrist chatbot and get a response.
-    """
+    conversation_history: List[Dict],
+    conversation_summary: Optional[str] = None
+) -> List[Dict]:
+    """Build the Ollama messages array for a chat turn."""
 
-    # Generate system prompt with mood context
-    system_prompt = get_psychiatrist_prompt(current_mood, mood_history)
+    # System prompt with mood context, identical across the turns of a session
+    system_prompt = get_cached_psychiatrist_prompt(current_mood, mood_history)
 
     # Build messages array
     messages = [{"role": "system", "content": system_prompt}]
 
+    # Older turns that no longer fit verbatim are carried as a summary
+    if conversation_summary:
+        messages.append({
+            "role": "system",
+            "content": f"Summary of the earlier part of this conversation:\n{conversation_summary}"
+        })
+
     # Add conversation history
     for msg in conversation_history:
         messages.append({
@@ -39,62 +49,54 @@ def chat_with_psychiatrist(
     # Add current user message
     messages.append({"role": "user", "content": user_message})
 
-    # Headers with API key
-    headers = {"Content-Type": "application/json"}
-    if OLLAMA_API_KEY:
-        headers["Authorization"] = f"Bearer {OLLAMA_API_KEY}"
-
-    try:
-        response = requests.post(
-            OLLAMA_URL,
-            headers=headers,
-            json={
-                "model": MODEL,
-                "messages": messages,
-                "options": {
-                    "temperature": 0.5,
-                    "num_predict": 150
-                }
-            },
-            stream=False,
-            timeout=60
-        )
-    except Exception as e:
-        print(f"Error connecting to Ollama: {e}")
-        return None
-
-    # Parse response (Ollama returns JSON lines)
-    raw_lines = response.text.strip().split("\n")
-    full_output = ""
-
-    for line in raw_lines:
-        if not line.strip():
-            continue
-
-        try:
-            data = json.loads(line)
-            msg = data.get("message", {})
-            content = msg.get("content", "")
-
-            if content:
-                full_output += content
-
-            if data.get("done", False):
-                break
-
-        except json.JSONDecodeError:
-            continue
+    return messages
+
+
+async def chat_with_psychiatrist(
+    user_message: str,
+    current_mood: str,
+    mood_history: List[Dict],
+    conversation_history: List[Dict],
+    conversation_summary: Optional[str] = None
+) -> Optional[str]:
+    """
+    Send a message to the psychiatrist chatbot and get a response.
+    """
+    messages = _build_chat_messages(
+        user_message, current_mood, mood_history, conversation_history, conversation_summary
+    )
+
+    full_output = await chat(MODEL, messages, CHAT_OPTIONS, timeout=CHAT_TIMEOUT)
 
     return full_output.strip() if full_output else None
 
 
-def get_initial_greeting(current_mood: str, mood_history: List[Dict]) -> Optional[str]:
+async def stream_chat_with_psychiatrist(
+    user_message: str,
+    current_mood: str,
+    mood_history: List[Dict],
+    conversation_history: List[Dict],
+    conversation_summary: Optional[str] = None
+) -> AsyncIterator[str]:
+    """
+    Send a message to the psychiatrist chatbot and yield the response as it is generated.
+    """
+    messages = _build_chat_messages(
+        user_message, current_mood, mood_history, conversation_history, conversation_summary
+    )
+
+    async with aclosing(stream_chat(MODEL, messages, CHAT_OPTIONS, timeout=CHAT_TIMEOUT)) as tokens:
+        async for token in tokens:
+            yield token
+
+
+async def get_initial_greeting(current_mood: str, mood_history: List[Dict]) -> Optional[str]:
     """
     Get the initial greeting from the psychiatrist when starting a session.
     """
 
-    # Create a prompt for initial greeting
-    system_prompt = get_psychiatrist_prompt(current_mood, mood_history)
+    # Same system prompt as the chat turns that follow, so they reuse its evaluation
+    system_prompt = get_cached_psychiatrist_prompt(current_mood, mood_history)
 
     initial_prompt = """Say hi and ask how they're doing. 2-3 sentences MAX. One question only."""
 
@@ -103,48 +105,36 @@ def get_initial_greeting(current_mood: str, mood_history: List[Dict]) -> Optiona
         {"role": "user", "content": initial_prompt}
     ]
 
-    headers = {"Content-Type": "application/json"}
-    if OLLAMA_API_KEY:
-        headers["Authorization"] = f"Bearer {OLLAMA_API_KEY}"
-
-    try:
-        response = requests.post(
-            OLLAMA_URL,
-            headers=headers,
-            json={
-                "model": MODEL,
-                "messages": messages,
-                "options": {
-                    "temperature": 0.5,
-                    "num_predict": 150
-                }
-            },
-            stream=False,
-            timeout=60
-        )
-    except Exception as e:
-        print(f"Error connecting to Ollama: {e}")
-        return None
-
-    raw_lines = response.text.strip().split("\n")
-    full_output = ""
-
-    for line in raw_lines:
-        if not line.strip():
-            continue
-
-        try:
-            data = json.loads(line)
-            msg = data.get("message", {})
-            content = msg.get("content", "")
-
-            if content:
-                full_output += content
-
-            if data.get("done", False):
-                break
-
-        except json.JSONDecodeError:
-            continue
+    full_output = await chat(MODEL, messages, CHAT_OPTIONS, timeout=CHAT_TIMEOUT, purpose="greeting")
+
+    return full_output.strip() if full_output else None
+
+
+async def summarize_conversation(previous_summary: Optional[str], messages: List[Dict]) -> Optional[str]:
+    """
+    Fold older conversation turns into a short running summary.
+    """
+    transcript = "\n".join(
+        f"{'User' if msg['role'] == 'user' else 'Therapist'}: {msg['content']}"
+        for msg in messages
+    )
+
+    prompt = f"""Update the summary of a therapy conversation with the new turns below.
+Keep what the user shared (feelings, situations, names, goals) and any advice already given.
+Write at most 6 short sentences in third person. Output only the summary.
+
+CURRENT SUMMARY:
+{previous_summary or "(none yet)"}
+
+NEW TURNS:
+{transcript}"""
+
+    full_output = await chat(
+        MODEL,
+        [{"role": "user", "content": prompt}],
+        SUMMARY_OPTIONS,
+        timeout=CHAT_TIMEOUT,
+        purpose="summary"
+    )
 
     return full_output.strip() if full_output else None
@@ -0,0 +1,138 @@
+import asyncio
+import heapq
+import itertools
+import math
+import os
+import time
+from typing import Callable, Dict, List, Optional
+from .metrics import Counter, Gauge
+
+# Lower runs first: quick one-word classifications and greetings before chat
+# turns, and background summaries last
+PRIORITIES = {"mood": 0, "greeting": 1, "chat": 2, "summary": 3}
+
+# Longest a call may wait for a slot, per purpose (seconds); the call's own
+# timeout also caps it
+MAX_QUEUE_WAIT = {
+    "mood": float(os.getenv("LLM_MOOD_MAX_WAIT", "10")),
+    "greeting": float(os.getenv("LLM_GREETING_MAX_WAIT", "10")),
+    "chat": float(os.getenv("LLM_CHAT_MAX_WAIT", "20")),
+    "summary": float(os.getenv("LLM_SUMMARY_MAX_WAIT", "60")),
+}
+
+# Calls allowed to wait at once; beyond this new calls are turned away
+LLM_QUEUE_LIMIT = int(os.getenv("LLM_QUEUE_LIMIT", "64"))
+
+LLM_REJECTED = Counter("llm_rejected_total", "LLM calls turned away by admission control.", ["purpose", "reason"])
+LLM_QUEUE_DEPTH = Gauge("llm_queue_depth", "LLM calls waiting for a slot.", ["purpose"])
+
+
+class LLMOverloaded(Exception):
+    """The model backends are saturated; the caller should try again after `retry_after` seconds."""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class LLMScheduler:
+    """
+    Admission control for LLM calls on one event loop.
+
+    At most `capacity()` calls run at once. Others wait in a priority queue
+    (by purpose, then arrival) until a slot frees up or their deadline passes.
+    When the queue is full, a new call either displaces the lowest-priority
+    waiter or is rejected straight away.
+    """
+
+    def __init__(self, capacity: Callable[[], int], queue_limit: int = LLM_QUEUE_LIMIT):
+        self.capacity = capacity
+        self.queue_limit = queue_limit
+        self.in_flight = 0
+        # Entries are [priority, sequence, purpose, future]
+        self._waiters: List[list] = []
+        self._sequence = itertools.count()
+        # Moving average of how long a call holds its slot (seconds)
+        self._service_time = 2.0
+
+    def retry_after(self) -> int:
+        """Rough seconds until the current queue has drained."""
+        slots = max(1, self.capacity())
+        estimate = self._service_time * (len(self._waiters) + 1) / slots
+        return max(1, min(60, math.ceil(estimate)))
+
+    def _reject(self, purpose: str, reason: str) -> LLMOverloaded:
+        LLM_REJECTED.inc(purpose=purpose, reason=reason)
+        return LLMOverloaded(f"LLM {reason}: {purpose} call rejected", self.retry_after())
+
+    def _dispatch(self):
+        """Hand free slots to the highest-priority waiters."""
+        while self._waiters and self.in_flight < self.capacity():
+            _, _, _, future = heapq.heappop(self._waiters)
+            if future.done():
+                continue
+            self.in_flight += 1
+            future.set_result(None)
+
+    def _remove(self, entry: list):
+        if entry in self._waiters:
+            self._waiters.remove(entry)
+            heapq.heapify(self._waiters)
+
+    async def acquire(self, purpose: str, deadline: float):
+        """
+        Wait for a slot until `deadline` (time.monotonic()). Raises LLMOverloaded
+        if the queue is full or the deadline passes first. Pair with release().
+        """
+        self._dispatch()
+        if not self._waiters and self.in_flight < self.capacity():
+            self.in_flight += 1
+            return
+
+        priority = PRIORITIES.get(purpose, len(PRIORITIES))
+        if len(self._waiters) >= self.queue_limit:
+            worst = max(self._waiters)
+            if worst[0] <= priority:
+                raise self._reject(purpose, "queue full")
+            # Make room by shedding the lowest-priority, most recent waiter
+            self._remove(worst)
+            worst[3].set_exception(self._reject(worst[2], "shed for higher priority"))
+
+        future = asyncio.get_running_loop().create_future()
+        entry = [priority, next(self._sequence), purpose, future]
+        heapq.heappush(self._waiters, entry)
+
+        try:
+            await asyncio.wait({future}, timeout=max(0.0, deadline - time.monotonic()))
+        except BaseException:
+            # Caller went away while waiting; give back a slot handed over meanwhile
+            if future.done() and not future.cancelled() and future.exception() is None:
+                self.release()
+            else:
+                self._remove(entry)
+                future.cancel()
+            raise
+
+        if not future.done():
+            self._remove(entry)
+            future.cancel()
+            raise self._reject(purpose, "queue timeout")
+        future.result()
+
+    def release(self, held_for: Optional[float] = None):
+        """Free a slot taken with acquire()."""
+        self.in_flight -= 1
+        if held_for is not None:
+            self._service_time = 0.8 * self._service_time + 0.2 * held_for
+        self._dispatch()
+
+    def queued(self) -> Dict[str, int]:
+        counts = {purpose: 0 for purpose in PRIORITIES}
+        for _, _, purpose, future in self._waiters:
+            if not future.done():
+                counts[purpose] = counts.get(purpose, 0) + 1
+        return counts
+
+    def collect_metrics(self):
+        for purpose, count in self.queued().items():
+            LLM_QUEUE_DEPTH.set(count, purpose=purpose)
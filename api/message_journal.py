@@ -0,0 +1,306 @@
+import atexit
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+from . import database
+from .timestamps import now_epoch
+from .metrics import Counter, Gauge, Histogram, register_collector
+
+# Write-behind mode: chat messages are buffered in memory and written in batched
+# transactions by a background thread instead of one commit per message.
+# Message ids are allocated in this process, so only enable it with a single
+# worker process writing to the database.
+CHAT_WRITE_BEHIND = os.getenv("CHAT_WRITE_BEHIND", "0") == "1"
+
+# Longest a buffered message waits before it is written (seconds), and the most
+# messages written per transaction
+CHAT_FLUSH_INTERVAL = float(os.getenv("CHAT_FLUSH_INTERVAL", "0.05"))
+CHAT_FLUSH_BATCH = int(os.getenv("CHAT_FLUSH_BATCH", "500"))
+
+# A batch that fails this many flushes in a row is written one row at a time;
+# rows that still fail go to the dead-letter file (JSON lines) instead of
+# blocking every message behind them. Retries back off up to CHAT_FLUSH_MAX_BACKOFF
+# seconds.
+CHAT_FLUSH_MAX_RETRIES = int(os.getenv("CHAT_FLUSH_MAX_RETRIES", "8"))
+CHAT_FLUSH_MAX_BACKOFF = float(os.getenv("CHAT_FLUSH_MAX_BACKOFF", "5"))
+CHAT_DEAD_LETTER_PATH = os.getenv("CHAT_DEAD_LETTER_PATH", database.DB_PATH + ".chat-dead-letter.jsonl")
+
+# Most messages buffered at once; past this, appends write straight to the
+# database instead of queueing
+CHAT_JOURNAL_MAX_PENDING = int(os.getenv("CHAT_JOURNAL_MAX_PENDING", "10000"))
+
+CHAT_JOURNAL_PENDING = Gauge("chat_journal_pending", "Chat messages buffered and not yet written.")
+CHAT_JOURNAL_WRITTEN = Counter("chat_journal_written_total", "Chat messages written by the write-behind journal.")
+CHAT_JOURNAL_ERRORS = Counter("chat_journal_flush_errors_total", "Write-behind flushes that failed.")
+CHAT_JOURNAL_DEAD_LETTERS = Counter(
+    "chat_journal_dead_letters_total", "Chat messages that could not be written and went to the dead-letter file."
+)
+CHAT_JOURNAL_SYNC_WRITES = Counter(
+    "chat_journal_sync_writes_total", "Chat messages written directly because the journal was full."
+)
+CHAT_JOURNAL_BATCH = Histogram(
+    "chat_journal_batch_size", "Chat messages written per write-behind transaction.", (),
+    (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+)
+
+
+class MessageJournal:
+    """
+    In-memory queue of chat messages waiting to be written.
+
+    Messages get their final id when they are appended, stay readable through
+    pending() until their transaction has committed, and are written in id
+    order, so readers that merge pending() with the database never miss one.
+    """
+
+    def __init__(
+        self,
+        flush_interval: float = CHAT_FLUSH_INTERVAL,
+        batch_size: int = CHAT_FLUSH_BATCH,
+        max_retries: int = CHAT_FLUSH_MAX_RETRIES,
+        max_pending: int = CHAT_JOURNAL_MAX_PENDING,
+        dead_letter_path: str = CHAT_DEAD_LETTER_PATH
+    ):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.max_pending = max_pending
+        self.dead_letter_path = dead_letter_path
+        # Consecutive failed flushes of the batch at the head of the queue
+        self._failures = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        # Only one flush writes at a time, so batches commit in id order
+        self._flush_lock = threading.Lock()
+        self._next_id: Optional[int] = None
+        # (id, session_id, role, content, created_at), oldest first
+        self._pending: List[Tuple[int, int, str, str, int]] = []
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+
+    def append(self, session_id: int, messages: List[Tuple[str, str, int]]) -> List[int]:
+        """Queue (role, content, created_at) messages for a session. Returns their ids."""
+        with self._lock:
+            if self._next_id is None:
+                self._next_id = database.get_last_chat_message_id() + 1
+            ids = list(range(self._next_id, self._next_id + len(messages)))
+            self._next_id += len(messages)
+            rows = [
+                (message_id, session_id, role, content, created_at)
+                for message_id, (role, content, created_at) in zip(ids, messages)
+            ]
+            full = len(self._pending) >= self.max_pending
+            if not full:
+                self._pending.extend(rows)
+            stopped = self._stopping
+            if not stopped and not full:
+                self._start()
+                self._wake.notify()
+
+        if full:
+            # Backpressure: the writer is behind (or failing), so this caller
+            # writes its own rows and sees any error
+            database.insert_chat_messages(rows)
+            CHAT_JOURNAL_SYNC_WRITES.inc(len(rows))
+        elif stopped:
+            # Shut down already: no writer left, so write straight away
+            self.flush()
+        return ids
+
+    def pending(self, session_id: int, after_id: int = 0, before: Optional[int] = None) -> List[Dict]:
+        """Messages of a session that may not be in the database yet, in id order."""
+        with self._lock:
+            rows = [row for row in self._pending if row[1] == session_id and row[0] > after_id]
+        return [
+            {"id": row[0], "role": row[2], "content": row[3], "created_at": row[4]}
+            for row in rows
+            if before is None or row[0] < before
+        ]
+
+    def _start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="chat-journal", daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    def _run(self):
+        while True:
+            with self._wake:
+                while not self._pending and not self._stopping:
+                    self._wake.wait()
+                if self._stopping:
+                    return
+                # Give the batch until the flush interval to fill up
+                self._wake.wait_for(
+                    lambda: len(self._pending) >= self.batch_size or self._stopping,
+                    timeout=self.flush_interval
+                )
+            if not self.flush():
+                # Database busy or failing: back off before retrying
+                time.sleep(min(self.flush_interval * 2 ** self._failures, CHAT_FLUSH_MAX_BACKOFF))
+
+    def flush(self) -> bool:
+        """Write everything queued so far. Returns False if a write failed."""
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    batch = self._pending[:self.batch_size]
+                if not batch:
+                    return True
+
+                try:
+                    database.insert_chat_messages(batch)
+                    written = len(batch)
+                except Exception as e:
+                    CHAT_JOURNAL_ERRORS.inc()
+                    self._failures += 1
+                    if self._failures < self.max_retries:
+                        print(f"Chat journal flush failed ({self._failures}/{self.max_retries}), will retry: {e!r}")
+                        return False
+                    print(f"Chat journal flush failed {self._failures} times, writing the batch row by row: {e!r}")
+                    written = self._write_rows_singly(batch)
+                self._failures = 0
+
+                # Only now drop them, so they stay readable until committed
+                with self._lock:
+                    del self._pending[:len(batch)]
+                CHAT_JOURNAL_WRITTEN.inc(written)
+                CHAT_JOURNAL_BATCH.observe(len(batch))
+
+    def _write_rows_singly(self, batch: List[Tuple[int, int, str, str, int]]) -> int:
+        """Write rows one per transaction, dead-lettering the ones that fail. Returns rows written."""
+        written = 0
+        for row in batch:
+            try:
+                database.insert_chat_messages([row])
+                written += 1
+            except Exception as e:
+                self._dead_letter([row], e)
+        return written
+
+    def _dead_letter(self, rows: List[Tuple[int, int, str, str, int]], error: Exception):
+        """Append rows that cannot be written to the dead-letter file, for manual replay."""
+        with open(self.dead_letter_path, "a", encoding="utf-8") as f:
+            for message_id, session_id, role, content, created_at in rows:
+                f.write(json.dumps({
+                    "id": message_id, "session_id": session_id, "role": role,
+                    "content": content, "created_at": created_at, "error": repr(error)
+                }) + "\n")
+        CHAT_JOURNAL_DEAD_LETTERS.inc(len(rows))
+        print(f"Chat journal: {len(rows)} messages moved to {self.dead_letter_path}: {error!r}")
+
+    def close(self):
+        """Stop the writer and write out everything still queued (on shutdown)."""
+        with self._wake:
+            self._stopping = True
+            self._wake.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+        # Retry while the database is briefly busy; a failing batch is
+        # dead-lettered once it runs out of retries
+        for _ in range(self.max_retries + 1):
+            if self.flush():
+                return
+            time.sleep(min(max(self.flush_interval, 0.1) * 2 ** self._failures, CHAT_FLUSH_MAX_BACKOFF))
+
+        with self._flush_lock:
+            with self._lock:
+                remaining, self._pending = self._pending, []
+            if remaining:
+                self._dead_letter(remaining, RuntimeError("journal closed before the messages could be written"))
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"pending": len(self._pending)}
+
+    def collect_metrics(self):
+        CHAT_JOURNAL_PENDING.set(self.stats()["pending"])
+
+
+_journal = MessageJournal() if CHAT_WRITE_BEHIND else None
+if _journal is not None:
+    register_collector(_journal.collect_metrics)
+
+
+def _merge(stored: List[Dict], pending: List[Dict]) -> List[Dict]:
+    """Stored rows plus pending ones, by id; a row in both (just committed) appears once."""
+    if not pending:
+        return stored
+    stored_ids = {row["id"] for row in stored}
+    merged = stored + [row for row in pending if row["id"] not in stored_ids]
+    merged.sort(key=lambda row: row["id"])
+    return merged
+
+
+# Same signatures as the database functions. With write-behind enabled, writes
+# are queued and reads include queued messages (read-your-writes); otherwise
+# they go straight to the database.
+
+def save_chat_message(session_id: int, role: str, content: str) -> int:
+    if _journal is None:
+        return database.save_chat_message(session_id, role, content)
+    return _journal.append(session_id, [(role, content, now_epoch())])[0]
+
+
+def save_chat_exchange(
+    session_id: int,
+    user_message: str,
+    assistant_message: str,
+    user_created_at: Optional[int] = None
+) -> Tuple[int, int]:
+    if _journal is None:
+        return database.save_chat_exchange(session_id, user_message, assistant_message, user_created_at)
+    now = now_epoch()
+    user_id, assistant_id = _journal.append(session_id, [
+        ("user", user_message, user_created_at or now),
+        ("assistant", assistant_message, now)
+    ])
+    return user_id, assistant_id
+
+
+def get_session_messages(
+    session_id: int,
+    after_id: int = 0,
+    limit: Optional[int] = None,
+    before: Optional[int] = None,
+    from_start: bool = False
+) -> List[Dict]:
+    if _journal is None:
+        return database.get_session_messages(session_id, after_id, limit, before, from_start)
+    # Read the queue first: a message committed in between then shows up in the database read
+    pending = _journal.pending(session_id, after_id, before)
+    messages = _merge(database.get_session_messages(session_id, after_id, limit, before, from_start), pending)
+    if limit is None:
+        return messages
+    return messages[:limit] if from_start else messages[-limit:]
+
+
+def get_chat_turn_context(session_id: int, mood_limit: int) -> Optional[Dict]:
+    if _journal is None:
+        return database.get_chat_turn_context(session_id, mood_limit)
+    pending = _journal.pending(session_id)
+    context = database.get_chat_turn_context(session_id, mood_limit)
+    if context is not None:
+        unsummarized = [row for row in pending if row["id"] > context["summary_upto_id"]]
+        context["messages"] = _merge(context["messages"], unsummarized)
+    return context
+
+
+def flush() -> bool:
+    """Write out queued messages now. Returns False if a write failed."""
+    return _journal.flush() if _journal is not None else True
+
+
+def close():
+    """Stop the background writer and write out queued messages (on shutdown)."""
+    if _journal is not None:
+        _journal.close()
+
+
+def stats() -> Dict:
+    return {
+        "write_behind": _journal is not None,
+        "pending": _journal.stats()["pending"] if _journal is not None else 0
+    }
@@ -0,0 +1,322 @@
+import json
+import sqlite3
+from typing import Callable, Dict, List, Tuple
+from .answers import encode_answers
+
+# Schema changes are applied in order and recorded in PRAGMA user_version.
+# Never edit a migration that has shipped; append a new one instead.
+
+
+def _add_column_if_missing(cursor: sqlite3.Cursor, table: str, column: str, definition: str):
+    """Add a column to an existing table unless it is already there."""
+    columns = {row[1] for row in cursor.execute(f"PRAGMA table_info({table})")}
+    if column not in columns:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+def _create_base_tables(cursor: sqlite3.Cursor):
+    # IF NOT EXISTS: databases created before migrations existed are at version 0
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS mood_logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            mood TEXT NOT NULL,
+            answers TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS chat_sessions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            mood_log_id INTEGER NOT NULL,
+            started_at TIMESTAMP,
+            ended_at TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id),
+            FOREIGN KEY (mood_log_id) REFERENCES mood_logs (id)
+        )
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS chat_messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id INTEGER NOT NULL,
+            role TEXT NOT NULL,
+            content TEXT NOT NULL,
+            created_at TIMESTAMP,
+            FOREIGN KEY (session_id) REFERENCES chat_sessions (id)
+        )
+    """)
+
+
+def _add_session_summary(cursor: sqlite3.Cursor):
+    # Rolling summary of older turns, covering messages up to summary_upto_id
+    _add_column_if_missing(cursor, "chat_sessions", "summary", "TEXT")
+    _add_column_if_missing(cursor, "chat_sessions", "summary_upto_id", "INTEGER NOT NULL DEFAULT 0")
+
+
+def _create_mood_classification_cache(cursor: sqlite3.Cursor):
+    # Answer set -> mood, per prompt/model fingerprint
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS mood_classification_cache (
+            answers_key TEXT NOT NULL,
+            prompt_hash TEXT NOT NULL,
+            mood TEXT NOT NULL,
+            created_at TIMESTAMP,
+            PRIMARY KEY (answers_key, prompt_hash)
+        )
+    """)
+
+
+def _add_history_indexes(cursor: sqlite3.Cursor):
+    # Per-user history, newest first
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_mood_logs_user_created ON mood_logs (user_id, created_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_chat_sessions_user_started ON chat_sessions (user_id, started_at)")
+    # Session transcript in insertion order
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_chat_messages_session ON chat_messages (session_id, id)")
+    cursor.execute("ANALYZE")
+
+
+def _add_message_search(cursor: sqlite3.Cursor):
+    # Full-text index over chat messages. It stores no text of its own: content
+    # and the owning user (as a searchable `owner` token) come from this view.
+    cursor.execute("""
+        CREATE VIEW IF NOT EXISTS chat_message_search_source AS
+        SELECT m.id, m.content, cs.user_id AS owner
+        FROM chat_messages m
+        JOIN chat_sessions cs ON cs.id = m.session_id
+    """)
+    cursor.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS chat_message_search USING fts5(
+            content, owner,
+            content='chat_message_search_source', content_rowid='id',
+            tokenize='porter unicode61 remove_diacritics 2'
+        )
+    """)
+    # Rank by the message text only; the owner token is just a filter
+    cursor.execute("INSERT INTO chat_message_search (chat_message_search, rank) VALUES ('rank', 'bm25(1.0, 0.0)')")
+
+    # Keep the index in step with chat_messages
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS chat_messages_search_insert AFTER INSERT ON chat_messages BEGIN
+            INSERT INTO chat_message_search (rowid, content, owner)
+            VALUES (new.id, new.content, (SELECT user_id FROM chat_sessions WHERE id = new.session_id));
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS chat_messages_search_delete AFTER DELETE ON chat_messages BEGIN
+            INSERT INTO chat_message_search (chat_message_search, rowid, content, owner)
+            VALUES ('delete', old.id, old.content, (SELECT user_id FROM chat_sessions WHERE id = old.session_id));
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS chat_messages_search_update AFTER UPDATE OF content, session_id ON chat_messages BEGIN
+            INSERT INTO chat_message_search (chat_message_search, rowid, content, owner)
+            VALUES ('delete', old.id, old.content, (SELECT user_id FROM chat_sessions WHERE id = old.session_id));
+            INSERT INTO chat_message_search (rowid, content, owner)
+            VALUES (new.id, new.content, (SELECT user_id FROM chat_sessions WHERE id = new.session_id));
+        END
+    """)
+
+    # Index the messages that already exist
+    cursor.execute("INSERT INTO chat_message_search (chat_message_search) VALUES ('rebuild')")
+
+
+def _add_session_versions(cursor: sqlite3.Cursor):
+    # Per-user change stamp: bumped to the user's highest version + 1 whenever a
+    # session is created or changes, so clients can ask for "changed since N"
+    _add_column_if_missing(cursor, "chat_sessions", "version", "INTEGER NOT NULL DEFAULT 0")
+    # Existing sessions: ids already increase per user
+    cursor.execute("UPDATE chat_sessions SET version = id WHERE version = 0")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_chat_sessions_user_version ON chat_sessions (user_id, version)")
+
+
+def _create_user_stats(cursor: sqlite3.Cursor):
+    # One row per user with what the dashboard shows, kept current by the writes
+    # in database.py (mood logs, chat sessions) so it never re-reads history
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS user_stats (
+            user_id INTEGER PRIMARY KEY,
+            latest_mood_log_id INTEGER,
+            latest_mood TEXT,
+            latest_mood_at TIMESTAMP,
+            mood_counts TEXT NOT NULL DEFAULT '{}',
+            total_mood_logs INTEGER NOT NULL DEFAULT 0,
+            streak_days INTEGER NOT NULL DEFAULT 0,
+            streak_last_day TEXT,
+            last_session_id INTEGER,
+            last_session_started_at TIMESTAMP,
+            last_session_ended_at TIMESTAMP,
+            session_count INTEGER NOT NULL DEFAULT 0,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    """)
+
+    # Backfill from existing history
+    mood_counts: Dict[int, Dict[str, int]] = {}
+    for user_id, mood, count in cursor.execute("SELECT user_id, mood, COUNT(*) FROM mood_logs GROUP BY user_id, mood"):
+        mood_counts.setdefault(user_id, {})[mood] = count
+
+    for user_id, counts in mood_counts.items():
+        latest = cursor.execute("""
+            SELECT id, mood, created_at FROM mood_logs
+            WHERE user_id = ? ORDER BY created_at DESC, id DESC LIMIT 1
+        """, (user_id,)).fetchone()
+
+        # Consecutive days with a mood log, counting back from the latest one
+        days = [row[0] for row in cursor.execute("""
+            SELECT DISTINCT date(created_at) AS day FROM mood_logs
+            WHERE user_id = ? AND day IS NOT NULL ORDER BY day DESC
+        """, (user_id,))]
+        streak = 1 if days else 0
+        for newer, older in zip(days, days[1:]):
+            if cursor.execute("SELECT date(?, '-1 day') = ?", (newer, older)).fetchone()[0] != 1:
+                break
+            streak += 1
+
+        cursor.execute("""
+            INSERT OR REPLACE INTO user_stats (
+                user_id, latest_mood_log_id, latest_mood, latest_mood_at,
+                mood_counts, total_mood_logs, streak_days, streak_last_day
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, (
+            user_id, latest[0], latest[1], latest[2],
+            json.dumps(counts), sum(counts.values()), streak, days[0] if days else None
+        ))
+
+    cursor.execute("""
+        UPDATE user_stats SET
+            session_count = (SELECT COUNT(*) FROM chat_sessions WHERE user_id = user_stats.user_id),
+            last_session_id = (
+                SELECT id FROM chat_sessions WHERE user_id = user_stats.user_id
+                ORDER BY started_at DESC, id DESC LIMIT 1
+            )
+    """)
+    cursor.execute("""
+        UPDATE user_stats SET
+            last_session_started_at = (SELECT started_at FROM chat_sessions WHERE id = user_stats.last_session_id),
+            last_session_ended_at = (SELECT ended_at FROM chat_sessions WHERE id = user_stats.last_session_id)
+        WHERE last_session_id IS NOT NULL
+    """)
+
+
+def _compact_answers(cursor: sqlite3.Cursor):
+    # Rebuild mood_logs with answers as a 10-character code (one option letter
+    # per question, see answers.encode_answers). The JSON text is kept only for
+    # the rare answer set the code cannot hold, so `answers` becomes nullable.
+    cursor.execute("""
+        CREATE TABLE mood_logs_compact (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            mood TEXT NOT NULL,
+            answers_code TEXT,
+            answers TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    """)
+
+    reader = cursor.connection.execute("SELECT id, user_id, mood, answers, created_at FROM mood_logs ORDER BY id")
+    while True:
+        rows = reader.fetchmany(1000)
+        if not rows:
+            break
+        converted = []
+        for log_id, user_id, mood, answers, created_at in rows:
+            try:
+                code = encode_answers(json.loads(answers))
+            except (TypeError, ValueError, AttributeError):
+                code = None
+            converted.append((log_id, user_id, mood, code, None if code is not None else answers, created_at))
+        cursor.executemany(
+            "INSERT INTO mood_logs_compact (id, user_id, mood, answers_code, answers, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+            converted
+        )
+
+    # Keep AUTOINCREMENT from reusing ids of rows deleted before the rebuild
+    sequence = cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'mood_logs'").fetchone()
+    cursor.execute("DROP TABLE mood_logs")
+    cursor.execute("ALTER TABLE mood_logs_compact RENAME TO mood_logs")
+    if sequence is not None:
+        cursor.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'mood_logs'", (sequence[0],))
+
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_mood_logs_user_created ON mood_logs (user_id, created_at)")
+    # Per-question answer counts for a user read only this index
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_mood_logs_user_answers ON mood_logs (user_id, answers_code)")
+    cursor.execute("ANALYZE")
+
+
+# Every timestamp column, written until now as "YYYY-MM-DD HH:MM:SS" PKT text
+_TIMESTAMP_COLUMNS = {
+    "users": ["created_at"],
+    "mood_logs": ["created_at"],
+    "chat_sessions": ["started_at", "ended_at"],
+    "chat_messages": ["created_at"],
+    "mood_classification_cache": ["created_at"],
+    "user_stats": ["latest_mood_at", "last_session_started_at", "last_session_ended_at"],
+}
+
+
+def _epoch_timestamps(cursor: sqlite3.Cursor):
+    # Store timestamps as integer Unix epochs (see timestamps.py). The old text
+    # was PKT (UTC+5); a value that does not parse is left as it was. The
+    # indexes on these columns are updated in place.
+    for table, columns in _TIMESTAMP_COLUMNS.items():
+        for column in columns:
+            cursor.execute(f"""
+                UPDATE {table}
+                SET {column} = CAST(strftime('%s', {column}, '-5 hours') AS INTEGER)
+                WHERE typeof({column}) = 'text' AND strftime('%s', {column}, '-5 hours') IS NOT NULL
+            """)
+    cursor.execute("ANALYZE")
+
+
+MIGRATIONS: List[Tuple[int, str, Callable[[sqlite3.Cursor], None]]] = [
+    (1, "base tables", _create_base_tables),
+    (2, "chat session summaries", _add_session_summary),
+    (3, "mood classification cache", _create_mood_classification_cache),
+    (4, "history indexes", _add_history_indexes),
+    (5, "chat message search", _add_message_search),
+    (6, "chat session versions", _add_session_versions),
+    (7, "user stats", _create_user_stats),
+    (8, "compact questionnaire answers", _compact_answers),
+    (9, "epoch timestamps", _epoch_timestamps),
+]
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection) -> int:
+    """
+    Apply every pending migration, each in its own transaction.
+    Safe to run from several processes at once. Returns the resulting version.
+    """
+    for version, description, apply in MIGRATIONS:
+        if get_schema_version(conn) >= version:
+            continue
+
+        # Take the write lock, then re-check in case another process got here first
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if get_schema_version(conn) < version:
+                apply(conn.cursor())
+                conn.execute(f"PRAGMA user_version = {version}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            print(f"Database migration {version} ({description}) failed")
+            raise
+
+    return get_schema_version(conn)
@@ -0,0 +1,64 @@
+import hashlib
+import os
+from typing import Dict, Optional
+from .cache import LRUCache
+from .database import (
+    get_cached_mood_classification,
+    save_mood_classification,
+    purge_mood_classifications
+)
+
+MOOD_CACHE_SIZE = int(os.getenv("MOOD_CACHE_SIZE", "4096"))
+
+
+def prompt_fingerprint(model: str, system_prompt: str) -> str:
+    """Hash of everything besides the answers that determines the model's output."""
+    return hashlib.sha256(f"{model}\n{system_prompt}".encode("utf-8")).hexdigest()[:16]
+
+
+class MoodClassificationCache:
+    """
+    Answer set -> mood cache: an in-memory LRU in front of the
+    mood_classification_cache table. Entries are tied to a prompt fingerprint,
+    so changing the system prompt or model invalidates them.
+    """
+
+    def __init__(self, prompt_hash: str, maxsize: int = MOOD_CACHE_SIZE):
+        self.prompt_hash = prompt_hash
+        self._memory = LRUCache(maxsize)
+        self.db_hits = 0
+        self.misses = 0
+
+        # Drop rows written for an older prompt or model
+        self.purged = purge_mood_classifications(prompt_hash)
+
+    def get(self, answers_key: str) -> Optional[str]:
+        mood = self._memory.get(answers_key)
+        if mood is not None:
+            return mood
+
+        mood = get_cached_mood_classification(answers_key, self.prompt_hash)
+        if mood is not None:
+            self.db_hits += 1
+            self._memory.set(answers_key, mood)
+            return mood
+
+        self.misses += 1
+        return None
+
+    def set(self, answers_key: str, mood: str):
+        self._memory.set(answers_key, mood)
+        save_mood_classification(answers_key, self.prompt_hash, mood)
+
+    def stats(self) -> Dict:
+        """Return hit/miss counters for both tiers."""
+        memory = self._memory.stats()
+        lookups = memory["hits"] + self.db_hits + self.misses
+        return {
+            "prompt_hash": self.prompt_hash,
+            "memory_size": memory["size"],
+            "memory_hits": memory["hits"],
+            "db_hits": self.db_hits,
+            "misses": self.misses,
+            "hit_rate": round((memory["hits"] + self.db_hits) / lookups, 4) if lookups else 0.0
+        }
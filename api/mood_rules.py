@@ -0,0 +1,131 @@
+import os
+from typing import Dict, NamedTuple, Optional
+
+# Mood categories in the priority order of the classification rules in
+# prompt_for_mood_detection (stress first, positive last); ties go to the earlier one
+MOODS = ("Stressed", "Depressed/Low", "Tired/Exhausted", "Neutral", "Happy/Calm")
+
+# Below this confidence the answer set is sent to the model instead
+MOOD_RULES_MIN_CONFIDENCE = float(os.getenv("MOOD_RULES_MIN_CONFIDENCE", "0.35"))
+
+# Score contributed by each option to each mood, in MOODS order:
+#             Stressed, Depressed/Low, Tired/Exhausted, Neutral, Happy/Calm
+SCORE_TABLE = {
+    # 1. How are you feeling right now?
+    "q1": {
+        "A": (0, 0, 0, 1, 3),  # Calm
+        "B": (0, 0, 0, 3, 0),  # Neutral
+        "C": (0, 3, 0, 0, 0),  # Sad
+        "D": (3, 0, 0, 0, 0),  # Stressed
+        "E": (3, 1, 0, 0, 0),  # Overwhelmed
+        "F": (0, 0, 0, 0, 3),  # Happy
+    },
+    # 2. Which emotion describes you best today?
+    "q2": {
+        "A": (3, 0, 0, 0, 0),  # Anxious
+        "B": (0, 0, 3, 0, 0),  # Tired
+        "C": (0, 3, 0, 0, 0),  # Low mood
+        "D": (0, 0, 0, 0, 3),  # Confident
+        "E": (2, 1, 0, 0, 0),  # Irritable
+        "F": (0, 0, 0, 1, 2),  # Content
+    },
+    # 3. How stressed do you feel today?
+    "q3": {
+        "A": (0, 0, 0, 1, 2),  # Very low
+        "B": (0, 0, 0, 2, 1),  # Low
+        "C": (1, 0, 0, 1, 0),  # Moderate
+        "D": (3, 0, 0, 0, 0),  # High
+        "E": (4, 0, 0, 0, 0),  # Very high
+    },
+    # 4. Are you experiencing physical symptoms of stress?
+    "q4": {
+        "A": (0, 0, 0, 1, 1),  # No symptoms
+        "B": (0, 0, 2, 0, 0),  # Mild fatigue/headache
+        "C": (2, 0, 0, 0, 0),  # Restlessness or tension
+        "D": (1, 0, 1, 0, 0),  # Trouble focusing
+        "E": (3, 0, 0, 0, 0),  # Unable to relax / very tense
+    },
+    # 5. How motivated do you feel today?
+    "q5": {
+        "A": (0, 0, 0, 0, 2),  # Very motivated
+        "B": (0, 0, 0, 1, 1),  # Somewhat motivated
+        "C": (0, 0, 0, 2, 0),  # Neutral
+        "D": (0, 1, 1, 0, 0),  # Low motivation
+        "E": (0, 2, 1, 0, 0),  # No motivation at all
+    },
+    # 6. Have you enjoyed your usual activities lately?
+    "q6": {
+        "A": (0, 0, 0, 0, 2),  # Yes, completely
+        "B": (0, 0, 0, 1, 1),  # Mostly
+        "C": (0, 1, 0, 1, 0),  # Sometimes
+        "D": (0, 2, 0, 0, 0),  # Rarely
+        "E": (0, 3, 0, 0, 0),  # Not at all
+    },
+    # 7. How would you describe your mental energy?
+    "q7": {
+        "A": (0, 0, 0, 0, 2),  # Energized
+        "B": (0, 0, 0, 2, 0),  # Okay
+        "C": (0, 0, 2, 0, 0),  # A bit drained
+        "D": (0, 0, 3, 0, 0),  # Exhausted
+        "E": (1, 0, 3, 0, 0),  # Burned out
+    },
+    # 8. How clear is your thinking today?
+    "q8": {
+        "A": (0, 0, 0, 0, 2),  # Very clear
+        "B": (0, 0, 0, 1, 1),  # Mostly clear
+        "C": (0, 0, 2, 0, 0),  # A bit foggy
+        "D": (1, 1, 0, 0, 0),  # Confused
+        "E": (2, 0, 0, 0, 0),  # Overwhelmed
+    },
+    # 9. How connected do you feel to people around you?
+    "q9": {
+        "A": (0, 0, 0, 0, 2),  # Very connected
+        "B": (0, 0, 0, 1, 1),  # Somewhat connected
+        "C": (0, 0, 0, 2, 0),  # Neutral
+        "D": (0, 2, 0, 0, 0),  # A bit isolated
+        "E": (0, 3, 0, 0, 0),  # Very isolated
+    },
+    # 10. How out of control do your emotions feel today?
+    "q10": {
+        "A": (0, 0, 0, 0, 2),  # Very stable
+        "B": (0, 0, 0, 1, 1),  # Mostly stable
+        "C": (1, 1, 0, 0, 0),  # Somewhat unstable
+        "D": (1, 2, 0, 0, 0),  # Unstable
+        "E": (1, 3, 0, 0, 0),  # Very unstable
+    },
+}
+
+
+class RuleResult(NamedTuple):
+    mood: Optional[str]
+    confidence: float
+    scores: Dict[str, int]
+
+
+def score_answers(answers: Dict[str, str]) -> RuleResult:
+    """
+    Score a normalized answer set against SCORE_TABLE.
+
+    Confidence is the winning mood's margin over the runner-up, relative to
+    its own score, scaled down when questions are unanswered or unrecognised.
+    """
+    totals = [0, 0, 0, 0, 0]
+    recognised = 0
+
+    for question, options in SCORE_TABLE.items():
+        row = options.get(answers.get(question))
+        if row is None:
+            continue
+        recognised += 1
+        totals = [total + score for total, score in zip(totals, row)]
+
+    scores = dict(zip(MOODS, totals))
+    best = max(range(len(MOODS)), key=lambda i: (totals[i], -i))
+    top = totals[best]
+    if top == 0:
+        return RuleResult(None, 0.0, scores)
+
+    runner_up = max(total for i, total in enumerate(totals) if i != best)
+    confidence = (top - runner_up) / top * recognised / len(SCORE_TABLE)
+
+    return RuleResult(MOODS[best], round(confidence, 4), scores)
@@ -0,0 +1,213 @@
+import asyncio
+import os
+import random
+import time
+from typing import Iterable, List, Optional, Tuple
+from urllib.parse import urlsplit
+import httpx
+from .metrics import Counter, Gauge, register_collector
+
+# Consecutive failures that open a backend's circuit, and how long it stays open (seconds)
+OLLAMA_CIRCUIT_FAILURES = int(os.getenv("OLLAMA_CIRCUIT_FAILURES", "3"))
+OLLAMA_CIRCUIT_COOLDOWN = float(os.getenv("OLLAMA_CIRCUIT_COOLDOWN", "30"))
+
+# Seconds between health probes (0 disables them) and the probe timeout
+OLLAMA_HEALTH_INTERVAL = float(os.getenv("OLLAMA_HEALTH_INTERVAL", "10"))
+OLLAMA_HEALTH_TIMEOUT = float(os.getenv("OLLAMA_HEALTH_TIMEOUT", "3"))
+
+LLM_BACKEND_REQUESTS = Counter("llm_backend_requests_total", "LLM calls per backend by outcome.", ["backend", "outcome"])
+LLM_BACKEND_OUTSTANDING = Gauge("llm_backend_outstanding", "LLM calls in flight per backend.", ["backend"])
+LLM_BACKEND_UP = Gauge("llm_backend_up", "1 if the backend is taking requests (healthy, circuit not open).", ["backend"])
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class NoBackendAvailable(Exception):
+    """Every backend is unhealthy or has an open circuit."""
+
+
+class Backend:
+    """One Ollama node: its chat URL, load and circuit-breaker state."""
+
+    def __init__(self, url: str):
+        self.url = url
+        parts = urlsplit(url)
+        self.name = parts.netloc or url
+        self.probe_url = f"{parts.scheme}://{parts.netloc}/api/tags"
+
+        self.outstanding = 0
+        self.healthy = True
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_in_flight = False
+
+    def available(self, now: float) -> bool:
+        """Can take a call: healthy, and the circuit is closed or ready for a trial."""
+        if not self.healthy:
+            return False
+        if self.state == OPEN:
+            # Past the cooldown acquire() lets one trial call through
+            return now - self.opened_at >= OLLAMA_CIRCUIT_COOLDOWN
+        if self.state == HALF_OPEN:
+            return not self.trial_in_flight
+        return True
+
+    def taking_requests(self, now: float) -> bool:
+        """Like available(), but still up while its half-open trial call is running."""
+        return self.healthy and (self.state != OPEN or now - self.opened_at >= OLLAMA_CIRCUIT_COOLDOWN)
+
+    def record_success(self):
+        self.failures = 0
+        self.state = CLOSED
+        LLM_BACKEND_REQUESTS.inc(backend=self.name, outcome="success")
+
+    def record_failure(self):
+        self.failures += 1
+        LLM_BACKEND_REQUESTS.inc(backend=self.name, outcome="failure")
+        if self.state == HALF_OPEN or self.failures >= OLLAMA_CIRCUIT_FAILURES:
+            if self.state != OPEN:
+                print(f"Ollama backend {self.name}: circuit opened after {self.failures} failures")
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+
+    def status(self) -> dict:
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "circuit": self.state,
+            "outstanding": self.outstanding,
+            "consecutive_failures": self.failures
+        }
+
+
+class BackendPool:
+    """
+    Routes each LLM call to the available backend with the fewest calls in
+    flight, and tracks failures per backend so broken nodes are skipped. A
+    backend with `max_outstanding` calls in flight takes no more, even when
+    it is the only one left.
+    """
+
+    def __init__(self, urls: Iterable[str], max_outstanding: int):
+        self.backends = [Backend(url) for url in urls]
+        if not self.backends:
+            raise ValueError("At least one Ollama URL is required")
+        self.max_outstanding = max_outstanding
+        self._probe_task: Optional[asyncio.Task] = None
+
+    def acquire(self, exclude: Iterable[Backend] = ()) -> Tuple[Backend, bool]:
+        """
+        Pick a backend for one call and count it as outstanding. Returns the
+        backend and whether the call is its half-open trial; pass both to
+        release().
+        """
+        now = time.monotonic()
+        excluded = set(map(id, exclude))
+        candidates = [b for b in self.backends if id(b) not in excluded and b.available(now)]
+        if not candidates:
+            raise NoBackendAvailable("No Ollama backend is available")
+        candidates = [b for b in candidates if b.outstanding < self.max_outstanding]
+        if not candidates:
+            raise NoBackendAvailable("Every available Ollama backend is at its concurrency limit")
+
+        least = min(b.outstanding for b in candidates)
+        backend = random.choice([b for b in candidates if b.outstanding == least])
+
+        backend.outstanding += 1
+        if backend.state == OPEN:
+            # Cooldown over: this call is the trial
+            backend.state = HALF_OPEN
+        trial = backend.state == HALF_OPEN
+        if trial:
+            backend.trial_in_flight = True
+        return backend, trial
+
+    def release(self, backend: Backend, trial: bool, ok: Optional[bool]):
+        """
+        Finish a call started with acquire(). `ok` is True/False for a
+        success/backend failure, or None when the outcome says nothing about
+        the backend (e.g. the caller went away). While the circuit is not
+        closed only the trial call's outcome moves it; calls that started
+        before it opened are just counted.
+        """
+        backend.outstanding -= 1
+        if trial:
+            backend.trial_in_flight = False
+        if ok is None:
+            return
+        if trial or backend.state == CLOSED:
+            if ok:
+                backend.record_success()
+            else:
+                backend.record_failure()
+        else:
+            LLM_BACKEND_REQUESTS.inc(backend=backend.name, outcome="success" if ok else "failure")
+
+    async def probe(self, client: httpx.AsyncClient):
+        """Check every backend once (GET /api/tags)."""
+        async def check(backend: Backend):
+            try:
+                response = await client.get(backend.probe_url, timeout=OLLAMA_HEALTH_TIMEOUT)
+                healthy = response.status_code == 200
+            except httpx.HTTPError:
+                healthy = False
+
+            if healthy != backend.healthy:
+                print(f"Ollama backend {backend.name} is now {'healthy' if healthy else 'unhealthy'}")
+            backend.healthy = healthy
+            if healthy and backend.state == OPEN:
+                # Reachable again: allow a trial request without waiting out the cooldown
+                backend.state = HALF_OPEN
+
+        await asyncio.gather(*(check(backend) for backend in self.backends))
+
+    async def _probe_loop(self, client: httpx.AsyncClient):
+        while True:
+            await asyncio.sleep(OLLAMA_HEALTH_INTERVAL)
+            try:
+                await self.probe(client)
+            except Exception as e:
+                print(f"Ollama health probe failed: {e!r}")
+
+    def start_probes(self, client: httpx.AsyncClient):
+        """Probe backends periodically on the running event loop."""
+        if OLLAMA_HEALTH_INTERVAL > 0:
+            self.stop_probes()
+            self._probe_task = asyncio.create_task(self._probe_loop(client))
+
+    def stop_probes(self):
+        if self._probe_task is not None:
+            try:
+                self._probe_task.cancel()
+            except RuntimeError:
+                # Its event loop is already closed
+                pass
+            self._probe_task = None
+
+    def available_count(self) -> int:
+        now = time.monotonic()
+        return sum(backend.taking_requests(now) for backend in self.backends)
+
+    def status(self) -> List[dict]:
+        return [backend.status() for backend in self.backends]
+
+    def collect_metrics(self):
+        now = time.monotonic()
+        for backend in self.backends:
+            LLM_BACKEND_OUTSTANDING.set(backend.outstanding, backend=backend.name)
+            LLM_BACKEND_UP.set(1 if backend.taking_requests(now) else 0, backend=backend.name)
+
+
+def configured_urls(default_url: str) -> List[str]:
+    """OLLAMA_URLS (comma-separated chat URLs) if set, otherwise just `default_url`."""
+    urls = [url.strip() for url in os.getenv("OLLAMA_URLS", "").split(",") if url.strip()]
+    return urls or [default_url]
+
+
+def create_pool(default_url: str, max_outstanding: int) -> BackendPool:
+    pool = BackendPool(configured_urls(default_url), max_outstanding)
+    register_collector(pool.collect_metrics)
+    return pool
@@ -0,0 +1,306 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+from contextlib import aclosing
+from typing import AsyncIterator, Optional, List, Dict
+import httpx
+from dotenv import load_dotenv
+from .metrics import Counter, Gauge, Histogram, SIZE_BUCKETS, register_collector
+from .ollama_backends import NoBackendAvailable, create_pool
+from .llm_scheduler import LLMOverloaded, LLMScheduler, MAX_QUEUE_WAIT
+from .single_flight import SingleFlight
+
+# Load environment variables from .env
+load_dotenv()
+
+OLLAMA_API_KEY = os.getenv("OLLAMA_API_KEY")
+OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434/api/chat")
+
+# Timeouts (seconds) and limits for the shared client; concurrency (calls in
+# flight, the rest wait in the scheduler's queue) and keep-alive limits are per backend
+OLLAMA_CONNECT_TIMEOUT = float(os.getenv("OLLAMA_CONNECT_TIMEOUT", "5"))
+OLLAMA_READ_TIMEOUT = float(os.getenv("OLLAMA_READ_TIMEOUT", "60"))
+OLLAMA_MAX_CONCURRENCY = int(os.getenv("OLLAMA_MAX_CONCURRENCY", "32"))
+OLLAMA_MAX_KEEPALIVE = int(os.getenv("OLLAMA_MAX_KEEPALIVE", "16"))
+
+# All model backends (OLLAMA_URLS, comma-separated; defaults to OLLAMA_URL),
+# each taking at most OLLAMA_MAX_CONCURRENCY calls at once
+backend_pool = create_pool(OLLAMA_URL, OLLAMA_MAX_CONCURRENCY)
+
+# Extra attempts, each on a different backend, for calls that fail before any output
+OLLAMA_MAX_RETRIES = int(os.getenv("OLLAMA_MAX_RETRIES", "2"))
+
+LLM_REQUESTS = Counter("llm_requests_total", "LLM calls by purpose and outcome.", ["purpose", "outcome"])
+LLM_IN_FLIGHT = Gauge("llm_in_flight", "LLM calls currently being answered.")
+LLM_QUEUE_WAIT = Histogram("llm_queue_wait_seconds", "Time spent waiting for a concurrency slot.", ["purpose"])
+LLM_TTFB = Histogram("llm_time_to_first_byte_seconds", "Time until Ollama started responding.", ["purpose"])
+LLM_DURATION = Histogram("llm_request_duration_seconds", "Total duration of an LLM call.", ["purpose"])
+LLM_PROMPT_EVAL = Histogram("llm_prompt_eval_seconds", "Prompt evaluation time reported by Ollama.", ["purpose"])
+LLM_PROMPT_EVAL_TOKENS = Histogram(
+    "llm_prompt_eval_tokens", "Prompt tokens Ollama had to evaluate (cached prefix excluded).", ["purpose"],
+    (10, 25, 50, 100, 250, 500, 1000, 2000, 4000, 8000)
+)
+LLM_RETRIES = Counter("llm_retries_total", "LLM calls retried on another backend.", ["purpose"])
+LLM_COALESCED = Counter("llm_coalesced_total", "LLM calls answered by an identical call already in flight.", ["purpose"])
+LLM_PROMPT_CHARS = Histogram("llm_prompt_chars", "Characters sent to the model per call.", ["purpose"], SIZE_BUCKETS)
+LLM_RESPONSE_CHARS = Histogram("llm_response_chars", "Characters received from the model per call.", ["purpose"], SIZE_BUCKETS)
+
+_client: Optional[httpx.AsyncClient] = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
+_scheduler: Optional[LLMScheduler] = None
+
+# Identical non-streaming calls in flight share one request
+_single_flight = SingleFlight()
+
+
+def _capacity() -> int:
+    """Slots for calls in flight: OLLAMA_MAX_CONCURRENCY per backend taking requests."""
+    # With no backend up, let calls through so they fail fast instead of queueing
+    return OLLAMA_MAX_CONCURRENCY * max(1, backend_pool.available_count())
+
+
+def _collect_scheduler_metrics():
+    if _scheduler is not None:
+        _scheduler.collect_metrics()
+
+
+register_collector(_collect_scheduler_metrics)
+
+
+def _get_headers() -> Dict[str, str]:
+    headers = {"Content-Type": "application/json"}
+    if OLLAMA_API_KEY:
+        headers["Authorization"] = f"Bearer {OLLAMA_API_KEY}"
+    return headers
+
+
+def get_client() -> httpx.AsyncClient:
+    """
+    Return the shared keep-alive client, creating it for the running event loop.
+    """
+    global _client, _client_loop, _scheduler
+
+    loop = asyncio.get_running_loop()
+    if _client is None or _client_loop is not loop:
+        # A client is bound to the loop it was created on. httpx limits are
+        # totals; BackendPool.acquire() keeps each backend to its share.
+        backends = len(backend_pool.backends)
+        _client = httpx.AsyncClient(
+            headers=_get_headers(),
+            timeout=httpx.Timeout(OLLAMA_READ_TIMEOUT, connect=OLLAMA_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=OLLAMA_MAX_CONCURRENCY * backends,
+                max_keepalive_connections=OLLAMA_MAX_KEEPALIVE * backends
+            )
+        )
+        _client_loop = loop
+        _scheduler = LLMScheduler(_capacity)
+        backend_pool.start_probes(_client)
+    return _client
+
+
+async def close_client():
+    """Close the shared client (called on application shutdown)."""
+    global _client, _client_loop, _scheduler
+
+    backend_pool.stop_probes()
+    if _client is not None:
+        await _client.aclose()
+    _client = None
+    _client_loop = None
+    _scheduler = None
+
+
+class OllamaError(Exception):
+    """An Ollama call failed (connection error, timeout or non-200 response)."""
+
+
+def _parse_chat_line(line: str) -> Optional[Dict]:
+    """Parse one JSON line of an Ollama /api/chat body."""
+    if not line.strip():
+        return None
+
+    try:
+        data = json.loads(line)
+    except json.JSONDecodeError:
+        return None
+
+    return data if isinstance(data, dict) else None
+
+
+async def _chat_request(
+    model: str,
+    messages: List[Dict],
+    options: Dict,
+    timeout: Optional[float],
+    purpose: str,
+    stream: bool
+) -> AsyncIterator[str]:
+    """
+    Make one /api/chat call and yield content chunks, recording metrics.
+    A call that fails before any content arrived is retried on another backend.
+    Raises OllamaError if the call fails, LLMOverloaded if it is not admitted.
+    """
+    client = get_client()
+    payload = {
+        "model": model,
+        "messages": messages,
+        "stream": stream,
+        "options": options
+    }
+
+    # Queue wait and the call itself share the deadline
+    queued = time.perf_counter()
+    deadline = time.monotonic() + min(MAX_QUEUE_WAIT.get(purpose, OLLAMA_READ_TIMEOUT), timeout or OLLAMA_READ_TIMEOUT)
+    try:
+        await _scheduler.acquire(purpose, deadline)
+    except LLMOverloaded:
+        LLM_REQUESTS.inc(purpose=purpose, outcome="rejected")
+        raise
+
+    started = time.perf_counter()
+    if timeout is not None:
+        timeout = max(1.0, timeout - (started - queued))
+
+    LLM_QUEUE_WAIT.observe(started - queued, purpose=purpose)
+    LLM_PROMPT_CHARS.observe(sum(len(msg["content"]) for msg in messages), purpose=purpose)
+    LLM_IN_FLIGHT.inc()
+    outcome = "error"
+    response_chars = 0
+    tried = []
+
+    try:
+        while True:
+            try:
+                backend, trial = backend_pool.acquire(exclude=tried)
+            except NoBackendAvailable as e:
+                outcome = "unavailable"
+                raise OllamaError(str(e)) from e
+            tried.append(backend)
+
+            # True/False: the backend worked/failed; None: says nothing about the backend
+            backend_ok = None
+            retryable = False
+            try:
+                async with client.stream(
+                    "POST",
+                    backend.url,
+                    json=payload,
+                    timeout=timeout if timeout is not None else httpx.USE_CLIENT_DEFAULT
+                ) as response:
+                    if response.status_code != 200:
+                        body = await response.aread()
+                        outcome = "http_error"
+                        # 5xx and 429 are the node's problem; other 4xx are ours
+                        retryable = response.status_code >= 500 or response.status_code == 429
+                        backend_ok = False if retryable else None
+                        raise OllamaError(f"Ollama ({backend.name}) returned HTTP {response.status_code}: {body[:200]!r}")
+
+                    LLM_TTFB.observe(time.perf_counter() - started, purpose=purpose)
+
+                    async for line in response.aiter_lines():
+                        data = _parse_chat_line(line)
+                        if data is None:
+                            continue
+
+                        content = (data.get("message") or {}).get("content") or ""
+                        if content:
+                            response_chars += len(content)
+                            yield content
+
+                        # When "done": true → stop
+                        if data.get("done", False):
+                            if "prompt_eval_duration" in data:
+                                LLM_PROMPT_EVAL.observe(data["prompt_eval_duration"] / 1e9, purpose=purpose)
+                            if "prompt_eval_count" in data:
+                                LLM_PROMPT_EVAL_TOKENS.observe(data["prompt_eval_count"], purpose=purpose)
+                            break
+
+                backend_ok = True
+                outcome = "success"
+                return
+            except httpx.HTTPError as e:
+                outcome = "timeout" if isinstance(e, httpx.TimeoutException) else "error"
+                backend_ok = False
+                retryable = True
+                error = OllamaError(f"Error connecting to Ollama ({backend.name}): {e!r}")
+                error.__cause__ = e
+            except OllamaError as e:
+                error = e
+            finally:
+                backend_pool.release(backend, trial, backend_ok)
+
+            # Retry elsewhere only if nothing was passed on to the caller yet
+            if not retryable or response_chars or len(tried) > OLLAMA_MAX_RETRIES:
+                raise error
+            print(f"{error}; retrying on another backend")
+            LLM_RETRIES.inc(purpose=purpose)
+    except (asyncio.CancelledError, GeneratorExit):
+        outcome = "cancelled"
+        raise
+    finally:
+        _scheduler.release(time.perf_counter() - started)
+        LLM_IN_FLIGHT.dec()
+        LLM_REQUESTS.inc(purpose=purpose, outcome=outcome)
+        LLM_DURATION.observe(time.perf_counter() - started, purpose=purpose)
+        LLM_RESPONSE_CHARS.observe(response_chars, purpose=purpose)
+
+
+def _request_key(model: str, messages: List[Dict], options: Dict) -> str:
+    """Fingerprint of everything that determines a call's output."""
+    body = json.dumps([model, messages, options], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(body.encode("utf-8")).hexdigest()
+
+
+async def chat(
+    model: str,
+    messages: List[Dict],
+    options: Dict,
+    timeout: Optional[float] = None,
+    purpose: str = "chat"
+) -> Optional[str]:
+    """
+    Send a chat request to Ollama without blocking the event loop.
+    Returns the full response text, or None if the call failed.
+    Raises LLMOverloaded if the backends are too busy to take the call.
+
+    Concurrent calls with the same model, messages and options share a
+    single request and its result.
+    """
+    async def request() -> Optional[str]:
+        parts = []
+        try:
+            async for content in _chat_request(model, messages, options, timeout, purpose, stream=False):
+                parts.append(content)
+        except OllamaError as e:
+            print(e)
+            return None
+        return "".join(parts)
+
+    result, shared = await _single_flight.do((purpose, _request_key(model, messages, options)), request)
+    if shared:
+        LLM_COALESCED.inc(purpose=purpose)
+    return result
+
+
+async def stream_chat(
+    model: str,
+    messages: List[Dict],
+    options: Dict,
+    timeout: Optional[float] = None,
+    purpose: str = "chat"
+) -> AsyncIterator[str]:
+    """
+    Stream a chat response from Ollama, yielding content chunks as they arrive.
+    Stops early (after logging) if the call fails.
+    Raises LLMOverloaded (before yielding anything) if the backends are too busy.
+    Closing it early closes the request and frees its scheduler slot.
+    """
+    try:
+        async with aclosing(_chat_request(model, messages, options, timeout, purpose, stream=True)) as chunks:
+            async for content in chunks:
+                yield content
+    except OllamaError as e:
+        print(e)
@@ -1,28 +1,14 @@
-def get_psychiatrist_prompt(current_mood: str, mood_history: list) -> str:
-    """
-    Generate a dynamic system prompt for the psychiatrist chatbot
-    based on user's current mood and mood history.
-    """
-
-    # Format mood history for context
-    history_context = ""
-    if mood_history and len(mood_history) > 1:
-        history_context = "\n\nUSER'S MOOD HISTORY (most recent first):\n"
-        for i, entry in enumerate(mood_history[:10], 1):  # Last 10 entries
-            history_context += f"{i}. {entry['mood']} - {entry['created_at']}\n"
-
-        history_context += """
-Use this history to:
-- Notice patterns (improving, worsening, fluctuating)
-- Reference previous moods naturally ("I noticed you were feeling X before...")
-- Understand the user's emotional journey
-- Ask about changes if mood shifted significantly
-"""
+import os
+from typing import Dict, List, Tuple
+from .cache import LRUCache
+from .timestamps import to_pkt
 
-    system_prompt = f"""You are Dr. Mira, a caring therapist having a conversation.
+# Compiled prompts kept per (current mood, mood-history version)
+PROMPT_CACHE_SIZE = int(os.getenv("PROMPT_CACHE_SIZE", "2048"))
 
-User's current mood: {current_mood}
-{history_context}
+# The static part comes first, so every session (not just every turn) shares
+# the same prompt prefix and the Ollama server can reuse its evaluated KV cache.
+_STATIC_PROMPT = """You are Dr. Mira, a caring therapist having a conversation.
 
 INSTRUCTIONS:
 - Give short, complete responses (2-3 sentences)
@@ -40,4 +26,58 @@ User: "what do you suggest" -> "One thing that might help is taking a 5-minute b
 SAFETY: If self-harm mentioned, say: "I'm concerned about you. Please reach out to Umang helpline: 0311-7786264"
 """
 
-    return system_prompt
+_HISTORY_HEADER = "\nUSER'S MOOD HISTORY (most recent first):\n"
+
+_HISTORY_GUIDANCE = """
+Use this history to:
+- Notice patterns (improving, worsening, fluctuating)
+- Reference previous moods naturally ("I noticed you were feeling X before...")
+- Understand the user's emotional journey
+- Ask about changes if mood shifted significantly
+"""
+
+_prompt_cache = LRUCache(PROMPT_CACHE_SIZE)
+
+
+def get_psychiatrist_prompt(current_mood: str, mood_history: list) -> str:
+    """
+    Generate a dynamic system prompt for the psychiatrist chatbot
+    based on user's current mood and mood history.
+    """
+    parts = [_STATIC_PROMPT, f"\nUser's current mood: {current_mood}\n"]
+
+    # Format mood history for context
+    if mood_history and len(mood_history) > 1:
+        parts.append(_HISTORY_HEADER)
+        parts.extend(
+            f"{i}. {entry['mood']} - {to_pkt(entry['created_at'])}\n"
+            for i, entry in enumerate(mood_history[:10], 1)  # Last 10 entries
+        )
+        parts.append(_HISTORY_GUIDANCE)
+
+    return "".join(parts)
+
+
+def history_version(current_mood: str, mood_history: List[Dict]) -> Tuple:
+    """
+    Identifies what the prompt was built from. Mood logs never change once
+    written, so their ids are enough to tell two histories apart.
+    """
+    return (current_mood, tuple(entry["id"] for entry in mood_history[:10]))
+
+
+def get_cached_psychiatrist_prompt(current_mood: str, mood_history: List[Dict]) -> str:
+    """
+    get_psychiatrist_prompt, built once per (mood, history version) and then
+    reused, so every turn of a session sends a byte-identical system prompt.
+    """
+    key = history_version(current_mood, mood_history)
+    prompt = _prompt_cache.get(key)
+    if prompt is None:
+        prompt = get_psychiatrist_prompt(current_mood, mood_history)
+        _prompt_cache.set(key, prompt)
+    return prompt
+
+
+def prompt_cache_stats() -> Dict:
+    return _prompt_cache.stats()
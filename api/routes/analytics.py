@@ -0,0 +1,95 @@
+import numpy as np
+from fastapi import APIRouter, HTTPException, Query
+from ..analytics import MOODS, WEEKDAYS, analytics
+from ..entity_cache import get_user
+
+router = APIRouter()
+
+# Rolling distribution bounds (days)
+DEFAULT_ROLLING_WINDOW = 7
+MAX_ROLLING_WINDOW = 90
+DEFAULT_ROLLING_DAYS = 30
+MAX_ROLLING_DAYS = 365
+
+# These handlers are plain functions, so FastAPI runs them in its threadpool:
+# the first refresh after a restart reads every mood log.
+
+
+def _transition_table(counts: np.ndarray) -> dict:
+    """Counts and row-normalized probabilities (from mood -> to mood), in MOODS order."""
+    totals = counts.sum(axis=1, keepdims=True)
+    probabilities = np.divide(counts, totals, out=np.zeros(counts.shape), where=totals > 0)
+    return {
+        "counts": counts.tolist(),
+        "probabilities": probabilities.round(4).tolist()
+    }
+
+
+def _user_id(username: str) -> int:
+    user = get_user(username.strip())
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return user["id"]
+
+
+@router.get("/users/{username}/rolling")
+def get_rolling_distribution(
+    username: str,
+    window: int = Query(DEFAULT_ROLLING_WINDOW, ge=1, le=MAX_ROLLING_WINDOW),
+    days: int = Query(DEFAULT_ROLLING_DAYS, ge=1, le=MAX_ROLLING_DAYS)
+):
+    """
+    For each of the last `days` days (PKT, oldest first), the share of each
+    mood among the user's logs in the `window` days ending that day.
+    """
+    user_id = _user_id(username)
+    analytics.refresh()
+    result = analytics.rolling_distribution(user_id, window, days)
+
+    dates = (np.arange(days) + result["first_day"]).astype("datetime64[D]").astype(str)
+    shares = result["shares"].round(4).tolist()
+    return {
+        "username": username,
+        "window_days": window,
+        "moods": list(MOODS),
+        "days": [
+            {"day": day, "logs": int(total), "shares": dict(zip(MOODS, day_shares))}
+            for day, total, day_shares in zip(dates.tolist(), result["totals"].tolist(), shares)
+        ]
+    }
+
+
+@router.get("/users/{username}/transitions")
+def get_user_transitions(username: str):
+    """How often each mood was followed by each other mood in the user's consecutive logs."""
+    user_id = _user_id(username)
+    analytics.refresh()
+    return {
+        "username": username,
+        "moods": list(MOODS),
+        **_transition_table(analytics.user_transitions(user_id))
+    }
+
+
+@router.get("/population")
+def get_population_breakdown():
+    """Mood counts across all users by hour of day and day of week (PKT), and overall transitions."""
+    analytics.refresh()
+    population = analytics.population()
+    by_time = population["by_time"]
+    by_hour = by_time.sum(axis=0).tolist()
+    by_weekday = by_time.sum(axis=1).tolist()
+
+    return {
+        "total_logs": population["total_logs"],
+        "moods": list(MOODS),
+        "by_hour": [{"hour": hour, "counts": dict(zip(MOODS, counts))} for hour, counts in enumerate(by_hour)],
+        "by_weekday": [{"day": day, "counts": dict(zip(MOODS, counts))} for day, counts in zip(WEEKDAYS, by_weekday)],
+        "transitions": _transition_table(population["transitions"])
+    }
+
+
+@router.get("/stats")
+def get_analytics_stats():
+    """How far the aggregates have caught up, and the rolling-distribution cache hit rate."""
+    return analytics.stats()
@@ -1,6 +1,6 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from ..database import create_user, get_user, user_exists
+from ..entity_cache import create_user, get_user, user_exists
 
 router = APIRouter()
 
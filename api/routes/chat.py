@@ -1,20 +1,59 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 from pydantic import BaseModel
-from typing import Optional
+from typing import Awaitable, Callable, Optional
+import json
+import time
 from ..database import (
-    get_user,
     get_user_mood_history,
-    create_chat_session,
+    get_user_chat_sessions,
+    get_chat_sessions_changed_since,
+    get_chat_sessions_version,
+    search_chat_messages
+)
+from ..message_journal import (
     save_chat_message,
     get_session_messages,
-    end_chat_session,
-    get_user_chat_sessions,
-    get_connection
+    get_chat_turn_context,
+    save_chat_exchange
+)
+from ..entity_cache import (
+    get_user,
+    get_user_mood_log,
+    get_session,
+    create_chat_session,
+    end_chat_session
 )
-from ..llm_logic_for_psychiatrist import chat_with_psychiatrist, get_initial_greeting
+from ..llm_logic_for_psychiatrist import (
+    chat_with_psychiatrist,
+    stream_chat_with_psychiatrist
+)
+from ..greetings import get_greeting
+from ..chat_context import build_chat_context, update_session_summary
+from ..metrics import Histogram
+from ..timestamps import now_epoch, parse_time_range, render_times
 
 router = APIRouter()
 
+# Mood entries included in the psychiatrist prompt
+MOOD_CONTEXT_SIZE = 10
+
+# Page sizes for the history endpoints
+DEFAULT_MESSAGE_PAGE_SIZE = 100
+MAX_MESSAGE_PAGE_SIZE = 500
+DEFAULT_SESSION_PAGE_SIZE = 50
+MAX_SESSION_PAGE_SIZE = 200
+DEFAULT_SEARCH_PAGE_SIZE = 20
+MAX_SEARCH_PAGE_SIZE = 100
+MAX_SEARCH_OFFSET = 1000
+
+CHAT_TIME_TO_FIRST_TOKEN = Histogram(
+    "chat_time_to_first_token_seconds", "Time from request to the first streamed token."
+)
+
+FALLBACK_RESPONSE = "I apologize, but I'm having a moment of difficulty. Could you please repeat what you said? I want to make sure I understand you correctly."
+
 
 class StartChatRequest(BaseModel):
     username: str
@@ -47,24 +86,21 @@ async def start_chat_session(request: StartChatRequest):
     if user is None:
         raise HTTPException(status_code=404, detail="User not found")
 
-    # Get mood history for context
-    mood_history = get_user_mood_history(username)
-
     # Find the current mood from the mood_log_id
-    current_mood = None
-    for entry in mood_history:
-        if entry["id"] == request.mood_log_id:
-            current_mood = entry["mood"]
-            break
-
-    if current_mood is None:
+    mood_log = get_user_mood_log(request.mood_log_id, user)
+    if mood_log is None:
         raise HTTPException(status_code=404, detail="Mood log not found")
 
+    current_mood = mood_log["mood"]
+
+    # Get recent mood history for context
+    mood_history = get_user_mood_history(username, limit=MOOD_CONTEXT_SIZE)
+
     # Create chat session
-    session_id = create_chat_session(user["id"], request.mood_log_id)
+    session_id = create_chat_session(user, mood_log)
 
-    # Get initial greeting from psychiatrist
-    greeting = get_initial_greeting(current_mood, mood_history)
+    # Get initial greeting from psychiatrist (usually pre-generated after mood detection)
+    greeting = await get_greeting(request.mood_log_id, current_mood, mood_history)
 
     if greeting is None:
         greeting = f"Hello! I'm Dr. Mira, your AI wellness companion. I see you're feeling {current_mood} today. I'm here to listen and support you. How are you doing right now?"
@@ -80,7 +116,7 @@ async def start_chat_session(request: StartChatRequest):
 
 
 @router.post("/message", response_model=ChatMessageResponse)
-async def send_chat_message(request: ChatMessageRequest):
+async def send_chat_message(request: ChatMessageRequest, background_tasks: BackgroundTasks):
     """Send a message to the psychiatrist and get a response."""
     session_id = request.session_id
     user_message = request.message.strip()
@@ -88,51 +124,164 @@ async def send_chat_message(request: ChatMessageRequest):
     if not user_message:
         raise HTTPException(status_code=400, detail="Message cannot be empty")
 
-    # Get session info
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT cs.user_id, cs.mood_log_id, ml.mood, u.username
-        FROM chat_sessions cs
-        JOIN mood_logs ml ON cs.mood_log_id = ml.id
-        JOIN users u ON cs.user_id = u.id
-        WHERE cs.id = ?
-    """, (session_id,))
-    session_info = cursor.fetchone()
-    conn.close()
-
-    if session_info is None:
-        raise HTTPException(status_code=404, detail="Chat session not found")
-
-    username = session_info["username"]
-    current_mood = session_info["mood"]
+    # Session owner and mood are cached; summary, unsummarized messages and
+    # recent moods come from the database in one round-trip
+    session = get_session(session_id)
+    context = get_chat_turn_context(session_id, MOOD_CONTEXT_SIZE) if session else None
 
-    # Save user message
-    save_chat_message(session_id, "user", user_message)
+    if context is None:
+        raise HTTPException(status_code=404, detail="Chat session not found")
 
-    # Get conversation history
-    messages = get_session_messages(session_id)
+    received_at = now_epoch()
 
-    # Get mood history for context
-    mood_history = get_user_mood_history(username)
+    # Get the token-budgeted recent window (older turns live in the summary)
+    messages, needs_summary = build_chat_context(
+        context["messages"] + [{"role": "user", "content": user_message}]
+    )
 
     # Get response from psychiatrist
-    response = chat_with_psychiatrist(
+    response = await chat_with_psychiatrist(
         user_message=user_message,
-        current_mood=current_mood,
-        mood_history=mood_history,
-        conversation_history=messages[:-1]
+        current_mood=session["mood"],
+        mood_history=context["mood_history"],
+        conversation_history=messages[:-1],
+        conversation_summary=context["summary"]
     )
 
     if response is None:
-        response = "I apologize, but I'm having a moment of difficulty. Could you please repeat what you said? I want to make sure I understand you correctly."
+        response = FALLBACK_RESPONSE
 
-    # Save assistant response
-    message_id = save_chat_message(session_id, "assistant", response)
+    # Save the user message and the response together
+    _, message_id = save_chat_exchange(session_id, user_message, response, user_created_at=received_at)
+
+    if needs_summary:
+        background_tasks.add_task(update_session_summary, session_id)
 
     return ChatMessageResponse(response=response, message_id=message_id)
 
 
+def _sse_event(event: str, data: dict) -> str:
+    """Format one server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class _ClosingStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse that awaits `on_close` however the response ends: after
+    the last chunk, on a client disconnect, or when the body was never iterated.
+    """
+
+    def __init__(self, *args, on_close: Callable[[], Awaitable[None]], **kwargs):
+        super().__init__(*args, **kwargs)
+        self.on_close = on_close
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self.on_close()
+
+
+@router.post("/message/stream")
+async def stream_chat_message(request: ChatMessageRequest):
+    """
+    Send a message to the psychiatrist and stream the response as server-sent events.
+
+    Emits `token` events ({"content": ...}) as the model generates, then one `done`
+    event with the saved message_id, the full response and time_to_first_token_ms.
+    """
+    session_id = request.session_id
+    user_message = request.message.strip()
+
+    if not user_message:
+        raise HTTPException(status_code=400, detail="Message cannot be empty")
+
+    session = get_session(session_id)
+    context = get_chat_turn_context(session_id, MOOD_CONTEXT_SIZE) if session else None
+    if context is None:
+        raise HTTPException(status_code=404, detail="Chat session not found")
+
+    received_at = now_epoch()
+    messages, needs_summary = build_chat_context(
+        context["messages"] + [{"role": "user", "content": user_message}]
+    )
+
+    started = time.perf_counter()
+    tokens = stream_chat_with_psychiatrist(
+        user_message=user_message,
+        current_mood=session["mood"],
+        mood_history=context["mood_history"],
+        conversation_history=messages[:-1],
+        conversation_summary=context["summary"]
+    )
+
+    # Wait for admission and the first token before sending headers, so an
+    # overloaded model becomes a 503 with Retry-After rather than a broken stream
+    try:
+        first_token = await tokens.__anext__()
+    except StopAsyncIteration:
+        first_token = None
+
+    saved = False
+
+    async def event_stream():
+        nonlocal saved
+        time_to_first_token = None
+        parts = []
+
+        async def all_tokens():
+            if first_token is not None:
+                yield first_token
+                async for token in tokens:
+                    yield token
+
+        async for token in all_tokens():
+            if time_to_first_token is None:
+                time_to_first_token = time.perf_counter() - started
+                CHAT_TIME_TO_FIRST_TOKEN.observe(time_to_first_token)
+            parts.append(token)
+            yield _sse_event("token", {"content": token})
+
+        response = "".join(parts).strip()
+        if not response:
+            response = FALLBACK_RESPONSE
+            yield _sse_event("token", {"content": response})
+
+        # Persist only the complete response, together with the user message
+        _, message_id = save_chat_exchange(session_id, user_message, response, user_created_at=received_at)
+        saved = True
+
+        yield _sse_event("done", {
+            "message_id": message_id,
+            "response": response,
+            "time_to_first_token_ms": round(time_to_first_token * 1000, 1) if time_to_first_token is not None else None,
+            "total_time_ms": round((time.perf_counter() - started) * 1000, 1)
+        })
+
+    body = event_stream()
+
+    async def close_stream():
+        # The model stream holds a scheduler slot and a backend connection until
+        # closed; the client may have gone away before or during the body
+        await body.aclose()
+        await tokens.aclose()
+        # Client went away: keep what the user said
+        if not saved:
+            save_chat_message(session_id, "user", user_message)
+
+    try:
+        return _ClosingStreamingResponse(
+            body,
+            on_close=close_stream,
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+            background=BackgroundTask(update_session_summary, session_id) if needs_summary else None
+        )
+    except BaseException:
+        await close_stream()
+        raise
+
+
 @router.post("/end/{session_id}")
 async def end_chat(session_id: int):
     """End a chat session."""
@@ -141,24 +290,135 @@ async def end_chat(session_id: int):
 
 
 @router.get("/history/{session_id}")
-async def get_chat_history(session_id: int):
-    """Get all messages from a chat session."""
-    messages = get_session_messages(session_id)
+async def get_chat_history(
+    session_id: int,
+    limit: int = Query(DEFAULT_MESSAGE_PAGE_SIZE, ge=1, le=MAX_MESSAGE_PAGE_SIZE),
+    before: Optional[int] = None,
+    after: Optional[int] = None
+):
+    """
+    Get the latest messages from a chat session (oldest first), with the
+    session's mood. Pass `before=next_cursor` to page back to earlier messages.
+
+    Pass `after=<last message id you have>` to get only newer messages (oldest
+    first); keep calling with `after=last_id` while `has_more` is true.
+    """
+    if after is not None:
+        if before is not None:
+            raise HTTPException(status_code=400, detail="Use either before or after, not both")
+
+        messages = get_session_messages(session_id, after_id=after, limit=limit + 1, from_start=True)
+        has_more = len(messages) > limit
+        messages = messages[:limit]
+
+        return {
+            "session_id": session_id,
+            "messages": render_times(messages, "created_at"),
+            "last_id": messages[-1]["id"] if messages else after,
+            "has_more": has_more
+        }
+
+    messages = get_session_messages(session_id, limit=limit + 1, before=before)
+
+    has_more = len(messages) > limit
+    messages = messages[-limit:]
+    session = get_session(session_id)
+
     return {
         "session_id": session_id,
-        "messages": messages
+        "mood": session["mood"] if session else None,
+        "messages": render_times(messages, "created_at"),
+        "next_cursor": messages[0]["id"] if has_more else None
     }
 
 
 @router.get("/sessions/{username}")
-async def get_user_sessions(username: str):
-    """Get all chat sessions for a user."""
+async def get_user_sessions(
+    username: str,
+    limit: int = Query(DEFAULT_SESSION_PAGE_SIZE, ge=1, le=MAX_SESSION_PAGE_SIZE),
+    before: Optional[int] = None,
+    since: Optional[int] = None,
+    start: Optional[str] = Query(None, alias="from"),
+    end: Optional[str] = Query(None, alias="to")
+):
+    """
+    Get chat sessions for a user, newest first.
+    Pass `before=next_cursor` to fetch the next page.
+
+    `from`/`to` limit the listing to sessions started in that range: epoch
+    seconds, a YYYY-MM-DD date (PKT; `to` includes the whole day) or an ISO
+    8601 datetime. `from` is inclusive, `to` exclusive.
+
+    The response's `version` stamps the user's sessions. Pass `since=version`
+    to get only the sessions created or changed after it (oldest change
+    first); keep calling with the returned `version` while `has_more` is true.
+    """
     user = get_user(username.strip())
     if user is None:
         raise HTTPException(status_code=404, detail="User not found")
 
-    sessions = get_user_chat_sessions(username)
+    try:
+        start, end = parse_time_range(start, end)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if since is not None:
+        if before is not None:
+            raise HTTPException(status_code=400, detail="Use either before or since, not both")
+        if start is not None or end is not None:
+            raise HTTPException(status_code=400, detail="Use either from/to or since, not both")
+
+        sessions = get_chat_sessions_changed_since(user["id"], since, limit=limit + 1)
+        has_more = len(sessions) > limit
+        sessions = sessions[:limit]
+
+        return {
+            "username": username,
+            "sessions": render_times(sessions, "started_at", "ended_at"),
+            "version": sessions[-1]["version"] if sessions else since,
+            "has_more": has_more
+        }
+
+    # Read the stamp first: anything that changes meanwhile is newer than it
+    version = get_chat_sessions_version(user["id"])
+    sessions = get_user_chat_sessions(username, limit=limit + 1, before=before, start=start, end=end)
+
+    has_more = len(sessions) > limit
+    sessions = sessions[:limit]
+
+    return {
+        "username": username,
+        "sessions": render_times(sessions, "started_at", "ended_at"),
+        "version": version,
+        "next_cursor": sessions[-1]["id"] if has_more else None
+    }
+
+
+@router.get("/search")
+async def search_messages(
+    username: str,
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(DEFAULT_SEARCH_PAGE_SIZE, ge=1, le=MAX_SEARCH_PAGE_SIZE),
+    offset: int = Query(0, ge=0, le=MAX_SEARCH_OFFSET)
+):
+    """
+    Search a user's chat messages across all sessions, best match first.
+    Each result carries an HTML-escaped snippet with matched words wrapped in
+    <mark> tags, safe to render as HTML.
+    Pass `offset=next_offset` to fetch the next page.
+    """
+    user = get_user(username.strip())
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    results = search_chat_messages(user["id"], q, limit=limit + 1, offset=offset)
+
+    has_more = len(results) > limit
+    results = results[:limit]
+
     return {
         "username": username,
-        "sessions": sessions
+        "query": q,
+        "results": render_times(results, "created_at"),
+        "next_offset": offset + limit if has_more else None
     }
@@ -0,0 +1,89 @@
+from datetime import datetime, timedelta
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel
+from typing import Dict, Optional
+from ..database import get_user_stats
+from ..entity_cache import get_user
+from ..mood_rules import MOODS
+from ..timestamps import PKT, to_pkt
+
+router = APIRouter()
+
+
+class LatestMood(BaseModel):
+    log_id: int
+    mood: str
+    created_at: str
+
+
+class LastSession(BaseModel):
+    id: int
+    started_at: Optional[str] = None
+    ended_at: Optional[str] = None
+
+
+class DashboardResponse(BaseModel):
+    username: str
+    latest_mood: Optional[LatestMood] = None
+    mood_counts: Dict[str, int]
+    total_mood_logs: int
+    current_streak_days: int
+    last_session: Optional[LastSession] = None
+    session_count: int
+
+
+def _current_streak(streak_days: int, last_day: Optional[str]) -> int:
+    """The stored streak still counts if its last day is today or yesterday (PKT)."""
+    if not last_day:
+        return 0
+    yesterday = (datetime.now(PKT) - timedelta(days=1)).strftime("%Y-%m-%d")
+    return streak_days if last_day >= yesterday else 0
+
+
+@router.get("/{username}", response_model=DashboardResponse)
+async def get_dashboard(username: str):
+    """
+    Everything the dashboard shows in one lookup: latest mood, mood counts,
+    current daily streak and the last chat session. Served from the user_stats
+    row that mood logs and chat sessions keep up to date.
+    """
+    username = username.strip()
+    user = get_user(username)
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    stats = get_user_stats(user["id"])
+    if stats is None:
+        return DashboardResponse(
+            username=username,
+            mood_counts={mood: 0 for mood in MOODS},
+            total_mood_logs=0,
+            current_streak_days=0,
+            session_count=0
+        )
+
+    latest_mood = None
+    if stats["latest_mood_log_id"] is not None:
+        latest_mood = LatestMood(
+            log_id=stats["latest_mood_log_id"],
+            mood=stats["latest_mood"],
+            created_at=to_pkt(stats["latest_mood_at"])
+        )
+
+    last_session = None
+    if stats["last_session_id"] is not None:
+        last_session = LastSession(
+            id=stats["last_session_id"],
+            started_at=to_pkt(stats["last_session_started_at"]),
+            ended_at=to_pkt(stats["last_session_ended_at"])
+        )
+
+    return DashboardResponse(
+        username=username,
+        latest_mood=latest_mood,
+        mood_counts={**{mood: 0 for mood in MOODS}, **stats["mood_counts"]},
+        total_mood_logs=stats["total_mood_logs"],
+        current_streak_days=_current_streak(stats["streak_days"], stats["streak_last_day"]),
+        last_session=last_session,
+        session_count=stats["session_count"]
+    )
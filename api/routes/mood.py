@@ -1,13 +1,23 @@
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
-from typing import Dict, List
-import json
-from ..database import get_user, save_mood_log, get_user_mood_history
-from ..llm_logic_for_mood_detection import query_mood_model
-from ..prompt_for_mood_detection import system_prompt
+from fastapi import APIRouter, HTTPException, Query
+from pydantic import BaseModel, Field
+from typing import Dict, List, Optional
+from ..database import get_answer_distribution, get_user_mood_history
+from ..entity_cache import get_user, get_users, save_mood_log, save_mood_logs
+from ..llm_logic_for_mood_detection import classify_mood, classify_moods, classifier_stats, mood_cache
+from ..mood_rules import MOOD_RULES_MIN_CONFIDENCE
+from ..answers import answers_key
+from ..greetings import prefetch_greeting
+from ..timestamps import parse_time_range, render_times
 
 router = APIRouter()
 
+# Page sizes for the history endpoint
+DEFAULT_HISTORY_PAGE_SIZE = 50
+MAX_HISTORY_PAGE_SIZE = 200
+
+# Most questionnaires per detect-batch request; larger imports are split by the client
+MAX_BATCH_SIZE = 500
+
 
 class MoodDetectRequest(BaseModel):
     username: str
@@ -20,6 +30,25 @@ class MoodResponse(BaseModel):
     log_id: int
 
 
+class MoodBatchRequest(BaseModel):
+    items: List[MoodDetectRequest] = Field(..., min_length=1, max_length=MAX_BATCH_SIZE)
+
+
+class MoodBatchItemResult(BaseModel):
+    username: str
+    status: str
+    mood: Optional[str] = None
+    log_id: Optional[int] = None
+    detail: Optional[str] = None
+
+
+class MoodBatchResponse(BaseModel):
+    total: int
+    saved: int
+    unique_answer_sets: int
+    results: List[MoodBatchItemResult]
+
+
 class MoodHistoryItem(BaseModel):
     id: int
     mood: str
@@ -31,6 +60,7 @@ class MoodHistoryResponse(BaseModel):
     username: str
     total_entries: int
     history: List[MoodHistoryItem]
+    next_cursor: Optional[int] = None
 
 
 @router.post("/detect", response_model=MoodResponse)
@@ -47,7 +77,7 @@ async def detect_mood(request: MoodDetectRequest):
         raise HTTPException(status_code=404, detail="User not found. Please signup first.")
 
     # Detect mood
-    mood = query_mood_model(answers, system_prompt)
+    mood = await classify_mood(answers)
 
     if mood is None:
         raise HTTPException(status_code=500, detail="Failed to detect mood from model")
@@ -56,36 +86,127 @@ async def detect_mood(request: MoodDetectRequest):
     log_id = save_mood_log(
         user_id=user["id"],
         mood=mood,
-        answers=json.dumps(answers)
+        answers=answers
     )
 
+    # The user usually starts a chat next; have its greeting ready by then
+    prefetch_greeting(log_id, username, mood)
+
     return MoodResponse(mood=mood, status="success", log_id=log_id)
 
 
+@router.post("/detect-batch", response_model=MoodBatchResponse)
+async def detect_mood_batch(request: MoodBatchRequest):
+    """
+    Detect and save moods for many (username, answers) pairs, e.g. imported
+    offline questionnaires. Identical answer sets are classified once and all
+    logs are written in a single transaction. At most MAX_BATCH_SIZE items.
+    """
+    usernames = [item.username.strip() for item in request.items]
+    users = get_users(usernames)
+
+    results = [MoodBatchItemResult(username=username, status="pending") for username in usernames]
+    known = [i for i, username in enumerate(usernames) if username in users]
+    for i, username in enumerate(usernames):
+        if username not in users:
+            results[i].status = "error"
+            results[i].detail = "User not found"
+
+    answer_sets = [request.items[i].answers for i in known]
+    moods = await classify_moods(answer_sets)
+
+    to_save = []
+    for i, mood in zip(known, moods):
+        if mood is None:
+            results[i].status = "error"
+            results[i].detail = "Failed to detect mood from model"
+        else:
+            results[i].mood = mood
+            to_save.append(i)
+
+    log_ids = save_mood_logs([
+        (users[usernames[i]]["id"], results[i].mood, request.items[i].answers)
+        for i in to_save
+    ])
+    for i, log_id in zip(to_save, log_ids):
+        results[i].status = "success"
+        results[i].log_id = log_id
+
+    return MoodBatchResponse(
+        total=len(results),
+        saved=len(log_ids),
+        unique_answer_sets=len({answers_key(answers) for answers in answer_sets}),
+        results=results
+    )
+
+
 @router.get("/history/{username}", response_model=MoodHistoryResponse)
-async def get_mood_history(username: str):
-    """Get all mood history for a user."""
+async def get_mood_history(
+    username: str,
+    limit: int = Query(DEFAULT_HISTORY_PAGE_SIZE, ge=1, le=MAX_HISTORY_PAGE_SIZE),
+    before: Optional[int] = None,
+    start: Optional[str] = Query(None, alias="from"),
+    end: Optional[str] = Query(None, alias="to")
+):
+    """
+    Get mood history for a user, newest first.
+    Pass `before=next_cursor` to fetch the next page; total_entries counts this page.
+
+    `from`/`to` limit the history to a time range, e.g. `from=2026-09-18` for
+    the last 30 days: epoch seconds, a YYYY-MM-DD date (PKT; `to` includes the
+    whole day) or an ISO 8601 datetime. `from` is inclusive, `to` exclusive.
+    """
     username = username.strip()
 
     user = get_user(username)
     if user is None:
         raise HTTPException(status_code=404, detail="User not found")
 
-    history = get_user_mood_history(username)
+    try:
+        start, end = parse_time_range(start, end)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    history = get_user_mood_history(
+        username, limit=limit + 1, before=before, with_answers=True, start=start, end=end
+    )
+
+    has_more = len(history) > limit
+    history = history[:limit]
 
-    # Parse answers JSON for each entry
-    history_items = [
-        MoodHistoryItem(
-            id=item["id"],
-            mood=item["mood"],
-            answers=json.loads(item["answers"]),
-            created_at=item["created_at"]
-        )
-        for item in history
-    ]
+    history_items = [MoodHistoryItem(**item) for item in render_times(history, "created_at")]
 
     return MoodHistoryResponse(
         username=username,
         total_entries=len(history_items),
-        history=history_items
+        history=history_items,
+        next_cursor=history_items[-1].id if has_more else None
     )
+
+
+@router.get("/answer-distribution/{username}")
+async def get_user_answer_distribution(username: str):
+    """How often the user picked each option, per question, across all their assessments."""
+    user = get_user(username.strip())
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    return {
+        "username": user["username"],
+        "questions": get_answer_distribution(user["id"])
+    }
+
+
+@router.get("/cache-stats")
+async def get_mood_cache_stats():
+    """Hit/miss counters for the mood classification cache."""
+    return mood_cache.stats()
+
+
+@router.get("/classifier-stats")
+async def get_classifier_stats():
+    """How many classifications came from the rules, the cache and the model."""
+    return {
+        "sources": classifier_stats,
+        "rules_min_confidence": MOOD_RULES_MIN_CONFIDENCE
+    }
@@ -0,0 +1,37 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls with the same key into one: the first caller
+    starts the work, later callers wait for and share its result (or error).
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> "tuple[T, bool]":
+        """Return (result, shared), where `shared` is True if another caller's call was reused."""
+        task = self._in_flight.get(key)
+        shared = task is not None and task.get_loop() is asyncio.get_running_loop()
+
+        if not shared:
+            task = asyncio.ensure_future(fn())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+
+        # Shielded, so one caller going away does not cancel the call for the others
+        return await asyncio.shield(task), shared
+
+    def _forget(self, key: Hashable, task: asyncio.Task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        if not task.cancelled():
+            # Mark the error as retrieved even if every caller went away
+            task.exception()
+
+    def __len__(self) -> int:
+        return len(self._in_flight)
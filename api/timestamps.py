@@ -0,0 +1,63 @@
+import re
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+# Timestamps are stored as integer Unix epochs (seconds) and only rendered in
+# Pakistan Standard Time (UTC+5) at the API edge.
+PKT = timezone(timedelta(hours=5))
+PKT_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+_DATE_ONLY = re.compile(r"\d{4}-\d{2}-\d{2}")
+
+
+def now_epoch() -> int:
+    """Current time as a Unix epoch in seconds (what the database stores)."""
+    return int(time.time())
+
+
+def to_pkt(epoch: Optional[int]) -> Optional[str]:
+    """Render a stored epoch as a PKT "YYYY-MM-DD HH:MM:SS" string."""
+    if epoch is None:
+        return None
+    return datetime.fromtimestamp(epoch, PKT).strftime(PKT_FORMAT)
+
+
+def render_times(rows: List[Dict], *fields: str) -> List[Dict]:
+    """Copies of `rows` with the given epoch fields rendered by to_pkt."""
+    return [{**row, **{field: to_pkt(row[field]) for field in fields}} for row in rows]
+
+
+def parse_time(value: str, end_of_day: bool = False) -> int:
+    """
+    Parse a from/to query value into an epoch. Accepts epoch seconds, a
+    YYYY-MM-DD date (PKT midnight, or the next midnight with `end_of_day` so
+    the whole day is included) or an ISO 8601 datetime (PKT unless it has an
+    offset). Raises ValueError for anything else.
+    """
+    value = value.strip()
+    if value.isdigit():
+        return int(value)
+
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=PKT)
+    if end_of_day and _DATE_ONLY.fullmatch(value):
+        moment += timedelta(days=1)
+    return int(moment.timestamp())
+
+
+def parse_time_range(start: Optional[str], end: Optional[str]) -> Tuple[Optional[int], Optional[int]]:
+    """
+    The [start, end) epoch range for `from`/`to` query parameters; either may
+    be None. Raises ValueError if a value cannot be parsed or the range is empty.
+    """
+    try:
+        start_epoch = parse_time(start) if start else None
+        end_epoch = parse_time(end, end_of_day=True) if end else None
+    except ValueError:
+        raise ValueError("from/to must be epoch seconds, YYYY-MM-DD or an ISO 8601 datetime")
+
+    if start_epoch is not None and end_epoch is not None and start_epoch >= end_epoch:
+        raise ValueError("from must be before to")
+    return start_epoch, end_epoch
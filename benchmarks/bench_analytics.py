@@ -0,0 +1,105 @@
+"""
+Benchmark: the NumPy mood analytics (api/analytics.py) against a row-by-row
+Python pass over the same mood_logs.
+
+Seeds --users users with --logs mood logs in total and reports:
+  - population breakdown (weekday x hour) plus per-user transition counts:
+    row-by-row Python versus a cold MoodAnalytics.refresh()
+  - an incremental refresh after --new more logs arrive
+  - one user's 30-day rolling distribution (7-day window), computed and cached
+
+Usage (from the repository root):
+    python -m benchmarks.bench_analytics --users 1000 --logs 500000 --new 200
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+_tmpdir = tempfile.mkdtemp(prefix="bench_analytics_")
+os.environ["DB_PATH"] = os.path.join(_tmpdir, "bench.db")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api import database  # noqa: E402
+from api.analytics import MoodAnalytics  # noqa: E402
+from api.mood_rules import MOODS  # noqa: E402
+from api.timestamps import PKT, now_epoch  # noqa: E402
+
+HISTORY_DAYS = 365
+
+
+def insert_logs(rng: random.Random, user_ids, count: int, oldest: int, newest: int):
+    """Logs spread over [oldest, newest], written in time order like live traffic."""
+    logs = sorted(
+        (rng.randrange(oldest, newest + 1), rng.choice(user_ids), rng.choice(MOODS))
+        for _ in range(count)
+    )
+    with database.pooled_connection() as conn:
+        conn.executemany(
+            "INSERT INTO mood_logs (created_at, user_id, mood, answers_code) VALUES (?, ?, ?, 'AAAAAAAAAA')",
+            logs
+        )
+        conn.commit()
+
+
+def row_by_row():
+    """The hand-rolled version: every log as a Python row, counted one by one."""
+    with database.pooled_connection() as conn:
+        rows = conn.execute("SELECT user_id, mood, created_at FROM mood_logs ORDER BY user_id, created_at, id").fetchall()
+
+    by_time = {}
+    transitions = {}
+    previous = {}
+    for row in rows:
+        moment = datetime.fromtimestamp(row["created_at"], PKT)
+        key = (moment.weekday(), moment.hour, row["mood"])
+        by_time[key] = by_time.get(key, 0) + 1
+        last = previous.get(row["user_id"])
+        if last is not None:
+            pair = (row["user_id"], last, row["mood"])
+            transitions[pair] = transitions.get(pair, 0) + 1
+        previous[row["user_id"]] = row["mood"]
+    return by_time, transitions
+
+
+def timed_ms(fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return round((time.perf_counter() - start) * 1000, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--logs", type=int, default=500000)
+    parser.add_argument("--new", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(9)
+    user_ids = [database.create_user(f"user_{i}") for i in range(args.users)]
+    now = now_epoch()
+    insert_logs(rng, user_ids, args.logs, now - HISTORY_DAYS * 86400, now - 3600)
+
+    engine = MoodAnalytics()
+    print(f"full pass (ms)    : row-by-row {timed_ms(row_by_row)}, numpy {timed_ms(engine.refresh)}")
+
+    insert_logs(rng, user_ids, args.new, now - 3600, now)
+    print(f"+{args.new} logs (ms)   : incremental refresh {timed_ms(engine.refresh)}")
+
+    # One log backdated a month: that user's transitions are recounted
+    insert_logs(rng, user_ids[:1], 1, now - 30 * 86400, now - 30 * 86400)
+    print(f"+1 backdated (ms) : incremental refresh {timed_ms(engine.refresh)}")
+
+    user_id = user_ids[0]
+    compute = timed_ms(lambda: engine.rolling_distribution(user_id, 7, 30))
+    cached = timed_ms(lambda: engine.rolling_distribution(user_id, 7, 30))
+    print(f"rolling 30d (ms)  : computed {compute}, cached {cached}")
+    print(f"engine            : {engine.stats()}")
+
+
+if __name__ == "__main__":
+    main()
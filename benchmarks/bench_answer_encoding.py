@@ -0,0 +1,117 @@
+"""
+Benchmark: questionnaire answers stored as JSON text versus the 10-character
+answers_code column.
+
+Builds two copies of a mood_logs table with --logs random answer sets, one
+with the original JSON `answers` column and one written through
+database.save_mood_logs (compact code), and reports:
+  - database file size after VACUUM
+  - time to read and decode one user's full history
+  - time to count option picks per question for one user
+
+Usage (from the repository root):
+    python -m benchmarks.bench_answer_encoding --logs 200000 --users 50
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from collections import Counter
+
+_tmpdir = tempfile.mkdtemp(prefix="bench_answers_")
+os.environ["DB_PATH"] = os.path.join(_tmpdir, "compact.db")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api import database  # noqa: E402
+from api.timestamps import now_epoch  # noqa: E402
+from api.answers import QUESTION_IDS  # noqa: E402
+
+JSON_DB_PATH = os.path.join(_tmpdir, "json.db")
+
+
+def random_answers(rng: random.Random) -> dict:
+    return {question: rng.choice("ABCDE") for question in QUESTION_IDS}
+
+
+def seed(logs: int, users: int):
+    rng = random.Random(11)
+    user_ids = [database.create_user(f"user_{i}") for i in range(users)]
+    entries = [(rng.choice(user_ids), "Neutral", random_answers(rng)) for _ in range(logs)]
+
+    for start in range(0, len(entries), 5000):
+        database.save_mood_logs(entries[start:start + 5000])
+
+    # The pre-migration layout: answers as JSON text
+    conn = sqlite3.connect(JSON_DB_PATH)
+    conn.execute("""
+        CREATE TABLE mood_logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            mood TEXT NOT NULL,
+            answers TEXT NOT NULL,
+            created_at TIMESTAMP
+        )
+    """)
+    conn.execute("CREATE INDEX idx_mood_logs_user_created ON mood_logs (user_id, created_at)")
+    now = now_epoch()
+    conn.executemany(
+        "INSERT INTO mood_logs (user_id, mood, answers, created_at) VALUES (?, ?, ?, ?)",
+        ((user_id, mood, json.dumps(answers), now) for user_id, mood, answers in entries)
+    )
+    conn.commit()
+    conn.execute("VACUUM")
+    conn.close()
+
+    with database.pooled_connection() as conn:
+        conn.execute("VACUUM")
+    return user_ids[0]
+
+
+def timed(fn, rounds: int = 20) -> float:
+    fn()
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return round((time.perf_counter() - start) / rounds * 1000, 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logs", type=int, default=200000)
+    parser.add_argument("--users", type=int, default=50)
+    args = parser.parse_args()
+
+    user_id = seed(args.logs, args.users)
+    json_conn = sqlite3.connect(JSON_DB_PATH)
+
+    def json_history():
+        rows = json_conn.execute(
+            "SELECT id, mood, answers, created_at FROM mood_logs WHERE user_id = ? ORDER BY created_at DESC",
+            (user_id,)
+        ).fetchall()
+        return [json.loads(row[2]) for row in rows]
+
+    def json_distribution():
+        counts = {question: Counter() for question in QUESTION_IDS}
+        for (answers,) in json_conn.execute("SELECT answers FROM mood_logs WHERE user_id = ?", (user_id,)):
+            for question, option in json.loads(answers).items():
+                counts[question][option] += 1
+        return counts
+
+    username = "user_0"
+    print(f"file size      : json {os.path.getsize(JSON_DB_PATH) / 1e6:.1f} MB, "
+          f"code {os.path.getsize(os.environ['DB_PATH']) / 1e6:.1f} MB (code db also has the answers index)")
+    print(f"history (ms)   : json {timed(json_history)}, "
+          f"code {timed(lambda: database.get_user_mood_history(username, with_answers=True))}, "
+          f"code without answers {timed(lambda: database.get_user_mood_history(username))}")
+    print(f"per-question   : json {timed(json_distribution)}, "
+          f"code {timed(lambda: database.get_answer_distribution(user_id))}")
+
+
+if __name__ == "__main__":
+    main()
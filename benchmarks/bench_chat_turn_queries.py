@@ -0,0 +1,107 @@
+"""
+Benchmark: database work per /api/chat/message turn, before and after the
+single-round-trip context loader.
+
+The "before" turn replays the original call sequence (get_session_info,
+save_chat_message, get_session_messages, get_user_mood_history,
+save_chat_message); the "after" turn is the cached session lookup,
+get_chat_turn_context and save_chat_exchange. For each, reports the SQL statements issued, pool
+checkouts and the mean time per turn.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_chat_turn_queries --turns 500
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+_tmpdir = tempfile.mkdtemp(prefix="bench_chat_turn_")
+os.environ["DB_PATH"] = os.path.join(_tmpdir, "bench.db")
+# One pooled connection, so the trace callback sees every statement
+os.environ["DB_POOL_SIZE"] = "1"
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api import database, entity_cache  # noqa: E402
+
+MOOD_CONTEXT_SIZE = 10
+
+# Fold older messages into the summary every few turns, like the app does,
+# so the unsummarized window stays at a realistic size
+SUMMARY_EVERY = 5
+
+
+def seed(prefix: str) -> int:
+    user_id = database.create_user(f"{prefix}_user")
+    for _ in range(30):
+        log_id = database.save_mood_log(user_id, "Neutral", {})
+    session_id = database.create_chat_session(user_id, log_id)
+    database.save_chat_message(session_id, "assistant", "Hello, how are you feeling today?")
+    return session_id
+
+
+def fold_into_summary(session_id: int):
+    session = database.get_session_info(session_id)
+    messages = database.get_session_messages(session_id, after_id=session["summary_upto_id"])
+    if len(messages) > 4:
+        database.save_session_summary(session_id, "summary", messages[-5]["id"], session["summary_upto_id"])
+
+
+def separate_calls_turn(session_id: int):
+    session = database.get_session_info(session_id)
+    database.save_chat_message(session_id, "user", "today was long")
+    database.get_session_messages(session_id, after_id=session["summary_upto_id"])
+    database.get_user_mood_history(session["username"], limit=MOOD_CONTEXT_SIZE)
+    database.save_chat_message(session_id, "assistant", "I hear you. What made it feel long?")
+
+
+def combined_turn(session_id: int):
+    entity_cache.get_session(session_id)
+    database.get_chat_turn_context(session_id, MOOD_CONTEXT_SIZE)
+    database.save_chat_exchange(session_id, "today was long", "I hear you. What made it feel long?")
+
+
+def measure(name: str, turn, session_id: int, turns: int):
+    # Warm up, so the counts below are for a steady-state turn (cached session)
+    turn(session_id)
+
+    statements = []
+    with database.pooled_connection() as conn:
+        conn.set_trace_callback(statements.append)
+
+    checkouts_before = database.get_pool_stats()["checkouts"]
+    turn(session_id)
+    checkouts = database.get_pool_stats()["checkouts"] - checkouts_before
+
+    with database.pooled_connection() as conn:
+        conn.set_trace_callback(None)
+
+    elapsed = 0.0
+    for i in range(turns):
+        start = time.perf_counter()
+        turn(session_id)
+        elapsed += time.perf_counter() - start
+        if i % SUMMARY_EVERY == 0:
+            fold_into_summary(session_id)
+
+    queries = [sql for sql in statements if sql.lstrip().upper().startswith(("SELECT", "INSERT", "UPDATE"))]
+    print(f"{name:<16} {len(queries):>8} {len(statements):>11} {checkouts:>10} {elapsed / turns * 1e6:>12.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=500, help="chat turns to time per variant")
+    args = parser.parse_args()
+
+    before_session = seed("before")
+    after_session = seed("after")
+
+    print(f"{'variant':<16} {'queries':>8} {'statements':>11} {'checkouts':>10} {'us per turn':>12}")
+    measure("separate calls", separate_calls_turn, before_session, args.turns)
+    measure("combined", combined_turn, after_session, args.turns)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Benchmark: per-call sqlite3.connect() vs the pooled connections in api/database.py.
+
+Runs the same read/write mix (get_user + save_chat_message + get_session_messages,
+i.e. the database side of a chat turn) from several threads, once opening a fresh
+connection per call like the original code did, and once through the pool.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_db_pool --threads 8 --ops 500
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+# Point the app at a throwaway database before api.database is imported
+_tmpdir = tempfile.mkdtemp(prefix="bench_db_pool_")
+os.environ["DB_PATH"] = os.path.join(_tmpdir, "bench.db")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api import database  # noqa: E402
+from api.timestamps import now_epoch  # noqa: E402
+
+
+def unpooled_chat_turn(session_id: int, username: str):
+    """The original pattern: every call opens and closes its own connection."""
+    conn = database.get_connection()
+    conn.execute("SELECT * FROM users WHERE username = ?", (username,)).fetchone()
+    conn.close()
+
+    conn = database.get_connection()
+    conn.execute(
+        "INSERT INTO chat_messages (session_id, role, content, created_at) VALUES (?, ?, ?, ?)",
+        (session_id, "user", "hello", now_epoch())
+    )
+    conn.commit()
+    conn.close()
+
+    conn = database.get_connection()
+    conn.execute(
+        "SELECT id, role, content, created_at FROM chat_messages WHERE session_id = ? ORDER BY id",
+        (session_id,)
+    ).fetchall()
+    conn.close()
+
+
+def pooled_chat_turn(session_id: int, username: str):
+    database.get_user(username)
+    database.save_chat_message(session_id, "user", "hello")
+    database.get_session_messages(session_id)
+
+
+def connect_only():
+    conn = database.get_connection()
+    conn.close()
+
+
+def run(label, fn, threads, ops, setup_sessions):
+    latencies = []
+    lock = threading.Lock()
+
+    def worker(index):
+        session_id, username = setup_sessions[index]
+        local = []
+        for _ in range(ops):
+            start = time.perf_counter()
+            fn(session_id, username)
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    total = threads * ops
+    print(
+        f"{label:<10} {total / elapsed:>10.0f} turns/s   "
+        f"p50 {statistics.median(latencies) * 1000:7.3f} ms   "
+        f"p95 {latencies[int(len(latencies) * 0.95)] * 1000:7.3f} ms   "
+        f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:7.3f} ms"
+    )
+    return total / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--ops", type=int, default=500, help="chat turns per thread")
+    args = parser.parse_args()
+
+    sessions = []
+    for i in range(args.threads):
+        username = f"bench_user_{i}"
+        user_id = database.create_user(username)
+        log_id = database.save_mood_log(user_id, "Neutral", {})
+        sessions.append((database.create_chat_session(user_id, log_id), username))
+
+    n = 2000
+    start = time.perf_counter()
+    for _ in range(n):
+        connect_only()
+    print(f"sqlite3.connect()+close(): {(time.perf_counter() - start) / n * 1e6:.1f} us per connection")
+    print(f"{args.threads} threads x {args.ops} chat turns (3 queries each), database {os.environ['DB_PATH']}")
+
+    before = run("unpooled", unpooled_chat_turn, args.threads, args.ops, sessions)
+    after = run("pooled", pooled_chat_turn, args.threads, args.ops, sessions)
+    print(f"speedup: {after / before:.2f}x")
+    print(f"pool stats: {database.get_pool_stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Benchmark: "last 30 days" of a user's mood history, as a full history load
+filtered client-side (PKT text timestamps, the layout before epoch
+timestamps) versus a from/to range query on the epoch-indexed created_at
+(database.get_user_mood_history with start/end).
+
+Seeds --users users with --days days of history, --per-day mood logs a day
+each, and reports the mean time per query and how many rows each read and
+returned.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_history_range --users 50 --days 730 --per-day 3
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+_tmpdir = tempfile.mkdtemp(prefix="bench_range_")
+os.environ["DB_PATH"] = os.path.join(_tmpdir, "epoch.db")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api import database  # noqa: E402
+from api.timestamps import now_epoch, to_pkt  # noqa: E402
+
+TEXT_DB_PATH = os.path.join(_tmpdir, "text.db")
+WINDOW_DAYS = 30
+
+
+def seed(users: int, days: int, per_day: int):
+    rng = random.Random(5)
+    now = now_epoch()
+    user_ids = [database.create_user(f"user_{i}") for i in range(users)]
+    entries = [
+        (user_id, now - day * 86400 - rng.randrange(86400))
+        for user_id in user_ids
+        for day in range(days)
+        for _ in range(per_day)
+    ]
+    rng.shuffle(entries)
+
+    with database.pooled_connection() as conn:
+        conn.executemany(
+            "INSERT INTO mood_logs (user_id, mood, answers_code, created_at) VALUES (?, 'Neutral', 'AAAAAAAAAA', ?)",
+            entries
+        )
+        conn.execute("ANALYZE")
+        conn.commit()
+
+    # The previous layout: PKT text timestamps, same index
+    conn = sqlite3.connect(TEXT_DB_PATH)
+    conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, username TEXT UNIQUE NOT NULL)")
+    conn.execute("""
+        CREATE TABLE mood_logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            mood TEXT NOT NULL,
+            answers_code TEXT,
+            created_at TIMESTAMP
+        )
+    """)
+    conn.execute("CREATE INDEX idx_mood_logs_user_created ON mood_logs (user_id, created_at)")
+    conn.executemany("INSERT INTO users (id, username) VALUES (?, ?)", [(i, f"user_{n}") for n, i in enumerate(user_ids)])
+    conn.executemany(
+        "INSERT INTO mood_logs (user_id, mood, answers_code, created_at) VALUES (?, 'Neutral', 'AAAAAAAAAA', ?)",
+        ((user_id, to_pkt(created_at)) for user_id, created_at in entries)
+    )
+    conn.execute("ANALYZE")
+    conn.commit()
+    conn.close()
+    return [f"user_{i}" for i in range(users)]
+
+
+def timed(fn, usernames, rng: random.Random, rounds: int):
+    """fn(username) returns (rows read from the database, rows in the window)."""
+    read = returned = 0
+    start = time.perf_counter()
+    for _ in range(rounds):
+        rows_read, rows_returned = fn(rng.choice(usernames))
+        read += rows_read
+        returned += rows_returned
+    return {
+        "mean_ms": round((time.perf_counter() - start) / rounds * 1000, 2),
+        "rows_read": round(read / rounds),
+        "rows_returned": round(returned / rounds),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--days", type=int, default=730)
+    parser.add_argument("--per-day", type=int, default=3)
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    usernames = seed(args.users, args.days, args.per_day)
+    text_conn = sqlite3.connect(TEXT_DB_PATH)
+    start = now_epoch() - WINDOW_DAYS * 86400
+    start_text = to_pkt(start)
+
+    def full_load(username):
+        rows = text_conn.execute("""
+            SELECT ml.id, ml.mood, ml.created_at
+            FROM mood_logs ml JOIN users u ON ml.user_id = u.id
+            WHERE u.username = ?
+            ORDER BY ml.created_at DESC, ml.id DESC
+        """, (username,)).fetchall()
+        recent = [row for row in rows if row[2] >= start_text]
+        return len(rows), len(recent)
+
+    def range_query(username):
+        recent = database.get_user_mood_history(username, start=start)
+        return len(recent), len(recent)
+
+    print(f"full load + filter : {timed(full_load, usernames, random.Random(1), args.rounds)}")
+    print(f"from/to range scan : {timed(range_query, usernames, random.Random(1), args.rounds)}")
+
+
+if __name__ == "__main__":
+    main()
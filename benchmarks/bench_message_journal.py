@@ -0,0 +1,96 @@
+"""
+Benchmark: persisting chat turns from many concurrent writers, with a commit
+per turn (save_chat_exchange) versus the write-behind journal
+(CHAT_WRITE_BEHIND=1), which batches turns into shared transactions.
+
+Each of --writers threads saves --turns user/assistant exchanges. Reports
+turns per second, the mean and p99 time a writer spends saving one turn, and
+for the journal how long the final flush took and how many rows landed.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_message_journal --writers 16 --turns 200
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+_tmpdir = tempfile.mkdtemp(prefix="bench_journal_")
+os.environ["DB_PATH"] = os.path.join(_tmpdir, "bench.db")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api import database  # noqa: E402
+from api.timestamps import now_epoch  # noqa: E402
+from api.message_journal import MessageJournal  # noqa: E402
+
+
+def seed_sessions(count: int, prefix: str):
+    user_id = database.create_user(f"{prefix}_user")
+    log_id = database.save_mood_log(user_id, "Neutral", {})
+    return [database.create_chat_session(user_id, log_id) for _ in range(count)]
+
+
+def run(save_turn, sessions, turns: int):
+    latencies = []
+    lock = threading.Lock()
+
+    def writer(session_id: int):
+        own = []
+        for i in range(turns):
+            start = time.perf_counter()
+            save_turn(session_id, f"user message {i}", f"assistant reply {i}")
+            own.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(own)
+
+    threads = [threading.Thread(target=writer, args=(session_id,)) for session_id in sessions]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "turns_per_sec": round(len(latencies) / elapsed),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 3),
+    }
+
+
+def count_messages(sessions) -> int:
+    with database.pooled_connection() as conn:
+        marks = ",".join("?" * len(sessions))
+        return conn.execute(f"SELECT COUNT(*) FROM chat_messages WHERE session_id IN ({marks})", sessions).fetchone()[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--writers", type=int, default=16)
+    parser.add_argument("--turns", type=int, default=200)
+    args = parser.parse_args()
+
+    sessions = seed_sessions(args.writers, "direct")
+    direct = run(database.save_chat_exchange, sessions, args.turns)
+    print(f"commit per turn : {direct}  rows={count_messages(sessions)}")
+
+    journal = MessageJournal()
+
+    def journal_turn(session_id, user_message, assistant_message):
+        now = now_epoch()
+        journal.append(session_id, [("user", user_message, now), ("assistant", assistant_message, now)])
+
+    sessions = seed_sessions(args.writers, "journal")
+    behind = run(journal_turn, sessions, args.turns)
+    start = time.perf_counter()
+    journal.close()
+    close_ms = round((time.perf_counter() - start) * 1000, 1)
+    print(f"write-behind    : {behind}  final_flush_ms={close_ms} rows={count_messages(sessions)}")
+
+
+if __name__ == "__main__":
+    main()
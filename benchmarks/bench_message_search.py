@@ -0,0 +1,124 @@
+"""
+Benchmark: searching one user's chat messages with the FTS5 index
+(database.search_chat_messages) versus a LIKE scan over that user's sessions,
+on a synthetic corpus.
+
+Seeds --users users with --messages messages in total (spread over sessions
+of a few dozen messages, Zipf-distributed words), then times a mix of common,
+rare and multi-word queries for random users and reports mean and p99 per
+query.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_message_search --users 20 --messages 300000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+_tmpdir = tempfile.mkdtemp(prefix="bench_search_")
+os.environ["DB_PATH"] = os.path.join(_tmpdir, "bench.db")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api import database  # noqa: E402
+from api.timestamps import now_epoch  # noqa: E402
+
+# Zipf-distributed vocabulary, like real text: a few very common words and a
+# long tail. The query words sit at different ranks.
+VOCABULARY_SIZE = 5000
+PLACED_WORDS = {
+    "feel": 5, "work": 20, "sleep": 60, "stress": 150, "deadline": 400,
+    "walk": 300, "dinner": 900, "therapist": 1500, "panic": 2500, "grief": 4000,
+}
+QUERIES = ["sleep", "panic", "deadline stress", "therapist", "walk after dinner", "grief", "feel"]
+
+SESSION_LENGTH = 40
+
+
+def vocabulary():
+    words = [f"w{rank}" for rank in range(VOCABULARY_SIZE)]
+    for word, rank in PLACED_WORDS.items():
+        words[rank] = word
+    words[10] = "after"
+    weights = [1 / (rank + 1) for rank in range(VOCABULARY_SIZE)]
+    return words, weights
+
+
+def sentence(rng: random.Random, words, weights) -> str:
+    return " ".join(rng.choices(words, weights, k=rng.randint(8, 30)))
+
+
+def seed(users: int, messages: int, rng: random.Random):
+    user_ids = [database.create_user(f"user_{i}") for i in range(users)]
+    sessions = []
+    for _ in range(messages // SESSION_LENGTH):
+        user_id = rng.choice(user_ids)
+        log_id = database.save_mood_log(user_id, "Neutral", {})
+        sessions.append(database.create_chat_session(user_id, log_id))
+
+    words, weights = vocabulary()
+    now = now_epoch()
+    with database.pooled_connection() as conn:
+        conn.executemany(
+            "INSERT INTO chat_messages (session_id, role, content, created_at) VALUES (?, ?, ?, ?)",
+            (
+                (session_id, "user" if i % 2 else "assistant", sentence(rng, words, weights), now)
+                for session_id in sessions
+                for i in range(SESSION_LENGTH)
+            )
+        )
+        conn.commit()
+    return user_ids
+
+
+def like_search(user_id: int, text: str, limit: int):
+    """
+    Baseline: substring match over every message of the user's sessions. All
+    matches are read, since they would have to be ranked before paging.
+    """
+    with database.pooled_connection() as conn:
+        rows = conn.execute("""
+            SELECT m.id, m.session_id, m.role, m.created_at, m.content
+            FROM chat_messages m
+            JOIN chat_sessions cs ON cs.id = m.session_id
+            WHERE cs.user_id = ? AND m.content LIKE ?
+        """, (user_id, f"%{text}%")).fetchall()
+    return rows[:limit]
+
+
+def timed(search, user_ids, rng: random.Random, rounds: int):
+    latencies = []
+    for _ in range(rounds):
+        user_id = rng.choice(user_ids)
+        for query in QUERIES:
+            start = time.perf_counter()
+            search(user_id, query, 20)
+            latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return {
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 2),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--messages", type=int, default=300000)
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    start = time.perf_counter()
+    user_ids = seed(args.users, args.messages, rng)
+    print(f"seeded {args.messages} messages in {time.perf_counter() - start:.1f}s (index maintained by triggers)")
+
+    print(f"LIKE scan : {timed(like_search, user_ids, rng, args.rounds)}")
+    print(f"FTS5      : {timed(database.search_chat_messages, user_ids, rng, args.rounds)}")
+
+
+if __name__ == "__main__":
+    main()
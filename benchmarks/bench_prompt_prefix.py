@@ -0,0 +1,96 @@
+"""
+Benchmark: how much of each chat prompt the model server has to re-evaluate.
+
+Replays a multi-turn conversation through the real prompt builder and context
+window code, and feeds every prompt to the prefix-cache model from
+benchmarks/fake_ollama.py. Compares the old sliding window (the oldest turns
+drop out every turn) with the stable window in api/chat_context.py, and times
+building the system prompt with and without the compiled-prompt cache.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_prompt_prefix --turns 40
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+_tmpdir = tempfile.mkdtemp(prefix="bench_prompt_prefix_")
+os.environ["DB_PATH"] = os.path.join(_tmpdir, "bench.db")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api import chat_context  # noqa: E402
+from api.llm_logic_for_psychiatrist import _build_chat_messages  # noqa: E402
+from api.prompt_for_psychiatrist import get_cached_psychiatrist_prompt, get_psychiatrist_prompt  # noqa: E402
+from benchmarks import fake_ollama  # noqa: E402
+
+MOOD_HISTORY = [
+    {"id": 100 - i, "mood": mood, "created_at": 1792296000 - i * 86400}
+    for i, mood in enumerate(["Stressed", "Neutral", "Tired/Exhausted", "Stressed", "Happy/Calm", "Neutral"])
+]
+
+USER_LINES = [
+    "work has been piling up and I can't switch off at night",
+    "yes, mostly emails after dinner",
+    "my manager keeps adding tasks on friday afternoons",
+    "I tried going for a walk but it didn't help much",
+]
+REPLY = "That sounds exhausting, and it makes sense that it is hard to unwind. What usually happens in the hour before you try to sleep?"
+
+
+def sliding_window(messages):
+    """The previous behaviour: the window always ends at the budget and slides each turn."""
+    _, recent = chat_context.split_window(messages)
+    return recent, chat_context.build_chat_context(messages)[1]
+
+
+def replay(turns: int, choose_window):
+    """Evaluated vs total prompt characters over one conversation."""
+    fake_ollama._slots.clear()
+    for key in ("prompt_chars", "prompt_chars_evaluated"):
+        fake_ollama.stats[key] = 0
+
+    stored = []
+    summary = None
+    for turn in range(turns):
+        user_message = USER_LINES[turn % len(USER_LINES)]
+        window, needs_summary = choose_window(stored + [{"role": "user", "content": user_message}])
+        messages = _build_chat_messages(user_message, "Stressed", MOOD_HISTORY, window[:-1], summary)
+        fake_ollama._evaluate_prompt(messages)
+
+        stored += [{"role": "user", "content": user_message}, {"role": "assistant", "content": REPLY}]
+        if needs_summary:
+            # What update_session_summary does after the reply, with a canned summary
+            older, _ = chat_context.split_window(stored)
+            summary = f"The user has talked about work stress over {turn + 1} turns."
+            stored = stored[len(older):]
+
+    return fake_ollama.stats["prompt_chars"], fake_ollama.stats["prompt_chars_evaluated"]
+
+
+def time_prompt_builds(builder, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        builder("Stressed", MOOD_HISTORY)
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=40, help="turns in the replayed conversation")
+    parser.add_argument("--iterations", type=int, default=20000, help="prompt builds to time")
+    args = parser.parse_args()
+
+    print(f"{'window':<10} {'prompt chars':>13} {'evaluated':>10} {'reused':>8}")
+    for name, choose_window in (("sliding", sliding_window), ("stable", chat_context.build_chat_context)):
+        total, evaluated = replay(args.turns, choose_window)
+        print(f"{name:<10} {total:>13} {evaluated:>10} {1 - evaluated / total:>8.1%}")
+
+    print(f"\nsystem prompt build: {time_prompt_builds(get_psychiatrist_prompt, args.iterations):.2f} us uncached, "
+          f"{time_prompt_builds(get_cached_psychiatrist_prompt, args.iterations):.2f} us cached")
+
+
+if __name__ == "__main__":
+    main()
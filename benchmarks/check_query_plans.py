@@ -0,0 +1,134 @@
+"""
+Query-plan regression check for the SQLite data layer.
+
+Calls the read functions in api/database.py against a small throwaway database,
+captures every SELECT they issue, and runs EXPLAIN QUERY PLAN on it. Fails
+(exit code 1) if a query scans a table, walks an open-ended rowid range, or
+sorts with a temporary B-tree instead of searching an index.
+
+Usage (from the repository root):
+    python -m benchmarks.check_query_plans
+"""
+import os
+import re
+import sys
+import tempfile
+
+_tmpdir = tempfile.mkdtemp(prefix="check_query_plans_")
+os.environ["DB_PATH"] = os.path.join(_tmpdir, "plans.db")
+# One pooled connection, so the trace callback sees every statement
+os.environ["DB_POOL_SIZE"] = "1"
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api import database  # noqa: E402
+from api.timestamps import now_epoch  # noqa: E402
+
+
+def seed():
+    user_id = database.create_user("plan_user")
+    other_id = database.create_user("other_user")
+    for i in range(50):
+        database.create_user(f"filler_user_{i}")
+    for i in range(50):
+        log_id = database.save_mood_log(user_id if i % 2 else other_id, "Neutral", {})
+        session_id = database.create_chat_session(user_id if i % 2 else other_id, log_id)
+        for _ in range(4):
+            database.save_chat_message(session_id, "user", "hello there, I feel anxious today")
+    with database.pooled_connection() as conn:
+        conn.execute("ANALYZE")
+        conn.commit()
+    return session_id
+
+
+def exercise(session_id):
+    """Every read path whose plan we care about."""
+    now = now_epoch()
+    database.get_user("plan_user")
+    database.get_users(["plan_user", "other_user"])
+    database.get_user_mood_history("plan_user")
+    database.get_user_mood_history("plan_user", limit=10, before=40)
+    database.get_user_mood_history("plan_user", limit=10, start=now - 30 * 86400, end=now)
+    database.get_latest_mood_log("plan_user")
+    database.get_mood_log(10)
+    database.get_user_chat_sessions("plan_user")
+    database.get_user_chat_sessions("plan_user", limit=10, before=40)
+    database.get_user_chat_sessions("plan_user", limit=10, start=now - 30 * 86400)
+    database.get_session_info(session_id)
+    database.get_chat_turn_context(session_id, 10)
+    database.get_session_messages(session_id)
+    database.get_session_messages(session_id, after_id=10)
+    database.get_session_messages(session_id, limit=2, before=session_id * 4)
+    database.get_session_messages(session_id, after_id=10, limit=5, from_start=True)
+    database.get_chat_sessions_changed_since(1, 10, limit=20)
+    database.get_chat_sessions_version(1)
+    database.get_user_stats(1)
+    database.get_answer_distribution(1)
+    database.get_user_mood_series(1, start=now - 30 * 86400)
+    database.get_user_mood_series(1, max_id=40)
+    database.search_chat_messages(1, "anxious", limit=10, offset=10)
+
+
+def capture_selects(session_id):
+    statements = []
+    with database.pooled_connection() as conn:
+        conn.set_trace_callback(statements.append)
+    try:
+        exercise(session_id)
+    finally:
+        with database.pooled_connection() as conn:
+            conn.set_trace_callback(None)
+
+    selects = []
+    for sql in statements:
+        if sql.lstrip().upper().startswith("SELECT") and sql not in selects:
+            selects.append(sql)
+    return selects
+
+
+def plan_problems(plan_rows):
+    problems = []
+    # Reading a subquery's rows back ("SCAN m" after "CO-ROUTINE m") is not a table scan
+    subqueries = {
+        row["detail"].split(" ", 1)[1]
+        for row in plan_rows
+        if row["detail"].startswith(("CO-ROUTINE ", "MATERIALIZE "))
+    }
+    for row in plan_rows:
+        detail = row["detail"]
+        if detail.startswith("SCAN ") and "VIRTUAL TABLE INDEX" in detail:
+            # Full-text index lookup (FTS5 MATCH), not a row scan
+            continue
+        if detail.startswith("SCAN ") and detail[5:] not in subqueries:
+            problems.append(f"full scan: {detail}")
+        elif re.search(r"\(rowid[<>]", detail):
+            # e.g. "id > ?" served by the primary key instead of a (session_id, id) index
+            problems.append(f"rowid range instead of an index: {detail}")
+        if "USE TEMP B-TREE" in detail:
+            problems.append(f"sort without index: {detail}")
+    return problems
+
+
+def main():
+    session_id = seed()
+    selects = capture_selects(session_id)
+
+    failures = 0
+    with database.pooled_connection() as conn:
+        for sql in selects:
+            plan = conn.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall()
+            problems = plan_problems(plan)
+            status = "FAIL" if problems else "ok"
+            print(f"[{status}] {' '.join(sql.split())[:110]}")
+            for row in plan:
+                print(f"         {row['detail']}")
+            for problem in problems:
+                print(f"         !! {problem}")
+            failures += bool(problems)
+
+    print(f"{len(selects)} queries checked, {failures} regressions")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
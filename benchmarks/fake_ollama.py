@@ -0,0 +1,166 @@
+"""
+Local stand-in for an Ollama server, for benchmarks and load tests.
+
+Implements POST /api/chat (streamed JSON lines or a single JSON body, like
+Ollama) and GET /api/tags. Behaviour is configured with environment variables:
+
+    FAKE_OLLAMA_LATENCY        seconds before the first token        (default 0.2)
+    FAKE_OLLAMA_JITTER         +/- random fraction of the latency     (default 0.25)
+    FAKE_OLLAMA_TOKEN_DELAY    seconds between streamed tokens        (default 0.01)
+    FAKE_OLLAMA_TOKENS         tokens in a chat reply                 (default 40)
+    FAKE_OLLAMA_FAILURE_RATE   fraction of calls answered with a 500  (default 0)
+    FAKE_OLLAMA_HANG_RATE      fraction of calls that never answer    (default 0)
+    FAKE_OLLAMA_SLOTS          prompt-prefix cache slots, like Ollama  (default 4)
+    FAKE_OLLAMA_MAX_IN_FLIGHT  calls generated at once, rest queue     (default 0 = unlimited)
+
+Like Ollama, it keeps the last prompt of each slot and only "evaluates" the
+part of a new prompt after the longest prefix it shares with one of them;
+prompt_eval_count/prompt_eval_duration in the final chunk reflect that.
+
+Usage (from the repository root):
+    python -m uvicorn benchmarks.fake_ollama:app --port 11435
+"""
+import asyncio
+import hashlib
+import json
+import os
+import random
+import time
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+LATENCY = float(os.getenv("FAKE_OLLAMA_LATENCY", "0.2"))
+JITTER = float(os.getenv("FAKE_OLLAMA_JITTER", "0.25"))
+TOKEN_DELAY = float(os.getenv("FAKE_OLLAMA_TOKEN_DELAY", "0.01"))
+TOKENS = int(os.getenv("FAKE_OLLAMA_TOKENS", "40"))
+FAILURE_RATE = float(os.getenv("FAKE_OLLAMA_FAILURE_RATE", "0"))
+HANG_RATE = float(os.getenv("FAKE_OLLAMA_HANG_RATE", "0"))
+SLOTS = int(os.getenv("FAKE_OLLAMA_SLOTS", "4"))
+MAX_IN_FLIGHT = int(os.getenv("FAKE_OLLAMA_MAX_IN_FLIGHT", "0"))
+
+# Like OLLAMA_NUM_PARALLEL: calls beyond this wait for a free slot
+_capacity = asyncio.Semaphore(MAX_IN_FLIGHT) if MAX_IN_FLIGHT > 0 else None
+
+MOODS = ("Happy/Calm", "Neutral", "Stressed", "Depressed/Low", "Tired/Exhausted")
+WORDS = (
+    "I", "hear", "you", "and", "that", "sounds", "really", "hard", "right", "now",
+    "what", "part", "of", "today", "has", "felt", "heaviest", "for", "you", "so", "far?"
+)
+
+stats = {
+    "requests": 0, "failures": 0, "hangs": 0, "in_flight": 0, "max_in_flight": 0,
+    "prompt_chars": 0, "prompt_chars_evaluated": 0
+}
+
+# Last prompt seen by each cache slot, least recently used first
+_slots = []
+
+
+def _evaluate_prompt(messages) -> int:
+    """Characters that miss the prefix cache; updates the slot that was used."""
+    prompt = "".join(f"<{m.get('role')}>{m.get('content', '')}" for m in messages)
+
+    best, shared = None, 0
+    for i, cached in enumerate(_slots):
+        common = len(os.path.commonprefix([cached, prompt]))
+        if common > shared:
+            best, shared = i, common
+
+    if best is not None:
+        _slots.pop(best)
+    elif len(_slots) >= SLOTS:
+        _slots.pop(0)
+    _slots.append(prompt)
+
+    stats["prompt_chars"] += len(prompt)
+    stats["prompt_chars_evaluated"] += len(prompt) - shared
+    return len(prompt) - shared
+
+
+def _reply_for(messages):
+    """Deterministic reply text: a mood for classification prompts, otherwise chat text."""
+    system = messages[0]["content"] if messages else ""
+    last = messages[-1]["content"] if messages else ""
+
+    if "Mood Classification Engine" in system:
+        digest = hashlib.sha256(last.encode("utf-8")).digest()
+        return [MOODS[digest[0] % len(MOODS)]]
+
+    rng = random.Random(last)
+    return [rng.choice(WORDS) + " " for _ in range(TOKENS)]
+
+
+def _final_chunk(model, evaluated_chars, tokens, started):
+    elapsed_ns = int((time.perf_counter() - started) * 1e9)
+    return {
+        "model": model,
+        "message": {"role": "assistant", "content": ""},
+        "done": True,
+        "total_duration": elapsed_ns,
+        "prompt_eval_count": evaluated_chars // 4,
+        "prompt_eval_duration": int(evaluated_chars * 2000),
+        "eval_count": len(tokens),
+        "eval_duration": int(len(tokens) * TOKEN_DELAY * 1e9),
+    }
+
+
+async def chat(request: Request):
+    started = time.perf_counter()
+    body = await request.json()
+    model = body.get("model", "fake")
+    messages = body.get("messages", [])
+
+    stats["requests"] += 1
+    stats["in_flight"] += 1
+    stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+
+    try:
+        roll = random.random()
+        if roll < HANG_RATE:
+            stats["hangs"] += 1
+            await asyncio.sleep(3600)
+        if roll < HANG_RATE + FAILURE_RATE:
+            stats["failures"] += 1
+            return JSONResponse({"error": "simulated failure"}, status_code=500)
+
+        if _capacity is not None:
+            async with _capacity:
+                await asyncio.sleep(max(0.0, LATENCY * (1 + random.uniform(-JITTER, JITTER))))
+        else:
+            await asyncio.sleep(max(0.0, LATENCY * (1 + random.uniform(-JITTER, JITTER))))
+        tokens = _reply_for(messages)
+        evaluated_chars = _evaluate_prompt(messages)
+    finally:
+        stats["in_flight"] -= 1
+
+    if not body.get("stream", True):
+        final = _final_chunk(model, evaluated_chars, tokens, started)
+        final["message"]["content"] = "".join(tokens).strip()
+        return JSONResponse(final)
+
+    async def generate():
+        for token in tokens:
+            yield json.dumps({"model": model, "message": {"role": "assistant", "content": token}, "done": False}) + "\n"
+            if TOKEN_DELAY:
+                await asyncio.sleep(TOKEN_DELAY)
+        yield json.dumps(_final_chunk(model, evaluated_chars, tokens, started)) + "\n"
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+
+async def tags(request: Request):
+    return JSONResponse({"models": [{"name": "fake"}]})
+
+
+async def fake_stats(request: Request):
+    return JSONResponse(stats)
+
+
+app = Starlette(routes=[
+    Route("/api/chat", chat, methods=["POST"]),
+    Route("/api/tags", tags, methods=["GET"]),
+    Route("/fake/stats", fake_stats, methods=["GET"]),
+])
@@ -0,0 +1,317 @@
+"""
+End-to-end load test for api.index:app against a local fake Ollama server.
+
+Starts benchmarks/fake_ollama.py and the API under uvicorn (on a throwaway
+database), then runs virtual users through signup -> mood detect -> start chat
+-> N messages -> end chat at the requested concurrency. Reports p50/p95/p99
+latency per endpoint and overall requests/sec, and saves the results as JSON
+so runs can be compared across commits.
+
+Usage (from the repository root):
+    python -m benchmarks.load_test --users 200 --concurrency 50 --messages 5
+    python -m benchmarks.load_test --stream --fake-latency 0.5 --compare benchmarks/results/<earlier>.json
+    python -m benchmarks.load_test --backends 3 --fake-max-in-flight 8   # scale-out across model nodes
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+
+QUESTION_OPTIONS = {f"q{i}": "ABCDEF" if i <= 2 else "ABCDE" for i in range(1, 11)}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(app: str, port: int, env: dict, workers: int = 1) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", app, "--port", str(port), "--workers", str(workers),
+         "--log-level", "warning", "--no-access-log"],
+        cwd=ROOT,
+        env={**os.environ, **env},
+    )
+
+
+async def wait_until_up(url: str, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                await client.get(url)
+                return
+            except httpx.HTTPError:
+                await asyncio.sleep(0.1)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+def random_answers(rng: random.Random) -> dict:
+    """Answers skewed towards one 'true' mood, like real check-ins."""
+    lean = rng.choice("ABCDE")
+    return {
+        question: lean if rng.random() < 0.7 and lean in options else rng.choice(options)
+        for question, options in QUESTION_OPTIONS.items()
+    }
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.first_token = []
+
+    async def call(self, client: httpx.AsyncClient, name: str, method: str, url: str, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            self.errors[name] += 1
+            return None
+        self.latencies[name].append(time.perf_counter() - start)
+        if response.status_code >= 400:
+            self.errors[name] += 1
+        return response
+
+    async def stream(self, client: httpx.AsyncClient, name: str, url: str, payload: dict):
+        start = time.perf_counter()
+        first = None
+        try:
+            async with client.stream("POST", url, json=payload) as response:
+                async for line in response.aiter_lines():
+                    if first is None and line.startswith("event: token"):
+                        first = time.perf_counter() - start
+                if response.status_code >= 400:
+                    self.errors[name] += 1
+        except httpx.HTTPError:
+            self.errors[name] += 1
+            return
+        self.latencies[name].append(time.perf_counter() - start)
+        if first is not None:
+            self.first_token.append(first)
+
+
+async def user_flow(client, recorder: Recorder, index: int, args, rng: random.Random):
+    username = f"load_{args.run_id}_{index}"
+    await recorder.call(client, "POST /api/auth/signup", "POST", "/api/auth/signup", json={"username": username})
+
+    response = await recorder.call(
+        client, "POST /api/mood/detect", "POST", "/api/mood/detect",
+        json={"username": username, "answers": random_answers(rng)}
+    )
+    if response is None or response.status_code != 200:
+        return
+    log_id = response.json()["log_id"]
+
+    response = await recorder.call(
+        client, "POST /api/chat/start", "POST", "/api/chat/start",
+        json={"username": username, "mood_log_id": log_id}
+    )
+    if response is None or response.status_code != 200:
+        return
+    session_id = response.json()["session_id"]
+
+    for turn in range(args.messages):
+        payload = {"session_id": session_id, "message": f"message {turn}: today was {rng.choice(['long', 'fine', 'hard', 'busy'])}"}
+        if args.stream:
+            await recorder.stream(client, "POST /api/chat/message/stream", "/api/chat/message/stream", payload)
+        else:
+            await recorder.call(client, "POST /api/chat/message", "POST", "/api/chat/message", json=payload)
+
+    await recorder.call(client, "GET /api/mood/history/{username}", "GET", f"/api/mood/history/{username}")
+    await recorder.call(client, "GET /api/chat/history/{session_id}", "GET", f"/api/chat/history/{session_id}")
+    await recorder.call(client, "POST /api/chat/end/{session_id}", "POST", f"/api/chat/end/{session_id}")
+
+
+async def health_prober(client, recorder: Recorder, stop: asyncio.Event):
+    """Measures how responsive cheap endpoints stay while LLM calls are in flight."""
+    while not stop.is_set():
+        await recorder.call(client, "GET /api/health", "GET", "/api/health")
+        await asyncio.sleep(0.05)
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize(recorder: Recorder, elapsed: float) -> dict:
+    endpoints = {}
+    total = 0
+    for name, values in sorted(recorder.latencies.items()):
+        values.sort()
+        total += len(values)
+        endpoints[name] = {
+            "count": len(values),
+            "errors": recorder.errors.get(name, 0),
+            "p50_ms": round(percentile(values, 0.50) * 1000, 2),
+            "p95_ms": round(percentile(values, 0.95) * 1000, 2),
+            "p99_ms": round(percentile(values, 0.99) * 1000, 2),
+            "max_ms": round(values[-1] * 1000, 2),
+        }
+    first = sorted(recorder.first_token)
+    return {
+        "elapsed_s": round(elapsed, 3),
+        "requests": total,
+        "requests_per_s": round(total / elapsed, 2) if elapsed else 0.0,
+        "errors": sum(recorder.errors.values()),
+        "time_to_first_token_p50_ms": round(percentile(first, 0.50) * 1000, 2) if first else None,
+        "time_to_first_token_p95_ms": round(percentile(first, 0.95) * 1000, 2) if first else None,
+        "endpoints": endpoints,
+    }
+
+
+def print_report(summary: dict, baseline: dict = None):
+    print(f"\n{summary['requests']} requests in {summary['elapsed_s']}s "
+          f"= {summary['requests_per_s']} req/s, {summary['errors']} errors")
+    if summary["time_to_first_token_p50_ms"] is not None:
+        print(f"time to first token: p50 {summary['time_to_first_token_p50_ms']} ms, "
+              f"p95 {summary['time_to_first_token_p95_ms']} ms")
+
+    if len(summary.get("backend_requests", [])) > 1:
+        print(f"requests per model backend: {summary['backend_requests']}")
+    if summary.get("prompt_prefix_reuse") is not None:
+        print(f"prompt prefix reused by the model server: {summary['prompt_prefix_reuse']:.1%}")
+
+    print(f"\n{'endpoint':<40} {'count':>6} {'err':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, row in summary["endpoints"].items():
+        line = f"{name:<40} {row['count']:>6} {row['errors']:>5} {row['p50_ms']:>9} {row['p95_ms']:>9} {row['p99_ms']:>9}"
+        if baseline and name in baseline.get("endpoints", {}):
+            before = baseline["endpoints"][name]["p95_ms"]
+            if before:
+                line += f"   p95 {((row['p95_ms'] - before) / before) * 100:+.1f}%"
+        print(line)
+
+    if baseline:
+        before = baseline.get("requests_per_s") or 0
+        if before:
+            print(f"\nthroughput vs baseline: {((summary['requests_per_s'] - before) / before) * 100:+.1f}%")
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+async def run(args) -> dict:
+    fake_ports = [free_port() for _ in range(args.backends)]
+    api_port = free_port()
+    db_dir = tempfile.mkdtemp(prefix="load_test_")
+
+    fakes = [
+        start_server("benchmarks.fake_ollama:app", port, {
+            "FAKE_OLLAMA_LATENCY": str(args.fake_latency),
+            "FAKE_OLLAMA_TOKEN_DELAY": str(args.fake_token_delay),
+            "FAKE_OLLAMA_FAILURE_RATE": str(args.fake_failure_rate),
+            "FAKE_OLLAMA_HANG_RATE": str(args.fake_hang_rate),
+            "FAKE_OLLAMA_MAX_IN_FLIGHT": str(args.fake_max_in_flight),
+        })
+        for port in fake_ports
+    ]
+    api = start_server("api.index:app", api_port, {
+        "OLLAMA_URLS": ",".join(f"http://127.0.0.1:{port}/api/chat" for port in fake_ports),
+        "DB_PATH": os.path.join(db_dir, "load.db"),
+    }, workers=args.workers)
+
+    try:
+        for port in fake_ports:
+            await wait_until_up(f"http://127.0.0.1:{port}/api/tags")
+        await wait_until_up(f"http://127.0.0.1:{api_port}/api/health")
+
+        recorder = Recorder()
+        rng = random.Random(args.seed)
+        semaphore = asyncio.Semaphore(args.concurrency)
+        limits = httpx.Limits(max_connections=args.concurrency + 5)
+
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{api_port}", timeout=120, limits=limits) as client:
+            async def guarded(index):
+                async with semaphore:
+                    await user_flow(client, recorder, index, args, random.Random(rng.random()))
+
+            stop = asyncio.Event()
+            prober = asyncio.create_task(health_prober(client, recorder, stop))
+            start = time.perf_counter()
+            await asyncio.gather(*(guarded(i) for i in range(args.users)))
+            elapsed = time.perf_counter() - start
+            stop.set()
+            await prober
+
+        summary = summarize(recorder, elapsed)
+        async with httpx.AsyncClient() as client:
+            fake_stats = [(await client.get(f"http://127.0.0.1:{port}/fake/stats")).json() for port in fake_ports]
+        prompt_chars = sum(stats["prompt_chars"] for stats in fake_stats)
+        if prompt_chars:
+            evaluated = sum(stats["prompt_chars_evaluated"] for stats in fake_stats)
+            summary["prompt_prefix_reuse"] = round(1 - evaluated / prompt_chars, 4)
+        summary["backend_requests"] = [stats["requests"] for stats in fake_stats]
+        return summary
+    finally:
+        for process in [api, *fakes]:
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100, help="virtual users (full flows) to run")
+    parser.add_argument("--concurrency", type=int, default=20, help="flows running at the same time")
+    parser.add_argument("--messages", type=int, default=5, help="chat messages per flow")
+    parser.add_argument("--stream", action="store_true", help="use /api/chat/message/stream")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for the API")
+    parser.add_argument("--backends", type=int, default=1, help="fake Ollama servers behind OLLAMA_URLS")
+    parser.add_argument("--fake-max-in-flight", type=int, default=0,
+                        help="calls each fake server works on at once, the rest queue (0 = unlimited)")
+    parser.add_argument("--fake-latency", type=float, default=0.2, help="seconds before the fake model answers")
+    parser.add_argument("--fake-token-delay", type=float, default=0.01)
+    parser.add_argument("--fake-failure-rate", type=float, default=0.0)
+    parser.add_argument("--fake-hang-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--label", default="", help="free-form label stored with the results")
+    parser.add_argument("--output", help="results file (default: benchmarks/results/<time>-<rev>.json)")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    args = parser.parse_args()
+    args.run_id = int(time.time())
+
+    summary = asyncio.run(run(args))
+    summary["config"] = {key: value for key, value in vars(args).items() if key not in ("output", "compare")}
+    summary["revision"] = git_revision()
+    summary["timestamp"] = datetime.now().isoformat(timespec="seconds")
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(summary, baseline)
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{summary['revision']}.json"
+    )
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(summary, f, indent=2)
+    print(f"\nresults saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -11,7 +11,10 @@ function Chat({ username, onLogout }) {
   const [loading, setLoading] = useState(true)
   const [sending, setSending] = useState(false)
   const [mood, setMood] = useState('')
+  const [olderCursor, setOlderCursor] = useState(null)
   const messagesEndRef = useRef(null)
+  // Id of the newest message confirmed by the server; later turns fetch only what follows it
+  const lastMessageId = useRef(0)
 
   useEffect(() => {
     fetchChatHistory()
@@ -29,12 +32,10 @@ function Chat({ username, onLogout }) {
     try {
       const res = await axios.get(`/api/chat/history/${sessionId}`)
       setMessages(res.data.messages)
-
-      // Get session info to find mood
-      const sessionsRes = await axios.get(`/api/chat/sessions/${username}`)
-      const currentSession = sessionsRes.data.sessions.find(s => s.id === parseInt(sessionId))
-      if (currentSession) {
-        setMood(currentSession.mood)
+      setOlderCursor(res.data.next_cursor)
+      lastMessageId.current = res.data.messages.at(-1)?.id ?? 0
+      if (res.data.mood) {
+        setMood(res.data.mood)
       }
     } catch (err) {
       console.error('Error fetching chat history:', err)
@@ -43,6 +44,34 @@ function Chat({ username, onLogout }) {
     }
   }
 
+  const loadEarlierMessages = async () => {
+    try {
+      const res = await axios.get(`/api/chat/history/${sessionId}`, {
+        params: { before: olderCursor }
+      })
+      setMessages(prev => [...res.data.messages, ...prev])
+      setOlderCursor(res.data.next_cursor)
+    } catch (err) {
+      console.error('Error fetching earlier messages:', err)
+    }
+  }
+
+  const syncNewMessages = async () => {
+    // Fetch only the messages saved since the last sync and swap them in for
+    // the optimistic (id-less) ones shown while the reply streamed
+    const added = []
+    let hasMore = true
+    while (hasMore) {
+      const res = await axios.get(`/api/chat/history/${sessionId}`, {
+        params: { after: lastMessageId.current }
+      })
+      added.push(...res.data.messages)
+      lastMessageId.current = res.data.last_id
+      hasMore = res.data.has_more
+    }
+    setMessages(prev => [...prev.filter(msg => msg.id !== undefined), ...added])
+  }
+
   const handleSendMessage = async (e) => {
     e.preventDefault()
     if (!inputMessage.trim() || sending) return
@@ -51,14 +80,63 @@ function Chat({ username, onLogout }) {
     setInputMessage('')
     setSending(true)
 
+    // Show the user's message and an empty reply bubble that fills in as tokens arrive
+    const now = new Date().toISOString()
+    setMessages(prev => [
+      ...prev,
+      { role: 'user', content: userMessage, created_at: now },
+      { role: 'assistant', content: '', created_at: now }
+    ])
+
+    const appendToReply = (text) => {
+      setMessages(prev => {
+        const updated = [...prev]
+        const last = updated[updated.length - 1]
+        updated[updated.length - 1] = { ...last, content: last.content + text }
+        return updated
+      })
+    }
+
     try {
-      const res = await axios.post('/api/chat/message', {
-        session_id: parseInt(sessionId),
-        message: userMessage
+      const res = await fetch('/api/chat/message/stream', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({
+          session_id: parseInt(sessionId),
+          message: userMessage
+        })
       })
+      if (res.status === 503) {
+        // Model is overloaded: nothing was saved, so let the user resend
+        const retryAfter = res.headers.get('Retry-After') || 'a few'
+        appendToReply(`I'm talking with a lot of people right now. Please try again in ${retryAfter} seconds.`)
+        setInputMessage(userMessage)
+        return
+      }
+      if (!res.ok) throw new Error(`HTTP ${res.status}`)
+
+      // Parse server-sent events from the response body
+      const reader = res.body.getReader()
+      const decoder = new TextDecoder()
+      let buffer = ''
+      while (true) {
+        const { value, done } = await reader.read()
+        if (done) break
+        buffer += decoder.decode(value, { stream: true })
+
+        const events = buffer.split('\n\n')
+        buffer = events.pop()
+        for (const raw of events) {
+          const event = raw.match(/^event: (.*)$/m)?.[1]
+          const data = raw.match(/^data: (.*)$/m)?.[1]
+          if (event === 'token' && data) {
+            appendToReply(JSON.parse(data).content)
+          }
+        }
+      }
 
-      // Fetch updated messages
-      await fetchChatHistory()
+      // Fetch just the saved user message and reply
+      await syncNewMessages()
     } catch (err) {
       console.error('Error sending message:', err)
     } finally {
@@ -114,6 +192,11 @@ function Chat({ username, onLogout }) {
 
       <div className="chat-content">
         <div className="messages-container">
+          {olderCursor && (
+            <button className="btn btn-secondary" onClick={loadEarlierMessages}>
+              Load earlier messages
+            </button>
+          )}
           {messages.map((msg, index) => (
             <div key={index} className={`message ${msg.role}`}>
               <div className="message-bubble">
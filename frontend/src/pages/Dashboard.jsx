@@ -5,21 +5,19 @@ import './Dashboard.css'
 
 function Dashboard({ username, onLogout }) {
   const navigate = useNavigate()
-  const [latestMood, setLatestMood] = useState(null)
+  const [summary, setSummary] = useState(null)
   const [loading, setLoading] = useState(true)
 
   useEffect(() => {
-    fetchLatestMood()
+    fetchSummary()
   }, [username])
 
-  const fetchLatestMood = async () => {
+  const fetchSummary = async () => {
     try {
-      const res = await axios.get(`/api/mood/history/${username}`)
-      if (res.data.history && res.data.history.length > 0) {
-        setLatestMood(res.data.history[0])
-      }
+      const res = await axios.get(`/api/dashboard/${username}`)
+      setSummary(res.data)
     } catch (err) {
-      console.error('Error fetching mood history:', err)
+      console.error('Error fetching dashboard:', err)
     } finally {
       setLoading(false)
     }
@@ -63,21 +61,52 @@ function Dashboard({ username, onLogout }) {
           </div>
         ) : (
           <>
-            {latestMood && (
+            {summary?.latest_mood && (
               <div className="mood-card">
                 <h2>Your Latest Mood</h2>
                 <div
                   className="mood-badge"
-                  style={{ backgroundColor: getMoodColor(latestMood.mood) }}
+                  style={{ backgroundColor: getMoodColor(summary.latest_mood.mood) }}
                 >
-                  {latestMood.mood}
+                  {summary.latest_mood.mood}
                 </div>
                 <p className="mood-date">
-                  {new Date(latestMood.created_at).toLocaleString()}
+                  {new Date(summary.latest_mood.created_at).toLocaleString()}
                 </p>
               </div>
             )}
 
+            {summary && summary.total_mood_logs > 0 && (
+              <div className="stats-row">
+                <div className="stat">
+                  <span className="stat-value">{summary.current_streak_days}</span>
+                  <span className="stat-label">day streak</span>
+                </div>
+                <div className="stat">
+                  <span className="stat-value">{summary.total_mood_logs}</span>
+                  <span className="stat-label">assessments</span>
+                </div>
+                <div className="stat">
+                  <span className="stat-value">{summary.session_count}</span>
+                  <span className="stat-label">chat sessions</span>
+                </div>
+              </div>
+            )}
+
+            {summary && summary.total_mood_logs > 0 && (
+              <div className="mood-counts">
+                {Object.entries(summary.mood_counts).map(([mood, count]) => (
+                  <span
+                    key={mood}
+                    className="mood-count"
+                    style={{ borderColor: getMoodColor(mood) }}
+                  >
+                    {mood}: {count}
+                  </span>
+                ))}
+              </div>
+            )}
+
             <div className="dashboard-actions">
               <button className="btn" onClick={handleStartQuestionnaire}>
                 Take Mood Assessment
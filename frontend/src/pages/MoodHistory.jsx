@@ -7,15 +7,19 @@ function MoodHistory({ username, onLogout }) {
   const navigate = useNavigate()
   const [history, setHistory] = useState([])
   const [loading, setLoading] = useState(true)
+  const [nextCursor, setNextCursor] = useState(null)
 
   useEffect(() => {
     fetchHistory()
   }, [username])
 
-  const fetchHistory = async () => {
+  const fetchHistory = async (before = null) => {
     try {
-      const res = await axios.get(`/api/mood/history/${username}`)
-      setHistory(res.data.history)
+      const res = await axios.get(`/api/mood/history/${username}`, {
+        params: before ? { before } : {}
+      })
+      setHistory(prev => before ? [...prev, ...res.data.history] : res.data.history)
+      setNextCursor(res.data.next_cursor)
     } catch (err) {
       console.error('Error fetching history:', err)
     } finally {
@@ -57,7 +61,7 @@ function MoodHistory({ username, onLogout }) {
 
       <div className="header">
         <h1>Your Mood History</h1>
-        <p>{history.length} total entries</p>
+        <p>{history.length}{nextCursor ? '+' : ''} total entries</p>
       </div>
 
       <div className="content">
@@ -93,6 +97,14 @@ function MoodHistory({ username, onLogout }) {
               ))}
             </div>
 
+            {nextCursor && (
+              <div className="history-actions">
+                <button className="btn btn-secondary" onClick={() => fetchHistory(nextCursor)}>
+                  Load older entries
+                </button>
+              </div>
+            )}
+
             <div className="history-actions">
               <button className="btn btn-secondary" onClick={handleBack}>
                 Back to Dashboard